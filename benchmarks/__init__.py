@@ -1 +1,11 @@
+from .harness import config, memprofile, overhead
 
+# profiled samples must not end up in the published results
+config.check_profiling()
+
+# time setup and teardown of every benchmark next to the measured call
+overhead.install()
+
+# has to happen before the suites import casatools
+if config.memprofile_enabled():
+    memprofile.enable()
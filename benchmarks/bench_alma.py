@@ -1,7 +1,9 @@
-import os, shutil
+import os
 from casatools import ctsys
 from casatasks import tclean
 
+from .harness import manifest, staging, trash
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 
@@ -16,19 +18,20 @@ class BaseMosaicSetup():
     def prepData(self, msname=""):
         if msname != "":
             self.msfile = msname
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+        # the cubes of the previous sample take several GB, wait until they are gone
+        trash.barrier()
+        manifest.stage(self, self.msfile)
 
 class BaseMosaic(BaseMosaicSetup):
     """Runtime benchmarking tests adapted from ALMA stakeholder tests, mosaic use case"""
+    datasets = (manifest.Dataset('stakeholder/alma/2018.1.00879.S_tclean.ms'),)
+
     def setup(self):
         self.prepData("2018.1.00879.S_tclean.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_mosaic_cube_eph_pcwdT_restart(self):
         """Mosaic ephemeris cube imaging with briggsbwtaper - field Venus, spw 45"""
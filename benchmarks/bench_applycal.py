@@ -1,7 +1,9 @@
-import os, shutil
+import os
 from casatools import ctsys
 from casatasks import applycal
 
+from .harness import manifest
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = 5            # fixed at 5 iterations per round, no range or soft cutoff
@@ -12,29 +14,15 @@ timeout = 3600        # conservative 1hr hard cap should never be met for these
 class DataSetUp():
 
     datapath = ctsys.resolve('unittest/applycal/')
+    datasets = (
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms', 'applycalcopy.ms', attr='vis'),
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms.G0', 'tempgcal.G0', attr='gCal'),
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms.T0', 'temptcal.T0', attr='tCal'),
+        manifest.Dataset('unittest/applycal/refcallib.txt', writable=False, attr='callibfile'),
+    )
 
     def setup_basic(self):
-        self.vis = 'applycalcopy.ms'
-        self.gCal = 'tempgcal.G0'
-        self.tCal = 'temptcal.T0'
-        self.callibfile = 'refcallib.txt'
-
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis)
-
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis)
-        if os.path.exists(self.gCal):
-            shutil.rmtree(self.gCal)
-        if os.path.exists(self.tCal):
-            shutil.rmtree(self.tCal)
-        if (os.path.exists(self.callibfile)):
-            os.remove(self.callibfile)
-
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms'), self.vis)
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms.G0'), self.gCal)
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms.T0'), self.tCal)
-        self.callibfile = os.path.join(self.datapath, self.callibfile)
+        manifest.stage(self)
 
 class StandardGainTable(DataSetUp):
     """
@@ -1,8 +1,10 @@
-import os, shutil
+import os, glob
 import numpy
 from casatools import ctsys
 from casatasks import flagdata
 
+from .harness import manifest, pagecache, trash
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (3, 6, 60.0) # between 3 and 6 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -17,68 +19,62 @@ def create_input(str_text, filename):
     cmd = str_text
     # remove file first
     if os.path.exists(inp):
-        os.system('rm -f ' + inp)
+        os.remove(inp)
     # save to a file
     with open(inp, 'w') as f:
         f.write(cmd)
     f.close()
     return
 
+# Test datasets, staged by the setUp_* helpers below; each suite declares the one it uses
+# EVLA MS, 4 ants, scan=30,31 spw=0~15, 64 chans, RR,RL,LR,LL
+data4tfcrop = manifest.Dataset("unittest/flagdata/Four_ants_3C286.ms", attr="vis")
+# VLA data set, scan=1~7, spw=0 63 chans, RR,LL
+ngc5921 = manifest.Dataset("unittest/flagdata/ngc5921.ms", attr="vis")
+wray_perf = manifest.Dataset("unittest/flagdata/uid___A002_Xe1f219_X6d0b_data_autocorr_WRAY_scan7.ms", attr="vis")
+# ALMA MS, scan=1,8,10 spw=0~3 4,128,128,1 chans, I,XX,YY
+alma_ms = manifest.Dataset("unittest/flagdata/uid___A002_X30a93d_X43e_small.ms", attr="vis")
+tsys = manifest.Dataset("unittest/flagdata/X7ef.tsys", attr="vis")
+bpass = manifest.Dataset("unittest/flagdata/cal.fewscans.bpass", attr="vis")
+# ALMA ACA observation with one field in APP ref frame
+shadowdata = manifest.Dataset("unittest/flagdata/shadowAPP.ms", attr="vis")
+
 class BaseFlagSetup():
     # Test datasets; root directory is read from config.py
     datapath = ctsys.resolve("unittest/flagdata/")
 
+    def stage_vis(self, dataset):
+        """Fresh working copy of dataset, also removing products of earlier samples (e.g. flagversions)"""
+        trash.discard(dataset.dest + '?*')
+        manifest.stage(self, dataset.dest)
+
     def setUp_data4tfcrop(self):
-        """EVLA MS, 4 ants, scan=30,31 spw=0~15, 64 chans, RR,RL,LR,LL"""
-        self.vis = "Four_ants_3C286.ms"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath,self.vis),self.vis)
+        self.stage_vis(data4tfcrop)
 
     def setUp_ngc5921(self):
-        """VLA data set, scan=1~7, spw=0 63 chans, RR,LL"""
-        self.vis = "ngc5921.ms"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath,self.vis),self.vis)
+        self.stage_vis(ngc5921)
 
     def setUp_WRay_perf(self):
-        self.vis = "uid___A002_Xe1f219_X6d0b_data_autocorr_WRAY_scan7.ms/"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath,self.vis),
-                        os.path.join(os.getcwd(), self.vis))
+        self.stage_vis(wray_perf)
 
     def setUp_alma_ms(self):
-        """ALMA MS, scan=1,8,10 spw=0~3 4,128,128,1 chans, I,XX,YY"""
-        self.vis = "uid___A002_X30a93d_X43e_small.ms"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath, self.vis), self.vis)
+        self.stage_vis(alma_ms)
 
     def setUp_tsys(self):
-        self.vis = "X7ef.tsys"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath, self.vis), self.vis)
+        self.stage_vis(tsys)
 
     def setUp_bpass(self):
-        self.vis = "cal.fewscans.bpass"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath, self.vis), self.vis)
+        self.stage_vis(bpass)
 
     def setUp_shadowdata(self):
-        """ALMA ACA observation with one field in APP ref frame"""
-        self.vis = "shadowAPP.ms"
-        if os.path.exists(self.vis):
-            os.system('rm -rf ' + self.vis + '*')
-        shutil.copytree(os.path.join(self.datapath, self.vis), self.vis)
+        self.stage_vis(shadowdata)
 
 class AntintMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata in antint mode
     """
+    datasets = (data4tfcrop,)
+
     def setup(self):
         self.setUp_data4tfcrop()
 
@@ -90,6 +86,8 @@ class CalibrationBandpass(BaseFlagSetup):
     """
     Benchmark runtime of flagdata on bandpass calibration tables
     """
+    datasets = (bpass,)
+
     def setup(self):
         self.setUp_bpass()
 
@@ -102,6 +100,8 @@ class CalibrationTsys(BaseFlagSetup):
     """
     Benchmark runtime of flagdata on Tsys calibration tables
     """
+    datasets = (tsys,)
+
     def setup(self):
         self.setUp_tsys()
 
@@ -114,6 +114,8 @@ class ClipMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata clip mode
     """
+    datasets = (data4tfcrop,)
+
     def setup(self):
         self.setUp_data4tfcrop()
 
@@ -128,10 +130,19 @@ class ClipMode(BaseFlagSetup):
                  timeavg=True, timebin='2s', clipminmax=[0.0, 0.08])
 
 
+class ClipMode_cold(ClipMode):
+    """
+    Benchmark runtime of flagdata clip mode, with the MS evicted from the page cache
+    """
+    page_cache = pagecache.COLD
+
+
 class ElevationMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata in elevation mode
     """
+    datasets = (ngc5921,)
+
     def setup(self):
         self.setUp_ngc5921()
 
@@ -140,21 +151,19 @@ class ElevationMode(BaseFlagSetup):
         flagdata(vis = self.vis,mode = 'elevation',lowerlimit = 55,upperlimit = 60,
                   savepars=False,flagbackup=False)
 
+# The versions of the benchmarks below are their source hashes from before the command
+# file was staged by the manifest, which does not change what they measure; pinning them
+# keeps their results history
 class ListMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata list mode used in the pipeline
     """
     flags_cmd = "uid___A002_Xe1f219_X6d0b.flagcmds.txt"
-
-    def setup_cache(self):
-        if not os.path.exists(self.flags_cmd):
-            shutil.copyfile(
-                os.path.join(self.datapath, self.flags_cmd), 
-                os.path.join(os.getcwd(), self.flags_cmd)
-            )
+    datasets = (wray_perf, manifest.Dataset("unittest/flagdata/" + flags_cmd, writable=False))
 
     def setup(self):
         self.setUp_WRay_perf()
+        manifest.stage(self, self.flags_cmd)
 
     def time_list_tbuff(self):
         """Flagdata list mode from pipeline hifa_flagdata"""
@@ -167,6 +176,7 @@ class ListMode(BaseFlagSetup):
             flagbackup=False,
             savepars=False,
         )
+    time_list_tbuff.version = "53f2aaec8f44b81cb94f73fa21e5aac89218769ace8126661888f9c54374ff75"
 
     def time_list_bandpassflag(self):
         """Flagdata list mode from pipeline hifa_bandpassflag"""
@@ -188,6 +198,7 @@ class ListMode(BaseFlagSetup):
             flagbackup=False,
             savepars=False,
         )
+    time_list_bandpassflag.version = "2971c3002f4dafe2840b191e5570935d4b7f7ff2873189a4c55df4ae808dc738"
 
     def time_list_summary(self):
         """Flagdata list mode from pipeline hifa_rawflagchans"""
@@ -200,16 +211,25 @@ class ListMode(BaseFlagSetup):
             flagbackup=False,
             savepars=False,
         )
+    time_list_summary.version = "a3e3764d7dceb23f8ac0736e3a450613d2d10e11dc14ea682bbb0a78e1737111"
 
     def teardown(self):
         # remove the data products generated by the task
         #os.remove(self.flags_cmd)
-        shutil.rmtree(self.vis, ignore_errors=True)
+        manifest.clean(self)
+
+class ListMode_cold(ListMode):
+    """
+    Benchmark runtime of flagdata list mode used in the pipeline, with the MS read from
+    disk as in the pipeline
+    """
+    page_cache = pagecache.COLD
 
 class ListFileMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata list mode with input files
     """
+    datasets = (ngc5921,)
     inpfile1 = 'listcmd1.txt'
     inpfile2 = 'listcmd2.txt'
     inpfile3 = 'listcmd3.txt'
@@ -244,6 +264,8 @@ class RflagMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata rflag mode
     """
+    datasets = (data4tfcrop,)
+
     def setup(self):
         self.setUp_data4tfcrop()
         self.t1 = [numpy.int32(1), 10, numpy.float32(0.1)]
@@ -258,6 +280,8 @@ class Selections(BaseFlagSetup):
     """
     Benchmark runtime of flagdata using different selections
     """
+    datasets = (alma_ms,)
+
     def setup(self):
         self.setUp_alma_ms()
 
@@ -274,6 +298,7 @@ class ShadowMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata using different selections
     """
+    datasets = (shadowdata,)
     antfile = 'antfile.txt'
     inpfile = 'listcmd.txt'
 
@@ -302,7 +327,7 @@ class ShadowMode(BaseFlagSetup):
 
     def teardown(self):
         if os.path.exists(self.inpfile):
-            os.system("rm -rf listcmd*.txt antfile*.txt withdict.txt")
+            trash.discard("listcmd*.txt", "antfile*.txt", "withdict.txt")
 
     def time_shadow_addantenna(self):
         """flagdata: use antenna file in list mode; (original test_addantenna)"""
@@ -317,6 +342,8 @@ class TfcropMode(BaseFlagSetup):
     """
     Benchmark runtime of flagdata tfcrop mode
     """
+    datasets = (data4tfcrop,)
+
     def setup(self):
         self.setUp_data4tfcrop()
 
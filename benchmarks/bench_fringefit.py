@@ -7,6 +7,8 @@ from casatools import ctsys
 
 from casatestutils import testhelper as th
 
+from .harness import manifest
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (1, 2, 30.0) # between 1 and 2 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -20,19 +22,17 @@ class Sbd():
     prefix = 'n08c1'
     msfile = prefix + '.ms'
     uvfile = 'gaincaltest2copy.ms'
+    datasets = (
+        manifest.Dataset('unittest/fringefit/' + msfile),
+        manifest.Dataset('unittest/fringefit/gaincaltest2.ms', uvfile),
+    )
+    outputs = (prefix + '.sbdcal', prefix + '-zerorates.sbdcal', prefix + '.mbdcal', 'uvrange_with.cal')
 
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
-        shutil.copytree(os.path.join(datapath, 'gaincaltest2.ms'), self.uvfile)
+    def setup(self):
+        manifest.stage(self)
 
-    def tearDown(self):
-        shutil.rmtree(self.msfile)
-        shutil.rmtree(self.prefix + '.sbdcal', True)
-        shutil.rmtree(self.prefix + '-zerorates.sbdcal', True)
-        shutil.rmtree(self.prefix + '.mbdcal', True)
-        # shutil.rmtree(self.prefix + '.mbdcal2', True)
-        shutil.rmtree(self.uvfile, True)
-        shutil.rmtree('uvrange_with.cal', True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_sbd(self):
         """test_sbd --- test with sbd caltable"""
@@ -49,19 +49,18 @@ class Sbd():
 class Mbd():
     prefix = 'n08c1'
     msfile = prefix + '.ms'
+    datasets = (manifest.Dataset('unittest/fringefit/' + msfile),)
+    outputs = (prefix + '.sbdcal', prefix + '-zerorates.sbdcal', prefix + '.mbdcal')
     
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+    def setup(self):
+        manifest.stage(self)
         
         sbdcal = self.prefix + '-zerorates.sbdcal'
         fringefit(vis=self.msfile, caltable=sbdcal, field='4C39.25',
                   refant='EF', zerorates=True)
         
-    def tearDown(self):
-        shutil.rmtree(self.msfile)
-        shutil.rmtree(self.prefix + '.sbdcal', True)
-        shutil.rmtree(self.prefix + '-zerorates.sbdcal', True)
-        shutil.rmtree(self.prefix + '.mbdcal', True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_mbd(self):
         """test_mbd --- test with mbd cal table"""
@@ -76,14 +75,14 @@ class Mbd():
 class Single():
     prefix = 'n08c1-single'
     msfile = prefix + '.ms'
+    datasets = (manifest.Dataset('unittest/fringefit/' + msfile),)
+    outputs = (prefix + '.sbdcal', prefix + '-2.sbdcal')
 
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+    def setup(self):
+        manifest.stage(self)
 
-    def tearDown(self):
-        shutil.rmtree(self.msfile)
-        shutil.rmtree(self.prefix + '.sbdcal', True)
-        shutil.rmtree(self.prefix + '-2.sbdcal', True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_single(self):
         """test_single --- check that the right params are flagged with a single refant"""
@@ -106,9 +105,11 @@ class Single():
 class Dispersive():
     prefix = 'n14p1'
     msfile = prefix+'.ms'
+    datasets = (manifest.Dataset('unittest/fringefit/' + msfile),)
+    outputs = (msfile + '.flagversions', prefix + '.mpc', prefix + '.disp')
     
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+    def setup(self):
+        manifest.stage(self)
         flagdata(self.prefix + '.ms', mode='manual', spw='*:0~2;29~31')
         
         fringefit(vis="n14p1.ms", caltable="n14p1.mpc",
@@ -117,11 +118,8 @@ class Dispersive():
           globalsolve=True, niter=100, gaintable=[],
           parang=True)
 
-    def tearDown(self):
-        shutil.rmtree(self.msfile)
-        shutil.rmtree(self.prefix + '.ms' + '.flagversions')
-        shutil.rmtree(self.prefix + '.mpc', True)
-        shutil.rmtree(self.prefix + '.disp', True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_manual_phase_cal(self):
         """test_manual_phase_cal --- test on manually flagged data"""
@@ -140,16 +138,16 @@ class RefantBookkeeping():
     prefix = 'n08c1-single'
     msfile = prefix + '.ms'
     sbdcal = prefix + '-book.sbdcal'
+    datasets = (manifest.Dataset('unittest/fringefit/' + msfile),)
+    outputs = (msfile + '.flagversions', sbdcal)
 
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+    def setup(self):
+        manifest.stage(self)
         flagdata(self.prefix + '.ms', mode='manual', spw='*:0~2;29~31')
         flagdata(self.prefix + '.ms', mode='manual', antenna='EF')
 
-    def tearDown(self):
-        shutil.rmtree(self.msfile)
-        shutil.rmtree(self.msfile + '.flagversions')
-        shutil.rmtree(self.sbdcal, True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_bookkeeping(self):
         """test_bookkeeping --- check effects of using refant WB"""
@@ -159,21 +157,18 @@ class RefantBookkeeping():
 class FreqMetaTests():
     prefix = 'n08c1'
     msfile = 'n08c1.ms'
+    datasets = (manifest.Dataset('unittest/fringefit/' + msfile),)
+    outputs = (prefix + '-zerorates.sbdcal', prefix + '.mbdcal')
 
-    def setUp(self):
-        if os.path.exists(self.msfile):
-            shutil.rmtree(self.msfile)
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+    def setup(self):
+        manifest.stage(self)
         
         sbdcal = self.prefix + '-zerorates.sbdcal'
         fringefit(vis=self.msfile, caltable=sbdcal, field='4C39.25',
                   refant='EF', zerorates=True)
 
-    def tearDown(self):
-        if os.path.exists(self.msfile):
-            shutil.rmtree(self.msfile)
-        if os.path.exists(self.prefix + '.mbdcal'):
-            shutil.rmtree(self.prefix + '.mbdcal', True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_metadata(self):
         """test_metadata --- check output table metadata"""
@@ -188,16 +183,14 @@ class FreqMetaTests():
 class Corrcomb():
     polcombtestms = 'gaincalcopy.ms'
     testout = 'polcombout.cal'
+    datasets = (manifest.Dataset('unittest/fringefit/gaincaltest2.ms', polcombtestms),)
+    outputs = (testout,)
 
-    def setUp(self):
-        if os.path.exists(self.polcombtestms):
-            shutil.rmtree(self.polcombtestms)
-        shutil.copytree(os.path.join(datapath, 'gaincaltest2.ms'), self.polcombtestms)
+    def setup(self):
+        manifest.stage(self)
 
-    def tearDown(self):
-        shutil.rmtree(self.polcombtestms)
-        if os.path.exists(self.testout):
-            shutil.rmtree(self.testout)
+    def teardown(self):
+        manifest.clean(self)
         
     def time_comb_all(self):
         """test_comb --- last part of the corrcomb test, check that results are coombined"""
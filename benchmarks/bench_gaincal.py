@@ -1,7 +1,9 @@
-import os, shutil
+import os
 from casatools import ctsys
 from casatasks import gaincal
 
+from .harness import manifest, tasklog
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (3, 6, 60.0) # between 3 and 6 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -13,31 +15,19 @@ class DataSetUp():
 
     datapath = ctsys.resolve('unittest/applycal/')
 
+    datasets = (
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms', 'gaincaltest2copy.ms', attr='vis'),
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms.G0', attr='compCal'),
+        manifest.Dataset('unittest/applycal/gaincaltest2.ms.T0', attr='tCal'),
+    )
+    cal = 'testoucal.cal'
+    outputs = (cal,)
+
     def setup_basic(self):
-        self.vis = 'gaincaltest2copy.ms'
-        self.compCal = 'gaincaltest2.ms.G0'
-        self.tCal = 'gaincaltest2.ms.T0'
-        self.cal = 'testoucal.cal'
-
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis)
-
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis)
-        if os.path.exists(self.compCal):
-            shutil.rmtree(self.compCal)
-        if os.path.exists(self.tCal):
-            shutil.rmtree(self.tCal)
-        if (os.path.exists(self.cal)):
-            shutil.rmtree(self.cal)
-
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms'), self.vis)
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms.G0'), self.compCal)
-        shutil.copytree(os.path.join(self.datapath, 'gaincaltest2.ms.T0'), self.tCal)
+        manifest.stage(self)
 
     def teardown_basic(self):
-        if os.path.exists(self.cal):
-            shutil.rmtree(self.cal)
+        manifest.clean(self)
 
 
 class FullGainCal(DataSetUp):
@@ -56,6 +46,33 @@ class FullGainCal(DataSetUp):
                 smodel=[1, 0, 0, 0], scan='0~9')
 
 
+class FullGainCalPhases(DataSetUp):
+    """
+    Time spent solving and writing the solutions in FullGainCal.time_gaincal_fullcal
+
+    gaincal runs once, in setup_cache; its phases are found in its log (see
+    benchmarks/harness/tasklog.py)
+    """
+    logfile = "gaincal_phases.log"
+
+    def setup_cache(self):
+        suite = FullGainCal()
+        suite.setup()
+        try:
+            return dict(tasklog.durations(tasklog.run(suite.time_gaincal_fullcal, self.logfile)))
+        finally:
+            suite.teardown()
+    # gaincal runs in setup_cache, which asv would otherwise give its default timeout
+    setup_cache.timeout = timeout
+
+    def track_phase(self, phases, phase):
+        """Seconds gaincal spent in a phase, NaN if the phase is not in its log"""
+        return phases.get(phase, float("nan"))
+    track_phase.params = ["setup", "solve", "write"]
+    track_phase.param_names = ["phase"]
+    track_phase.unit = "seconds"
+
+
 class MinSNRFlag(DataSetUp):
     """
     Benchmark Runtime when setting min SNR threshold
@@ -1,11 +1,11 @@
 
 import os
 import sys
-import shutil
 
-from casatools import ctsys
 from casatasks import importasdm, casalog
 
+from .harness import manifest, pagecache
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (1, 2, 30.0) # between 1 and 2 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -13,8 +13,6 @@ rounds = 1            # amount of instances a "repeat block" is run to collect s
 min_run_count = 1     # enforce the min_repeat * rounds setting is met
 timeout = 3600        # conservative 1hr hard cap for duration of a single test execution
 
-datapath = ctsys.resolve('unittest/importasdm/')
-
 # benchmarks grouped by ASDM used
 # original test name from test_task_importasdm.py indicated in quoted string after function def
 
@@ -22,14 +20,14 @@ class Basic():
     # the test code says this is an M51 ASDM but the source name and direction are for 1924-202, which is a quasar
     asdm_name = 'uid___X5f_X18951_X1'
     ms_name = asdm_name + '.ms'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions')
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        shutil.rmtree(self.ms_name+'.flagversions')
+        manifest.clean(self)
 
     def time_all_defaults(self):
         '''test_import2 --- importasdm with default arguments'''
@@ -51,17 +49,14 @@ class Evla():
     asdm_name = 'X_osro_013.55979.93803716435'
     ms_name = asdm_name + '.ms'
     cmdfile = ms_name.replace('.ms','_cmd.txt')
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions', cmdfile)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        if (os.path.exists(self.ms_name+'.flagversions')):
-            shutil.rmtree(self.ms_name+'.flagversions')
-        if (os.path.exists(self.cmdfile)):
-            os.remove(self.cmdfile)        
+        manifest.clean(self)
     
     def time_pc_true(self):
         '''test_evlatest1 - test of importing evla data, with_pointing_correction=True is normal for EVLA data'''
@@ -118,14 +113,14 @@ class Evla_ephemeris():
     # EVLA sdm with ephemeris
     asdm_name = 'polyuranus'
     ms_name = asdm_name + '.ms'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions')
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        shutil.rmtree(self.ms_name+'.flagversions')
+        manifest.clean(self)
     
     def time_polynomial_ephem(self):
         '''test_evlatest2 - test of importing evla data, test2: Good input asdm with polynomial ephemeris'''
@@ -139,17 +134,14 @@ class AutocorrASDM():
     asdm_name = 'AutocorrASDM'
     ms_name = asdm_name + '.ms'
     outfile = 'scanflags.txt'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions', outfile)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        if (os.path.exists(self.ms_name+'.flagversions')):
-            shutil.rmtree(self.ms_name+'.flagversions')
-        if os.path.exists(self.outfile):
-            os.remove(self.outfile)
+        manifest.clean(self)
     
     def time_savecmds_true(self):
         '''test_autocorr - importasdm: auto-correlations should be written to online flags'''
@@ -173,15 +165,14 @@ class Aca():
     # ACA with mixed pol/channelization
     asdm_name = 'uid___A002_X72bc38_X000'
     ms_name = asdm_name + '.ms'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions')
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        shutil.rmtree(self.ms_name+'.flagversions')
-               
+        manifest.clean(self)
     def time_default_lazy(self):
         '''test6_lazy1 - lazy fill: Test good ACA ASDM with mixed pol/channelization input with default filler in lazy mode'''
         importasdm(asdm=self.asdm_name, vis=self.ms_name, lazy=True, scans='0:1~3')
@@ -196,14 +187,14 @@ class Alma_12m():
     # 12m example with mixed pol/channelization
     asdm_name = 'uid___A002_X71e4ae_X317_short'
     ms_name = asdm_name + '.ms'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions')
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        shutil.rmtree(self.ms_name+'.flagversions')
+        manifest.clean(self)
 
     def time_default_lazy(self):
         '''test7_lazy1 - lazy fill: Test good 12 m ASDM with mixed pol/channelization input with default filler in lazy mode'''
@@ -239,14 +230,14 @@ class Singledish():
     # single dish
     asdm_name = 'uid___A002_X6218fb_X264'
     ms_name = asdm_name + '.ms'
+    datasets = (manifest.Dataset('unittest/importasdm/' + asdm_name),)
+    outputs = (ms_name, ms_name + '.flagversions')
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath,self.asdm_name), self.asdm_name)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.asdm_name)
-        shutil.rmtree(self.ms_name)
-        shutil.rmtree(self.ms_name+'.flagversions')
+        manifest.clean(self)
     
     def time_auto_only_lazy(self):
         '''test7_lazy5 - lazy fill : Test TP asdm with default filler in lazy mode selecting only AUTO data, writing to FLOAT_DATA'''        
@@ -259,3 +250,26 @@ class Singledish():
         importasdm(self.asdm_name, vis=self.ms_name, ocorr_mode="ao", lazy=False, bdfflags=True, applyflags=True)
     time_auto_only.version = 14114
 
+
+# the same benchmarks with the ASDM evicted from the page cache after it is staged in
+# setup, as it is read in production; the classes above read it from the page cache
+class Basic_cold(Basic):
+    page_cache = pagecache.COLD
+
+class Evla_cold(Evla):
+    page_cache = pagecache.COLD
+
+class Evla_ephemeris_cold(Evla_ephemeris):
+    page_cache = pagecache.COLD
+
+class AutocorrASDM_cold(AutocorrASDM):
+    page_cache = pagecache.COLD
+
+class Aca_cold(Aca):
+    page_cache = pagecache.COLD
+
+class Alma_12m_cold(Alma_12m):
+    page_cache = pagecache.COLD
+
+class Singledish_cold(Singledish):
+    page_cache = pagecache.COLD
@@ -1,12 +1,8 @@
-import os
-import shutil
-
 from casatasks import sdatmcor
 from casatasks.private.sdutil import table_manager
-from casatools import ctsys
 from casatools import ms as mstool
 
-ctsys_resolve = ctsys.resolve
+from .harness import manifest
 
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
@@ -15,16 +11,6 @@ rounds = 3            # amount of instances a "repeat block" is run to collect s
 min_run_count = 5     # enforce the min_repeat * rounds setting is met
 timeout = 3600        # conservative 1hr hard cap for duration of a single test execution
 
-def smart_remove(name):
-    if os.path.exists(name):
-        if os.path.isdir(name):
-            shutil.rmtree(name)
-        elif os.path.isfile(name):
-            os.remove(name)
-        else:
-            # could be a symlink
-            os.remove(name)
-
 def apply_gainfactor(name, spw, factor):
     ms = mstool()
     idx = ms.msseltoindex(name, spw=[int(spw)])
@@ -41,32 +27,27 @@ def apply_gainfactor(name, spw, factor):
             tsel.close()
 
 class test_sdatmcor():
-    datapath = ctsys_resolve('unittest/sdatmcor')
     infile = 'X320b_sel2.ms'
     infile2 = 'X320b_sel2_gainfactor.ms'
     outfile = infile + '.atmcor'
     caltable = infile + '.k2jycal'
+    datasets = (
+        manifest.Dataset('unittest/sdatmcor/' + infile),
+        manifest.Dataset('unittest/sdatmcor/' + infile, infile2),
+    )
+    outputs = (outfile, caltable)
 
     local_unit_test = False
 
-    def setUp(self):
-
-        smart_remove(self.infile)
-        smart_remove(self.infile2)
-        smart_remove(self.outfile)
-        smart_remove(self.caltable)
-        shutil.copytree(os.path.join(self.datapath, self.infile), self.infile)
-        shutil.copytree(os.path.join(self.datapath, self.infile), self.infile2)
+    def setup(self):
+        manifest.stage(self)
         # Gainfactor test set up
         gainfactor = {'19': 10.0, '23': 45.0}
         apply_gainfactor(self.infile2, 19, gainfactor['19'])
         apply_gainfactor(self.infile2, 23, gainfactor['23'])
 
-    def tearDown(self):
-        smart_remove(self.infile)
-        smart_remove(self.infile2)
-        smart_remove(self.outfile)
-        smart_remove(self.caltable)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_sdatmcor_normal(self):
         """Test normal usage of sdatmcor."""
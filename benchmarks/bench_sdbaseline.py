@@ -6,6 +6,8 @@ from casatools import ctsys, table
 from casatasks import sdbaseline
 from casatasks.private.sdutil import table_manager
 
+from .harness import manifest, staging, trash
+
 tb = table()
 ctsys_resolve = ctsys.resolve
 
@@ -139,10 +141,7 @@ class BaseSetup():
             from_name = from_path + "/" + name
             to_name = to_path + "/" + name
             if os.path.exists(from_name):
-                if os.path.isdir(from_name):
-                    shutil.copytree(from_name, to_name)
-                else:
-                    shutil.copyfile(from_name, to_name)
+                staging.stage(from_name, to_name)
                 if self.verboselog:
                     casalog.post("Copying '%s' FROM %s TO %s" % (name, from_path, to_path))
             else:
@@ -180,6 +179,7 @@ class Basic(BaseSetup):
     # Input and output names
     
     infile = 'OrionS_rawACSmod_calave.ms'
+    datasets = (manifest.Dataset('unittest/sdbaseline/' + infile),)
     infile_overwrite = 'OrionS_rawACSmod_calave_overwrite.ms'
     infile_no_remove = 'OrionS_rawACSmod_calave_no_remove.ms'
     outroot = BaseSetup.taskname+'_basictest'
@@ -204,10 +204,8 @@ class Basic(BaseSetup):
         sdbaseline(infile=self.infile_no_remove, outfile=self.outfile_no_remove, overwrite=False, datacolumn='float_data', blmode='fit', blformat=['text', 'table'])
         shutil.rmtree(self.outfile_no_remove)
 
-    def setUp(self):
-        if os.path.exists(self.infile):
-            shutil.rmtree(self.infile)
-        shutil.copytree(os.path.join(self.datapath,self.infile), self.infile)
+    def setup(self):
+        manifest.stage(self)
 
         if os.path.exists(self.infile+'_blparam.txt'):
             os.remove(self.infile+ '_blparam.txt')
@@ -216,9 +214,11 @@ class Basic(BaseSetup):
         if os.path.exists(self.infile+'_blparam.btable'):
             shutil.rmtree(self.infile+ '_blparam.btable')
 
-    def tearDown(self):
-        remove_files_dirs(self.infile)
-        remove_files_dirs(self.outroot)
+    def teardown(self):
+        # the products of the task (e.g. blparam files), then the working copy
+        trash.discard(self.infile + '?*')
+        trash.discard(self.outroot + '*')
+        manifest.clean(self)
         
     def no_remove_deco(func):
         def wrapper(self):
@@ -342,6 +342,7 @@ class Mask(BaseSetup):
     """
     # Input and output names
     infile = 'OrionS_rawACSmod_calave.ms'
+    datasets = (manifest.Dataset('unittest/sdbaseline/' + infile),)
     outroot = BaseSetup.taskname+'_masktest'
     blrefroot = os.path.join(BaseSetup.datapath,'refblparam_mask')
     tid = None
@@ -351,10 +352,8 @@ class Mask(BaseSetup):
     # Baseline channels. should be identical to one selected by 'auto' mode
     blchan2 = [[200,2959],[3120,7599]]
      
-    def setUp(self):
-        if os.path.exists(self.infile):
-            shutil.rmtree(self.infile)
-        shutil.copytree(os.path.join(self.datapath,self.infile), self.infile)
+    def setup(self):
+        manifest.stage(self)
 
         if os.path.exists(self.infile+'_blparam.txt'):
             os.remove(self.infile+ '_blparam.txt')
@@ -363,9 +362,11 @@ class Mask(BaseSetup):
         if os.path.exists(self.infile+'_blparam.btable'):
             shutil.rmtree(self.infile+ '_blparam.btable')
 
-    def tearDown(self):
-        remove_files_dirs(self.infile)
-        remove_files_dirs(self.outroot)
+    def teardown(self):
+        # the products of the task (e.g. blparam files), then the working copy
+        trash.discard(self.infile + '?*')
+        trash.discard(self.outroot + '*')
+        manifest.clean(self)
 
     def time_cspline_blfunc_masked_range_spectrum_edge(self):
         """sdbaseline: with masked ranges at the edges of spectrum. blfunc must be cspline. - test100"""
@@ -429,6 +430,7 @@ class OutBlTable(BaseSetup):
     """
     # Input and output names
     infile = 'OrionS_rawACSmod_calave.ms'
+    datasets = (manifest.Dataset('unittest/sdbaseline/' + infile),)
     infile_variable_a = 'OrionS_rawACSmod_calave_a.ms'
     infile_variable_b = 'OrionS_rawACSmod_calave_b.ms'
     infile_variable_c = 'OrionS_rawACSmod_calave_c.ms'
@@ -451,10 +453,8 @@ class OutBlTable(BaseSetup):
         self.modify_table(self.infile_variable_b, [0])
         self.modify_table(self.infile_variable_c, [1])
 
-    def setUp(self):
-        if os.path.exists(self.infile):
-            shutil.rmtree(self.infile)
-        shutil.copytree(os.path.join(self.datapath,self.infile), self.infile)
+    def setup(self):
+        manifest.stage(self)
 
         if os.path.exists(self.infile+'_blparam.txt'):
             os.remove(self.infile+ '_blparam.txt')
@@ -467,13 +467,10 @@ class OutBlTable(BaseSetup):
         
         self._createBlparamFile(blparam, self.blparam_order, self.blparam_dic, '')
 
-    def tearDown(self):
-        remove_single_file_dir(self.infile)
-        remove_files_dirs(self.outroot)
-        if (os.path.exists(self.infile)):
-            shutil.rmtree(self.infile)
-            
-        os.system('rm -rf ' + self.outroot + '*')
+    def teardown(self):
+        trash.discard(self.infile + '?*')
+        trash.discard(self.outroot + '*')
+        manifest.clean(self)
         
     def modify_table(self, file, ind):
         tb.open(tablename=file, nomodify=False)
@@ -598,11 +595,14 @@ class BlFuncVariable(BaseSetup):
     column='float_data'
     nspec = 4
     infile = 'analytic_variable.ms'
+    # staged by the benchmark itself, through _refetch_files
+    datasets = (manifest.Dataset('unittest/sdbaseline/' + infile),
+                manifest.Dataset('unittest/sdbaseline/analytic_variable_blparam.txt'))
     
-    def setUp(self):
+    def setup(self):
         pass
 
-    def tearDown(self):
+    def teardown(self):
         remove_files_dirs(os.path.splitext(self.infile)[0])
         remove_single_file_dir(self.outfile)
 
@@ -632,20 +632,21 @@ class UpdateWeight(BaseSetup):
     datapath = ctsys_resolve('unittest/sdbaseline/')
     infile = 'uid___A002_X6218fb_X264.ms'
     infile2 = 'analytic_order3_withoffset.ms'
+    datasets = (manifest.Dataset('unittest/sdbaseline/' + infile), manifest.Dataset('unittest/sdbaseline/' + infile2))
     outroot = BaseSetup.taskname+'_updateweighttest'
     outfile = outroot + '.ms'
     spw = '*:0~4499;6500~8191'
 
-    def setUp(self):
-        remove_files_dirs(self.infile)
-        shutil.copytree(os.path.join(self.datapath, self.infile), self.infile)
-        remove_files_dirs(self.infile2)
-        shutil.copytree(os.path.join(self.datapath, self.infile2), self.infile2)
+    def setup(self):
+        trash.discard(self.infile + '?*')
+        trash.discard(self.infile2 + '?*')
+        manifest.stage(self)
 
-    def tearDown(self):
-        remove_files_dirs(self.infile)
-        remove_files_dirs(self.infile2)
-        remove_files_dirs(self.outroot)
+    def teardown(self):
+        trash.discard(self.infile + '?*')
+        trash.discard(self.infile2 + '?*')
+        trash.discard(self.outroot + '*')
+        manifest.clean(self)
 
     def time_remove_weight_col(self):
         """sdbaseline: confirm if WEIGHT_SPECTRUM column is removed - test00"""
@@ -1,13 +1,14 @@
 import contextlib
 import os
 import re
-import shutil
 import unittest
 import numpy
-from casatools import ctsys, table
+from casatools import table
 from casatasks import sdcal, initweights
 from casatasks.private.sdutil import table_manager, table_selector
 
+from .harness import manifest
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (1, 2, 30.0) # between 1 and 2 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -15,9 +16,9 @@ rounds = 3            # amount of instances a "repeat block" is run to collect s
 min_run_count = 5     # enforce the min_repeat * rounds setting is met
 timeout = 3600        # conservative 1hr hard cap for duration of a single test execution
 
-# Data path of input
-datapath = ctsys.resolve('unittest/sdcal/')
-
+# The versions of the benchmarks below are their source hashes from before their inputs
+# were staged by the manifest, which does not change what they measure; pinning them
+# keeps their results history
 class Apply():
     """
     Runtime benchmark tests for task sdcal
@@ -25,17 +26,18 @@ class Apply():
     # Input and output data
     infile = 'uid___A002_X6218fb_X264.ms.sel'
     tsystable = 'tsystable'
+    datasets = (manifest.Dataset('unittest/sdcal/' + infile),)
+    outputs = (tsystable,)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
+        manifest.stage(self)
         # Create TSYS table
         sdcal(infile=self.infile, calmode='tsys', outfile=self.tsystable)
         # Run initweights on input MS
         initweights(vis=self.infile, wtmode='nyq', dowtsp=True)
 
     def teardown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.tsystable, ignore_errors=True)
+        manifest.clean(self)
 
     def time_spwmap_dict(self):
         """Test01: weight = 1/(SIGMA**2) X 1/(FPARAM_ave**2) dictionary version."""
@@ -43,6 +45,7 @@ class Apply():
         spwmap_dict = {1: [1], 3: [3], 5: [5], 7: [7]}
         sdcal(infile=self.infile, calmode='apply', spwmap=spwmap_dict,
               applytable=self.tsystable, outfile='')
+    time_spwmap_dict.version = "eca49a873b8027503c11a240f6e59585740e41ae697515593a11176fb2ab48da"
 
     def time_spwmap_list(self):
         """Test02: weight = 1/(SIGMA**2) X 1/(FPARAM_ave**2) list version."""
@@ -50,11 +53,13 @@ class Apply():
         spwmap_list = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16]
         sdcal(infile=self.infile, calmode='apply', spwmap=spwmap_list,
               applytable=self.tsystable, outfile='')
+    time_spwmap_list.version = "ec21f3f30b77cfea3de4710e9bff48d698654d8024e10d401465c714e2f96a39"
 
     def time_spwmap_dict_correct_data(self):
         """Test03: Validation of CORRECTED_DATA = DATA X FPARAM (spwmap={1:[1], 3:[3], 5:[5], 7:[7]})."""
         spwmap = {1: [1], 3: [3], 5: [5], 7: [7]}
         sdcal(infile=self.infile, calmode='apply', spwmap=spwmap, applytable=self.tsystable)
+    time_spwmap_dict_correct_data.version = "5d5dd55ee3170d7722bc51ded3a558d04fc83f79a9db111eacbd805111dcad70"
 
     def time_test05(self):
         """Test05: Validation of CORRECTED_DATA = DATA X FPARAM.
@@ -63,12 +68,14 @@ class Apply():
         """
         spwmap = {1: [9], 3: [11], 5: [13], 7: [15]}
         sdcal(infile=self.infile, calmode='apply', spwmap=spwmap, applytable=self.tsystable)
+    time_test05.version = "0c349e3cabc717e2018727f49142a43f1867aacefc7a32b74fea55c09cd43521"
 
     def time_spwmap_dict_weight_spectrum(self):
         """Test06: weight_spectrum = 1/(SIGMA**2) X 1/(FPARAMx**2) dictionary version."""
         spwmap_dict = {1: [1], 3: [3], 5: [5], 7: [7]}
         sdcal(infile=self.infile, calmode='apply', spwmap=spwmap_dict,
               applytable=self.tsystable, interp='nearest', outfile='')
+    time_spwmap_dict_weight_spectrum.version = "1158df62c77f3f40601226240f4c2b0a6910cf4d18c236a4f4a0181e7e689c1e"
 
 
 class PositionSwitch():
@@ -78,23 +85,24 @@ class PositionSwitch():
     # Input and output data
     infile = 'uid___A002_X6218fb_X264.ms.sel'
     applytable = infile + '.sky'
+    datasets = (manifest.Dataset('unittest/sdcal/' + infile),)
+    outputs = (applytable,)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
+        manifest.stage(self)
 
     def teardown(self):
-        if (os.path.exists(self.infile)):
-            shutil.rmtree(self.infile)
-        if os.path.exists(self.applytable):
-            shutil.rmtree(self.applytable)
+        manifest.clean(self)
 
     def time_ps_basic(self):
         """test_ps05 --- position switch calibration ('ps')."""
         sdcal(infile=self.infile, calmode='ps', outfile=self.applytable)
+    time_ps_basic.version = "b7be7f0ff76e3fe922cbeca2f39ba103e79e44de6d83b4b99be250473cbbbfee"
 
     def time_ps_selection(self):
         """test_ps06 --- position switch calibration ('ps') with data selection."""
         sdcal(infile=self.infile, calmode='ps', spw='9', outfile=self.applytable)
+    time_ps_selection.version = "c6f801e6c4a066a039b23af69d5fef7d2ff87044ac6f963b222b34644a63e410"
 
 
 class OTFRaster():
@@ -103,42 +111,50 @@ class OTFRaster():
     # Input and output data
     infile = 'uid___A002_X6218fb_X264.ms.sel.otfraster'
     outfile = 'uid___A002_X6218fb_X264.ms.sel.sky'
+    datasets = (manifest.Dataset('unittest/sdcal/' + infile),)
+    outputs = (outfile,)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.outfile, ignore_errors=True)
+        manifest.clean(self)
 
     def time_default(self):
         """test_otfraster07 --- OTF raster calibration ('otfraster') with default setting."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster')
+    time_default.version = "7b1cfc4dc086f0f79a3eb1aa50bd34c6e2fb2fe269bce47df997cfb8e78c6197"
 
     def time_fraction_string_numeric(self):
         """test_otfraster08 --- OTF raster calibration ('otfraster') with string fraction (numeric value)."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster', fraction='0.3')
+    time_fraction_string_numeric.version = "8e7b855976e9c451b5b3231e2ab52aeb3ec21c80edde166cc9c6ed70d310e202"
 
     def time_fraction_string_percentage(self):
         """test_otfraster09 --- OTF raster calibration ('otfraster') with string fraction (percentage)."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster', fraction='30%')
+    time_fraction_string_percentage.version = "99b8030521d84e0d5c0d814a2205f20bd9fd2c1cca59feff9cea414f8790c81b"
 
     def time_fraction_numeric(self):
         """test_otfraster10 --- OTF raster calibration ('otfraster') with numeric fraction."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster', fraction=0.3)
+    time_fraction_numeric.version = "9a1b91b89d7822ba87cb6acef313ffa79716c45ed9b6d7a6a307e452e7f2a76c"
 
     def time_autodetection(self):
         """test_otfraster11 --- OTF raster calibration ('otfraster') with auto detection."""
         sdcal(infile=self.infile, outfile=self.outfile,
                             calmode='otfraster', fraction=0, noff=0)
+    time_autodetection.version = "4ab1d39226973c46b69401fb6d1cdebad9f92dcffdb9e3e05a81a21353a46501"
 
     def time_noff_custom(self):
         """test_otfraster12 --- OTF raster calibration ('otfraster') with custom noff."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster', noff=3)
+    time_noff_custom.version = "b0d73553a431b883fcbd52935ecc5b25ca21ab6dcae20bd7943b107a3256a398"
 
     def time_noff_priority_over_fraction(self):
         """test_otfraster13 --- check if noff takes priority over fraction."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otfraster', fraction='90%', noff=3)
+    time_noff_priority_over_fraction.version = "2c5fb1d0dca19405b4dc976ff1992e112b24758c778b4bb23711529cc94a785d"
 
 
 class OTF():
@@ -148,42 +164,46 @@ class OTF():
     infile_squares = 'squares.dec60_cs.ms'
     infile_lissajous = 'lissajous.ms'
     infiles = [infile_squares, infile_lissajous]
-    ref_datapath = os.path.join(datapath, 'otf_reference_data')
     applytable = 'lissajous.edges_new_fraction_0.1.ms_caltable'
+    datasets = (
+        manifest.Dataset('unittest/sdcal/' + infile_squares),
+        manifest.Dataset('unittest/sdcal/' + infile_lissajous),
+        manifest.Dataset('unittest/sdcal/otf_reference_data/' + applytable),
+    )
 
     # Output data
     outfile = 'test_otf.caltable'
+    outputs = (outfile,)
 
     def setup(self):
-        for infile in self.infiles:
-            shutil.copytree(os.path.join(datapath, infile), infile)
-        shutil.copytree(os.path.join(self.ref_datapath, self.applytable), self.applytable)
+        manifest.stage(self)
 
     def teardown(self):
-        for infile in self.infiles:
-            shutil.rmtree(infile, ignore_errors=True)
-        shutil.rmtree(self.outfile, ignore_errors=True)
-        shutil.rmtree(self.applytable, ignore_errors=True)
+        manifest.clean(self)
 
     def time_otf01(self):
         """test_otf01 --- Compute calibration table. calmode='otf' ms=squares.dec60_cs.ms."""
         sdcal(infile=self.infile_squares, calmode='otf', fraction='10%', noff=-1, width=0.5, elongated=False,
               applytable='', interp='', spwmap={}, outfile=self.outfile, overwrite=False, field='', spw='')
+    time_otf01.version = "73890f5299363c64dc00df3929185044042aecbf7528479fdd2048b07bae4e5a"
 
     def time_otf02(self):
         """test_otf02 --- Compute calibration table. calmode='otf' ms=squares.dec60_cs.ms edges_fraction=20%."""
         sdcal(infile=self.infile_squares, calmode='otf', fraction=0.2, noff=-1, width=0.5, elongated=False,
               applytable='', interp='', spwmap={}, outfile=self.outfile, overwrite=False, field='', spw='')
+    time_otf02.version = "d3f6cfeb66f0f58a7c7af4db78f37b6cb55b571f9a99cacd26c26271231c9eb9"
 
     def time_otf03(self):
         """test_otf03 --- Compute calibration table. calmode='otf' ms=lissajous.ms."""
         sdcal(infile=self.infile_lissajous, calmode='otf', fraction='10%', noff=-1, width=0.5,
               elongated=False, applytable='',interp='', spwmap={}, outfile=self.outfile, overwrite=False)
+    time_otf03.version = "943238908dd59e211bdf634348dd5f42ac03ffc10488f932e3c34bde04cb2ff9"
 
     def time_otf04(self):
         """test_otf04 --- Compute calibration table. calmode='otf' ms=lissajous.ms edges_fraction=20%."""
         sdcal(infile=self.infile_lissajous, calmode='otf', fraction='20%', noff=-1, width=0.5, elongated=False,
               applytable='',interp='', spwmap={}, outfile=self.outfile, overwrite=False, field='')
+    time_otf04.version = "2a260b2487f65ee23665c8bedd0c4148bc2e3d6f36d6a332f015d755bbf015e1"
 
     # To be checked
     def time_otf05(self):
@@ -191,16 +211,19 @@ class OTF():
         # In the original test it runs sdcal() twice, first with calmode=apply and then with otf,apply
         sdcal(infile=self.infile_squares, calmode='otf,apply', fraction='10%', noff=-1, width=0.5,
               elongated=False, applytable='', interp='', spwmap={}, outfile='', overwrite=False)
+    time_otf05.version = "4a19756f66b7ef9544328df9520128cd57da97e46f6c462cbd508c850951500b"
 
     def time_otf06(self):
         """test_otf06 --- Sky calibration reusing caltable pre-computed with calmode='otf'. calmode='apply' ms=lissajous.ms."""
         sdcal(infile=self.infile_lissajous, calmode='apply', fraction='10%', noff=-1, width=0.5,
               elongated=False, applytable=self.applytable, interp='', spwmap={}, outfile='', overwrite=False)
+    time_otf06.version = "522a3b5d1d1fdabe2ba018b8273e019b5eddafc14dfdbf7f95daec034fb5f4aa"
 
     def time_otf07(self):
         """test_otf07 --- Sky calibration + Tsys conversion, composite calmode='otf,tsys,apply'. ms=lissajous.ms."""
         sdcal(infile=self.infile_lissajous, calmode='otf,tsys,apply', fraction='10%', noff=-1, width=0.5, elongated=False,
               applytable='', interp='', spwmap={}, outfile='', overwrite=False, field='', spw='', scan='', intent='')
+    time_otf07.version = "748ba7dd3174afcf0e776988ea8b438690c52ce4db2c52cd38f4008560cb2781"
 
 
 class OTF_Ephemeris():
@@ -212,17 +235,19 @@ class OTF_Ephemeris():
 
     # Output data
     outfile = infile + '.otfcal'
+    datasets = (manifest.Dataset('unittest/sdcal/' + infile),)
+    outputs = (outfile,)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.outfile, ignore_errors=True)
+        manifest.clean(self)
 
     def time_otf_ephem(self):
         """test_otfephem01: Sky calibration of 'otf' mode for ephemeris object."""
         sdcal(infile=self.infile, outfile=self.outfile, calmode='otf')
+    time_otf_ephem.version = "ab9adf8942dfdd994dd3781f749699fa9662bf58575015560e5daa006f34b730"
 
     def test_otf_apply_ephem(self):
         """test_otfephem02: On-the-fly application of 'otf' calibration mode for ephemeris object."""
@@ -258,43 +283,51 @@ class Apply_Interp():
     # Input
     infile = 'uid___A002_X6218fb_X264.ms.sel'
     applytable = infile + '.sky'
+    datasets = (
+        manifest.Dataset('unittest/sdcal/' + infile),
+        manifest.Dataset('unittest/sdcal/' + applytable),
+    )
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
-        shutil.copytree(os.path.join(datapath, self.applytable), self.applytable)
+        manifest.stage(self)
 
     def teardown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.applytable, ignore_errors=True)
+        manifest.clean(self)
 
     def time_linear(self):
         """test_apply_sky08 --- apply data (linear)."""
         sdcal(infile=self.infile, calmode='apply',applytable=[self.applytable], interp='linear')
+    time_linear.version = "078d836c355da5773813afc9b5b3f5b9b5af4c7441926882bed13a33c8eb89f1"
 
     def time_linear_spw_selection(self):
         """test_apply_sky09 --- apply selected data."""
         self.result = sdcal(infile=self.infile, calmode='apply', applytable=[
                             self.applytable], spw='9', interp='linear')
+    time_linear_spw_selection.version = "bbc0db0908cc81aff108d4e7635e5be7320ff855384a176dc974409e67acf6dc"
 
     def time_nearest(self):
         """test_apply_sky10 --- apply data (nearest)."""
         self.result = sdcal(infile=self.infile, calmode='apply',
                             applytable=[self.applytable], interp='nearest')
+    time_nearest.version = "a3f87e4523727137a12fa96c6ca02b6d24325a73c3cc7b1ed699768a9e8f8b83"
 
     def time_linear_linearflag(self):
         """test_apply_sky11 --- apply data (linearflag for frequency interpolation)."""
         sdcal(infile=self.infile, calmode='apply', applytable=[
                             self.applytable], interp='linear,linearflag')
+    time_linear_linearflag.version = "42bdfd6f7ae95d7cf1b6a99a5ea926b0c5ef23326aa25e525ffed5720eb087e3"
 
     def time_linear_nearestflag(self):
         """test_apply_sky12 --- apply data (nearestflag for frequency interpolation)."""
         sdcal(infile=self.infile, calmode='apply', applytable=[
                             self.applytable], interp='linear,nearestflag')
+    time_linear_nearestflag.version = "7b666aed07e5ff1d2684ae9c5af455f2ed84aaea7a5f31e8814fd23ef31161a1"
 
     def time_interp_empty(self):
         """test_apply_sky14 --- apply data (interp='')."""
         self.result = sdcal(infile=self.infile, calmode='apply',
                             applytable=self.applytable, interp='')
+    time_interp_empty.version = "d701d56a9753f8ad50dbc76d44d4b658680d8c7c02f8f475620f691fbac607ce"
 
     def fill_weightspectrum(func):
         import functools
@@ -324,10 +357,14 @@ class Apply_Modified_Tsys():
     infile = 'uid___A002_X6218fb_X264.ms.sel'
     applytable = infile + '.sky'
     tsystable = 'tsystable'
+    datasets = (
+        manifest.Dataset('unittest/sdcal/' + infile),
+        manifest.Dataset('unittest/sdcal/' + applytable),
+    )
+    outputs = (infile + '.tsys',)
 
     def setup(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
-        shutil.copytree(os.path.join(datapath, self.applytable), self.applytable)
+        manifest.stage(self)
         # generate Tsys table
         self.tsystable = self.infile.rstrip('/') + '.tsys'
         try:
@@ -338,10 +375,7 @@ class Apply_Modified_Tsys():
             
 
     def teardown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.applytable, ignore_errors=True)
-        if os.path.exists(self.tsystable):
-            shutil.rmtree(self.tsystable, ignore_errors=True)
+        manifest.clean(self)
 
     def _modify_tsys(self, mytsys=100.0):
         with table_manager(self.infile, nomodify=False) as tb:
@@ -392,6 +426,7 @@ class Apply_Modified_Tsys():
     def time_apply_sky_normal(self):
         """test_apply_composite00 --- on-the-fly application of sky table ('ps,apply')."""
         sdcal(infile=self.infile, calmode='ps,apply')
+    time_apply_sky_normal.version = "9156519f2fd7ea628cdc9bd83ff8300424ede18396aabf47374e2269671763f1"
 
     @modify_tsys
     #@normal_case(tsys=100.0)
@@ -399,6 +434,7 @@ class Apply_Modified_Tsys():
         """test_apply_composite01 --- on-the-fly application of sky table with existing Tsys table."""
         sdcal(infile=self.infile, calmode='ps,apply', applytable=self.tsystable,
               spwmap={1: [9], 3: [11]})
+    time_preapply_tsys.version = "98d92f7d22040c3043807a62e0870768ef9b5093d9e054752f82069890feeb6b"
 
     @modify_tsys
     #@normal_case(tsys=100.0)
@@ -406,6 +442,7 @@ class Apply_Modified_Tsys():
         """test_apply_composite02 --- on-the-fly application of sky and tsys tables ('ps,tsys,apply')."""
         sdcal(infile=self.infile, calmode='ps,tsys,apply',
               spwmap={1: [9], 3: [11]})
+    time_apply_sky_tsys.version = "d0b7e9739bae796f78bb578757177ac7aad7d83dd613adf15dfc3629a1f8e11a"
 
     @modify_tsys
     #@normal_case(tsys=100.0)
@@ -413,6 +450,7 @@ class Apply_Modified_Tsys():
         """test_apply_composite03 --- on-the-fly application of sky table ('otfraster,apply')."""
         sdcal(infile=self.infile, calmode='tsys,apply', applytable=self.applytable,
               spwmap={1: [9], 3: [11]})
+    time_apply_sky.version = "a2e30839f58f4d7cae58ebed88e373ca0266cb545998f2cdc9bd9e99c86a3bb4"
 
 
 class sdcal_test_single_polarization():
@@ -425,28 +463,31 @@ class sdcal_test_single_polarization():
                                         on single-polarization data
     """
 
-    datapath = ctsys.resolve('unittest/sdcal/')
     # Input
     infile = 'analytic_spectra.ms'
     outfile = 'sdcalout.cal'
+    datasets = (manifest.Dataset('unittest/sdcal/' + infile),)
+    outputs = (outfile,)
 
-    def setUp(self):
-        shutil.copytree(os.path.join(datapath, self.infile), self.infile)
+    def setup(self):
+        manifest.stage(self)
 
-    def tearDown(self):
-        shutil.rmtree(self.infile, ignore_errors=True)
-        shutil.rmtree(self.outfile, ignore_errors=True)
+    def teardown(self):
+        manifest.clean(self)
 
     def time_single_pol_ps(self):
         """test_single_pol_ps --- generate caltable for single-polarization data."""
         sdcal(infile=self.infile, calmode='ps', outfile=self.outfile)
+    time_single_pol_ps.version = "4e55128473bdf00218cb5fd33d6a7c9e00e1779f913ec0f11008a756dbc973be"
 
     def time_single_pol_apply(self):
         """test_single_pol_apply --- apply caltable to single-polarization data."""
         # Generate ouput file for apply case
         sdcal(infile=self.infile, calmode='ps', outfile=self.outfile)
         sdcal(infile=self.infile, calmode='apply', applytable=self.outfile)
+    time_single_pol_apply.version = "a191063314c95b694fc29c97d3e0dccb94184c2aa1aa185ac280f091ed025233"
 
     def time_single_pol_apply_composite(self):
         """test_single_pol_apply_composite --- on-the-fly calibration/application on single-polarization data."""
         sdcal(infile=self.infile, calmode='ps,apply')
+    time_single_pol_apply_composite.version = "b7552259dc52ed23dd95af462d5d9ef0a35d33f2f79af3ecb6eabd3b97e147ff"
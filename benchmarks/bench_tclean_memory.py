@@ -1,9 +1,9 @@
-from collections import OrderedDict
-import re, os, shutil
+import os, shutil
 from casatools import ctsys
-from casatasks import casalog
 from casatasks import tclean
 from casatestutils.imagerhelpers import TestHelpers
+
+from .harness import manifest, memprofile, staging, trash
 th = TestHelpers()
 
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
@@ -31,21 +31,20 @@ class BaseTcleanSetup():
     def prepData(self, msname=""):
         if msname != "":
             self.msfile = msname
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+        manifest.stage(self, self.msfile)
 
 
 class MemorySingleField(BaseTcleanSetup):
     """Peak memory benchmarking tests for tclean on single field"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_point_withline.ms', writable=False),)
+
     def setup(self):
         self.prepData("refim_point_withline.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def peakmem_cube_standard_fullsummary(self):
         """tclean: single field cube with fullsummary parameter - test_iterbot_cube_fullsummary_true"""
@@ -55,14 +54,15 @@ class MemorySingleField(BaseTcleanSetup):
 
 class MemoryMultiField(BaseTcleanSetup):
     """Peak memory benchmarking tests for tclean on multiple fields"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_twopoints_twochan.ms', writable=False),)
+
     def setup(self):
         self.prepData("refim_twopoints_twochan.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def peakmem_multifield_mfs_hogbom(self):
         """tclean : Two fields, both mfs - test_multifield_both_mfs"""
@@ -96,6 +96,8 @@ class MemoryMultiField(BaseTcleanSetup):
 
 class MemoryWideField(BaseTcleanSetup):
     """Peak memory benchmarking tests of tclean on widefield using mosaic gridder with cube mode"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_oneshiftpoint.mosaic.ms', writable=False),)
+
     def setup(self):
         self.prepData('refim_oneshiftpoint.mosaic.ms')
 
@@ -113,14 +115,15 @@ class MemoryWideField(BaseTcleanSetup):
 
 class MemoryWideFieldAWP(BaseTcleanSetup):
     """Peak memory benchmarking tests of tclean on widefield using awproject"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_mawproject.ms'),)
+
     def setup(self):
         self.prepData("refim_mawproject.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def peakmem_mfs_awproject_hogbom(self):
         """tclean: MFS with narrowband AWProjection - test_widefield_aproj_mfs"""
@@ -156,6 +159,7 @@ class MemorySetWeighting:
 
     # assign our test dataset
     datapath = os.path.join(dataroot, input_ms)
+    datasets = (manifest.Dataset(datapath, writable=False, attr="datapath"),)
 
     templogfile = "tclean_memprofile.log"
 
@@ -172,7 +176,8 @@ class MemorySetWeighting:
     def setup(self):
         ## fresh copy of the test MS to the tmp directory where tests are run ?
         # shutil.copytree(os.path.join(self.dataroot, self.input_ms),os.path.join(os.getcwd(), self.input_ms))
-        pass
+        # read the MS in place, from local disk when the dataset cache is enabled
+        manifest.stage(self)
         # note: creating objects in setup method confounds memory benchmarks
         # (https://asv.readthedocs.io/en/stable/writing_benchmarks.html#memory)
 
@@ -215,77 +220,63 @@ class MemorySetWeighting:
         """Adapted from CAS-8755
         https://open-bitbucket.nrao.edu/projects/CASA/repos/casa6/browse/casatests/performance/test_perf_tclean_mem_setweighting.py?at=refs%2Fheads%2FCAS-13026#166-225
 
-        Requires user configuration ~/.casa/rc to contain `synthesis.imager.memprofile.enable: 1`
+        Requires user configuration ~/.casa/rc to contain `synthesis.imager.memprofile.enable: 1`,
+        or CASABENCH_MEMPROFILE=1 in the environment of asv
         Expected output is casa.synthesis.imager.memprofile.PID.HOSTNAME.DATE_TIME_when_test_started.txt
         """
-        casalog.setlogfile(self.templogfile)
-        tclean(
-            vis=self.datapath,
-            imagename=self.imagename,
-            phasecenter=self.phasecenter,
-            scan=["17,11,13"],
-            restoration=False,
-            datacolumn="data",
-            pbcor=False,
-            spw="0",
-            weighting="briggs",
-            intent="OBSERVE_TARGET#ON_SOURCE",
-            threshold="0mJy",
-            robust=0.5,
-            savemodel="none",
-            imsize=self.imsize,
-            stokes="I",
-            nchan=self.nchan,
-            deconvolver="hogbom",
-            field="Pillar_3",
-            npixels=0,
-            niter=0,
-            pblimit=0.2,
-            restoringbeam=[],
-            cell=["0.94arcsec"],
-            start="230.490186515GHz",
-            outframe="LSRK",
-            specmode="cube",
-            width="0.0610478663509MHz",
-            gridder="mosaic",
-            parallel=False,
-        )
-
-        with open(self.templogfile) as mylog:
-            for line in mylog:
-                a_match = re.search("casa.synthesis.imager.memprofile", line)
-                if a_match:
-                    str_match = a_match.string
-                    break
-
-        # Get name of memprofile created by tclean
-        (start, middle, end) = str_match.partition("casa.synthesis.imager.memprofile")
-        mem_profile = middle + end.rstrip()
-
-        # Get the memory values of the second column named MemRSS_(VmRSS)_MB, for each row
-        with open(mem_profile, "r") as mfile:
-            memdict = OrderedDict()
-            maxFDSize = 0
-            for myrow in mfile:
-                linelist = []
-                print(myrow.rstrip())
-                if myrow.startswith("#"):
-                    continue
-
-                linelist = myrow.split(",")
-                tclean_step = str(linelist[-1].rstrip())
-                memdict[tclean_step.strip("[]")] = int(linelist[1])
-                maxFDSize = max(maxFDSize, int(linelist[7]))
-
-        return maxFDSize
+        # the same tclean run as peakmem_tclean_setweighting
+        profile = memprofile.capture(self.peakmem_tclean_setweighting, self.templogfile)
+        return profile.peak("fds")
     track_file_descriptors_cubemode_mosaic_briggs.version = "CAS-13924"
     track_file_descriptors_cubemode_mosaic_briggs.unit = "file descriptors"
 
     def teardown(self):
         # remove the data products generated by the task
-        os.system("rm -rf memtest_*")
-        shutil.rmtree(self.input_ms, ignore_errors=True)
+        trash.discard("memtest_*")
+        staging.release(self.input_ms)
         try:
             os.remove(os.path.join(os.getcwd(), self.templogfile))
         except FileNotFoundError:
             pass
+
+class MemprofileSetWeighting:
+    """
+    Peak memory and file descriptors per imager stage of the MemorySetWeighting tclean run
+
+    tclean runs once, in setup_cache, and the track_ methods report the stages of its
+    memprofile (see benchmarks/harness/memprofile.py), so that a memory regression can be
+    attributed to weighting, PSF, major or minor cycles. Needs the imager memprofile:
+    CASABENCH_MEMPROFILE=1, or `synthesis.imager.memprofile.enable: 1` in ~/.casa/rc;
+    the suite is skipped without it.
+    """
+
+    timeout = 10000
+    datasets = MemorySetWeighting.datasets
+
+    def setup_cache(self):
+        manifest.stage(self)
+        suite = MemorySetWeighting()
+        suite.datapath = self.datapath
+        try:
+            profile = memprofile.capture(suite.peakmem_tclean_setweighting, suite.templogfile)
+        except memprofile.MemprofileError as exc:
+            # asv skips the benchmarks of a suite whose setup raises NotImplementedError
+            raise NotImplementedError(str(exc))
+        finally:
+            suite.teardown()
+        return profile.stages()
+    setup_cache.timeout = 10000
+
+    def track_stage_memory(self, stages, stage, quantity):
+        """Peak resident set (rss) and its high water mark (hwm) during an imager stage"""
+        return stages.get(stage, {}).get(quantity, float("nan"))
+    track_stage_memory.params = (list(memprofile.STAGES), ["rss", "hwm"])
+    track_stage_memory.param_names = ["stage", "quantity"]
+    track_stage_memory.unit = "MB"
+
+    def track_stage_file_descriptors(self, stages, stage):
+        """Peak number of open file descriptors during an imager stage"""
+        return stages.get(stage, {}).get("fds", float("nan"))
+    track_stage_file_descriptors.params = list(memprofile.STAGES)
+    track_stage_file_descriptors.param_names = ["stage"]
+    track_stage_file_descriptors.unit = "file descriptors"
@@ -1,8 +1,9 @@
-import re, os, shutil
-from casatools import ctsys
+import re, os
 from casatasks import casalog, delmod, tclean
 from casatestutils.imagerhelpers import TestHelpers
 
+from .harness import manifest, staging, tasklog, trash
+
 th = TestHelpers()
 
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
@@ -12,9 +13,6 @@ rounds = 3            # amount of instances a "repeat block" is run to collect s
 min_run_count = 3     # enforce the min_repeat * rounds setting is met
 timeout = 3600        # conservative 1hr hard cap for duration of a single test execution
 
-# Test datasets; root directory is read from config.py
-datapath = ctsys.resolve("unittest/tclean/")
-
 class BaseTcleanSetup():
     epsilon = 0.05
     cfcache = 'cfcach'
@@ -30,30 +28,26 @@ class BaseTcleanSetup():
     def prepData(self, msname=""):
         if msname != "":
             self.msfile = msname
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
-        shutil.copytree(os.path.join(datapath, self.msfile), self.msfile)
+        manifest.stage(self, self.msfile)
 
-    # Cache data for awproject tests
+    # Cache data for awproject tests; the suite declares the cfcache in its datasets,
+    # e.g. manifest.Dataset('unittest/tclean/cfcach'), so it is restored between samples
     def prepCfcache(self,cfcache=""):
-        if (os.path.exists(self.cfcache)):
-            os.system('rm -rf ' + self.cfcache)
         if cfcache !="":
             self.cfcache=cfcache
-        if (os.path.exists(self.cfcache)):
-            os.system('rm -rf ' + self.cfcache)
-        shutil.copytree(os.path.join(datapath,self.cfcache), self.cfcache)
+        manifest.stage(self, self.cfcache)
 
 class TcleanSingleField(BaseTcleanSetup):
     """Runtime benchmarking tests for tclean on single fields"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_twochan.ms', writable=False),)
+
     def setup(self):
         self.prepData('refim_twochan.ms')
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_mfs_standard_clark(self):
         """tclean: mfs with clark minor cycle - test_onefield_clark"""
@@ -99,14 +93,15 @@ class TcleanSingleField(BaseTcleanSetup):
 
 class TcleanMultiField(BaseTcleanSetup):
     """Runtime benchmarking tests for tclean on multiple fields"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_twopoints_twochan.ms', writable=False),)
+
     def setup(self):
         self.prepData("refim_twopoints_twochan.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_multifield_mfs_hogbom(self):
         """tclean : Two fields, both mfs - test_multifield_both_mfs"""
@@ -140,6 +135,8 @@ class TcleanMultiField(BaseTcleanSetup):
 
 class TestWideField(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean on widefield using mosaic gridder with cube mode"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_oneshiftpoint.mosaic.ms', writable=False),)
+
     def setup(self):
         self.prepData('refim_oneshiftpoint.mosaic.ms')
 
@@ -169,14 +166,15 @@ class TestWideField(BaseTcleanSetup):
 
 class TcleanWideFieldAWP(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean on widefield using awproject"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_mawproject.ms'),)
+
     def setup(self):
         self.prepData("refim_mawproject.ms")
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_mfs_awproject_hogbom(self):
         """tclean: MFS with narrowband AWProjection - test_widefield_aproj_mfs"""
@@ -202,14 +200,15 @@ class TcleanWideFieldAWP(BaseTcleanSetup):
 
 class TcleanCube(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean cube"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_point.ms', writable=False),)
+
     def setup(self):
         self.prepData('refim_point.ms')
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_cube_standard_hogbom(self):
         """tclean: mosaic cube with Hogbom deconvolver -  test_cube_0"""
@@ -233,16 +232,45 @@ class TcleanCube(BaseTcleanSetup):
                         specmode='cube', deconvolver='clark', niter=10, threshold='0.75Jy', fullsummary=True, parallel=False)
     time_cube_standard_fullsummary.version = "CAS-13924"
 
+class TcleanCubePhases:
+    """
+    Time spent in each tclean stage of TcleanCube.time_cube_standard_hogbom
+
+    tclean runs once, in setup_cache, and its stages are found in its log (see
+    benchmarks/harness/tasklog.py), to tell whether a change of the cube timings is in
+    the PSF, the major (gridding) or the minor cycles
+    """
+    datasets = TcleanCube.datasets
+    logfile = "tclean_phases.log"
+
+    def setup_cache(self):
+        suite = TcleanCube()
+        suite.setup()
+        try:
+            return dict(tasklog.durations(tasklog.run(suite.time_cube_standard_hogbom, self.logfile)))
+        finally:
+            suite.teardown()
+    # tclean runs in setup_cache, which asv would otherwise give its default timeout
+    setup_cache.timeout = timeout
+
+    def track_phase(self, phases, phase):
+        """Seconds tclean spent in a stage, NaN if the stage is not in its log"""
+        return phases.get(phase, float("nan"))
+    track_phase.params = ["setup", "psf", "primary_beam", "major_cycle", "minor_cycle", "restore"]
+    track_phase.param_names = ["phase"]
+    track_phase.unit = "seconds"
+
 class TcleanEphemeris(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean ephemeris object imaging"""
+    datasets = (manifest.Dataset('unittest/tclean/venus_ephem_test.ms', writable=False),)
+
     def setup(self):
         self.prepData('venus_ephem_test.ms')
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_eph_singlefield_standard_mfs(self):
         """single field (standard gridder), mfs mode - test_onefield_mfs_eph"""
@@ -270,16 +298,17 @@ class TcleanEphemeris(BaseTcleanSetup):
 
 class TcleanMoldelVis(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean with saving model column"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_twochan.ms'),)
+
     def setup(self):
         self.prepData("refim_twochan.ms")
         delmod(self.msfile)
         th.delmodels(self.msfile, modcol='delete')
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_mfs_modelcolumn(self):
         """tclean: mfs mode saving a model column - test_modelvis_2"""
@@ -298,14 +327,15 @@ class TcleanMoldelVis(BaseTcleanSetup):
 
 class TcleanStokes(BaseTcleanSetup):
     """Runtime benchmarking tests of tclean with Stokes imaging"""
+    datasets = (manifest.Dataset('unittest/tclean/refim_point_linRL.ms', writable=False),)
+
     def setup(self):
         self.prepData('refim_point_linRL.ms')
 
     def teardown(self):
-        os.system('rm -rf ' + self.img_subdir)
-        os.system('rm -rf ' + self.img + '*')
-        if (os.path.exists(self.msfile)):
-            os.system('rm -rf ' + self.msfile)
+        trash.discard(self.img_subdir)
+        trash.discard(self.img + '*')
+        staging.release(self.msfile)
 
     def time_mfs_stokes_IV(self):
       """tclean: mfs with stokes IV - test_stokes_mfs_IV"""
@@ -2,6 +2,8 @@ import os, shutil, glob
 from casatools import ctsys
 from casatasks import tsdimaging as sdimaging
 
+from .harness import manifest
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = (3, 6, 60.0) # between 3 and 6 iterations per round w/ soft cutoff (start no new repeats) past 1m
@@ -17,30 +19,16 @@ class DataSetUp():
         self.vis = "sdimaging_copy.ms"
         self.out = "sdimagingTest.im"
 
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis, ignore_errors=True)
-
-        existing_images = [ff for ff in glob.glob(self.out+"*")]
-        for fname in existing_images:
-            os.system(f"rm -rf {fname}")
-
         # working with a copy of the input MS in all cases to avoid column writes
-        shutil.copytree(os.path.join(self.datapath, 'sdimaging.ms'), self.vis)
+        manifest.stage(self)
 
     def setup_ephemeris(self):
         self.vis = 'ephemtest.spw18_copy.ms'
         self.ephtab = self.vis + '/FIELD/EPHEM0_Sol_58327.6.tab'
         self.out = 'sdimagingTest_eph.im'
 
-        if os.path.exists(self.vis):
-            shutil.rmtree(self.vis, ignore_errors=True)
-
-        existing_images = [ff for ff in glob.glob(self.out+"*")]
-        for fname in existing_images:
-            os.system(f"rm -rf {fname}")
-
         # working with a copy of the input MS in all cases to avoid column writes
-        shutil.copytree(os.path.join(self.datapath, 'ephemtest.spw18.ms'), self.vis)
+        manifest.stage(self)
 
 class Basic(DataSetUp):
     """
@@ -48,6 +36,9 @@ class Basic(DataSetUp):
     Adapted from test_task_tsdimaging.py; test100 - test405
     (most of the tests with meaningful output that use sdimaging.ms)
     """
+    datasets = (manifest.Dataset('unittest/tsdimaging/sdimaging.ms', 'sdimaging_copy.ms'),)
+    outputs = ('sdimagingTest.im*',)
+
     def setup(self):
         self.setup_basic()
 
@@ -107,6 +98,9 @@ class Ephemeris(DataSetUp):
     Adapted from test_task_tsdimaging.py; test_ephemeris_notset, test_ephemeris_sun,
     test_ephemeris_trackf, test_ephemeris_table
     """
+    datasets = (manifest.Dataset('unittest/tsdimaging/ephemtest.spw18.ms', 'ephemtest.spw18_copy.ms'),)
+    outputs = ('sdimagingTest_eph.im*',)
+
     def setup(self):
         self.setup_ephemeris()
 
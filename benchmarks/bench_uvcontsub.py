@@ -1,8 +1,9 @@
-import os, shutil
+import os
 import numpy
-from casatools import ctsys
 from casatasks import uvcontsub
 
+from .harness import manifest, trash
+
 # ASV iteration control (https://asv.readthedocs.io/en/stable/benchmarks.html#benchmark-attributes)
 number = 1            # i.e., always run the setup and teardown methods
 repeat = 5            # fixed at 5 iterations per round, no range or soft cutoff
@@ -10,92 +11,91 @@ rounds = 1            # single instance of a "repeat block" is run to collect sa
 min_run_count = 5     # enforce the min_repeat * rounds setting is met, plus some extra
 timeout = 1800        # conservative 0.5hr hard cap for duration of a single test execution
 
-# Input data sets
-datapath = ctsys.resolve("unittest/uvcontsub/")
 ms_simple = 'known0.ms'
-datapath_simple = ctsys.resolve(os.path.join(datapath, ms_simple))
 
 # SPW 1 of this dataset has 1 channel
 ms_alma = 'uid___X02_X3d737_X1_01_small.ms'
-datapath_alma = ctsys.resolve(os.path.join(datapath, ms_alma))
 
 # MS for tests that use CORRECTED_DATA
 # Beware: this is all flagged!
 ms_corr = 'uid___A002_X71a45c_X1d24.ms.split'
-datapath_corr = ctsys.resolve(os.path.join(datapath, ms_corr))
 
 # Another MS for tests that use CORRECTED_DATA
 ms_papersky = 'papersky_standard.ms'
-datapath_papersky = ctsys.resolve(os.path.join(datapath, ms_papersky))
 
 # Mixed polarizations, from CAS-12283. This MS has ~60 SPWs with very mixed pols
 ms_mixed_pols = 'split_ddid_mixedpol_CAS-12283.ms'
-datapath_mixed_pols = ctsys.resolve(os.path.join(datapath, ms_mixed_pols))
 
 class BaseClassSetup():
-    # Cannot cleanup files copied by this method
-    def setup_cache(self):
-        shutil.copytree(datapath_simple, ms_simple)
-        shutil.copytree(datapath_alma, ms_alma)
-        shutil.copytree(datapath_corr, ms_corr)
-        shutil.copytree(datapath_papersky, ms_papersky)
-        shutil.copytree(datapath_mixed_pols, ms_mixed_pols)
-
-class Basic():
-    """
-    Runtime benchmark tests for uvcontsub basic functionality
-    """
-    def setup_cache(self):
-        shutil.copytree(datapath_simple, ms_simple)
-        shutil.copytree(datapath_alma, ms_alma)
-        shutil.copytree(datapath_corr, ms_corr)
-        shutil.copytree(datapath_papersky, ms_papersky)
-        shutil.copytree(datapath_mixed_pols, ms_mixed_pols)
+    # Input MSs are always strictly read-only: linked from the dataset cache (a working
+    # copy restored between samples without it), and checked for writes after every sample
+    datasets = tuple(manifest.Dataset(os.path.join("unittest/uvcontsub", name), writable=False)
+                     for name in (ms_simple, ms_alma, ms_corr, ms_papersky, ms_mixed_pols))
 
     def setup(self):
-        # Input MS is always strictly read-only, one copy in setup_cache is enough
+        manifest.stage(self)
         # Default output name for simple tests
         self.output = 'test_uvcs_output.ms'
 
     def teardown(self):
-        if os.path.exists(self.output):
-            shutil.rmtree(self.output)
+        trash.discard(self.output)
+        manifest.clean(self)
+
+# The versions of the benchmarks below are their source hashes from before their inputs
+# were staged by the manifest, which does not change what they measure; pinning them
+# keeps their results history
+class Basic(BaseClassSetup):
+    """
+    Runtime benchmark tests for uvcontsub basic functionality
+    """
 
     def time_makes_output_ms_data(self):
         uvcontsub(vis=ms_simple, outputvis=self.output)
+    time_makes_output_ms_data.version = "0f51dc9c6b96c74c4dbd8c11f8388a28712b70fcf187ab98cfd821e516aa90d3"
 
     def time_select_field(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='2')
+    time_select_field.version = "1886548da1c74441518ea6cdbc2ed5b6fa259fcb2fcec3d4e5df5c1e0b1c865d"
 
     def time_select_spw(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, spw='1')
+    time_select_spw.version = "cf736c29415ea590041754714b678dd26b800a40ab3134c319bac8dbe12600dd"
 
     def time_select_spw_mismatching_fitspec(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, spw='1', fitspec='0')
+    time_select_spw_mismatching_fitspec.version = "158ef3ee6006d0930dc734a45cceab1d358d189bb5c2da6fba1f21528b7d587a"
 
     def time_select_scan(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, scan='2')
+    time_select_scan.version = "6fe8f7df4455762e4e5bc08a95d1cd7417fd105e9c5aa51272d28f53c7696b9b"
 
     def time_select_intent(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, intent='*AMPLI*')
+    time_select_intent.version = "b87258a05737dcccf486624392643fc288a6a2c8474c205ece3cb80d87d202eb"
 
     def time_select_array(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, array='0')
+    time_select_array.version = "ea3c135bafff1459cbc837162309e4b6ae3fece4a6be027a4df51bdda97ab7fb"
 
     def time_select_observation(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, observation='0')
+    time_select_observation.version = "a6b18c12fe61a940c0ecbdcfa89944ed0e091b8b4d4198b17c345a9f3c4c4c4b"
 
     def time_datacolumn(self):
         uvcontsub(vis=ms_corr, outputvis=self.output, datacolumn='CORRECTED')
+    time_datacolumn.version = "8de4cfdf0dc3bf0bed17e8d3988ba003ec80e4ec5f8c98958fb4cc44bea1f96b"
 
     def time_fitspec_empty(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitspec='')
+    time_fitspec_empty.version = "1162b94dcdcd8c1468b01cce5b33eee0e86e593f92e9f394436369c566e59d03"
 
     def time_fitspec_spws(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitspec='0')
+    time_fitspec_spws.version = "ab9cf480d9ce00340dbf39ac9cbc14a74a1bb716c43bfffc6322b5af7020a160"
 
     def time_fitspec_spw_one_chan(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='0', fitspec='1')
+    time_fitspec_spw_one_chan.version = "9c251da305a5aa0f63a2a75105ca215862963f9d11cc4a6b695cf8a702dcdc84"
 
     def time_fitspec_dict_fitspec_one_chan(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='0',
@@ -103,6 +103,7 @@ class Basic():
                                  {'1': {'chan': '',
                                         'fitorder': 0}}
                         })
+    time_fitspec_dict_fitspec_one_chan.version = "68512d1a0bce4206afd18b13bd2704c6ac07ee1ef9a1e0652600336643789aab"
 
     def time_fitspec_dict_fitspec_one_chan_order1(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='0',
@@ -110,6 +111,7 @@ class Basic():
                                  {'1': {'chan': '',
                                         'fitorder': 1}}
                         })
+    time_fitspec_dict_fitspec_one_chan_order1.version = "69adae3d962899abd6303be60d0a44ddd656a8b72910418f80f587da540cd78c"
 
     def time_fitspec_dict_select_spw_mismatching(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='0', spw='1',
@@ -123,9 +125,11 @@ class Basic():
                                  {'0': {'chan': '1~33;56~119',
                                         'fitorder': 1}}
                         })
+    time_fitspec_dict_select_spw_mismatching.version = "faa5b02f1961d7e57a2431ef5fb58c23bade435413dd1890f34460c73f7a6c61"
 
     def time_fitspec_channels(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitspec='0:5~19')
+    time_fitspec_channels.version = "211807ad73464bccf9f2d9954603775df109fd39308249c8f0a8be8468d0d504"
 
     def time_fitspec_multifield(self):
         uvcontsub(vis=ms_alma, outputvis=self.output,
@@ -136,6 +140,7 @@ class Basic():
                             '2': {'0': {'chan': '100~1903',
                                         'fitorder': 0}}
                         })
+    time_fitspec_multifield.version = "2200609258dcdd47db8e8f5ad4d0e55a502812ffa3624f3a48358904d23ad6a0"
 
     def time_fitspec_multifield_blocks(self):
         uvcontsub(vis=ms_alma, outputvis=self.output,
@@ -145,6 +150,7 @@ class Basic():
                             '2': {'0': {'chan': '100~1903',
                                         'fitorder': 0}}
                         })
+    time_fitspec_multifield_blocks.version = "99f4e00c2743d33e8c1c353c1cadc351fcea655f7878133259e3365e398f5abf"
 
     def time_fitspec_multifield_multispw_diff_fitorder(self):
         uvcontsub(vis=ms_alma, outputvis=self.output,
@@ -157,6 +163,7 @@ class Basic():
                                  '2': {'0': {'chan': '100~1903',
                                              'fitorder': 2}}
                         })
+    time_fitspec_multifield_multispw_diff_fitorder.version = "1884692bb3e4d160ac28dfe708bf2b0bf06f9d75589fca4f1688c9abadfc948c"
 
     def time_fitspec_multifield_fields_sel(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='1,2',
@@ -165,61 +172,76 @@ class Basic():
                                  '2': {'0': {'chan': '100~1903',
                                              'fitorder': 0}}
                         })
+    time_fitspec_multifield_fields_sel.version = "c5a598b1002088c1224c744c4cc7865f8d7583a29b35f620b379ea9b8c7f6ef5"
 
     def time_fitspec_separate_fields(self):
         uvcontsub(vis=ms_alma, outputvis=self.output, field='1',
                            fitspec='0:100~500;600~910;1215~1678;1810~1903')
+    time_fitspec_separate_fields.version = "cf05e60ae71d4af643accde4c61a2ae44cf1a783edf0ce36a95fee1cb106b923"
 
     def time_fitspec_spws_sel(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, spw='0', fitspec='0')
+    time_fitspec_spws_sel.version = "33ec54a7a626bd87b33c1f5ed0b20762be14e0e6a17f4bc6076f269384958cf8"
 
     def time_fitmethod_gsl(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitmethod='gsl')
+    time_fitmethod_gsl.version = "0d8fee718ac26b9dcd2c95fe20e8b4254e1125c0ea176bce6dbeeb7b1414efce"
 
     def time_fitmethod_casacore(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitmethod='casacore')
+    time_fitmethod_casacore.version = "dfb214a4421164ab4c380082077ebe9f5d3903a3c5c171837c379819feae42ea"
 
     def time_fitorder1(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitorder=1,
                         fitspec='0:2~20')
+    time_fitorder1.version = "8fd68c9b3e632dd7b26ef564729b42105fc47f1779e544fae389d5adc08e98e7"
 
     def time_fitorder2(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitorder=2,
                         fitspec='0:2~20')
+    time_fitorder2.version = "3114172327fd2768029d264e578ebde390247d280c059d46d578da04ef3ea9b8"
 
     def time_fitspec_dict_fitorder1(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitorder=1,
                         fitspec={'0': {'0': {'chan': '2~20',
                                              'fitorder': 1}}
                         })
+    time_fitspec_dict_fitorder1.version = "788bb7c38a92579219296d435a9f8831a5e8600ec97baf7c70505174b4112826"
 
     def time_fitspec_dict_fitorder2(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, fitorder=2,
                         fitspec={'0': {'0': {'chan': '2~20',
                                              'fitorder': 2}}
                         })
+    time_fitspec_dict_fitorder2.version = "c2d39c9e5d998c65266f1496a25fb286d7e9394bb9c3764d4a6890f796e54ef3"
 
     def time_fitspec3_spws_fitorder0(self):
         uvcontsub(vis=ms_mixed_pols, outputvis=self.output, fitorder=0,
                                 fitspec='3')
+    time_fitspec3_spws_fitorder0.version = "9d83a87c6ebaa6f3b9bbd80256e790db10fdaad1d7869f1801bda6f548548816"
 
     def time_fitspec_spwschans_fitorder3(self):
         uvcontsub(vis=ms_mixed_pols, outputvis=self.output, fitorder=3,
                                 fitspec='4:50~503;600~850;900~1002')
+    time_fitspec_spwschans_fitorder3.version = "fa14ea078998aaba67b8acd52f7693a1bbdd7d1f273ce738bd3959de96ce8c71"
 
     def time_writemodel(self):
         uvcontsub(vis=ms_simple, outputvis=self.output, writemodel=True)
+    time_writemodel.version = "84ee71017eadec38583d3c0e1539ed8d9af22f22a326abf0e4730b08fe77142d"
 
     def time_writemodel_from_corrected(self):
         uvcontsub(vis=ms_papersky, outputvis=self.output, datacolumn='CORRECTED',
                         writemodel=True)
+    time_writemodel_from_corrected.version = "49f06856290be0914b13df703b42f5742c7d8d6c65041f711909ffe6bb54b038"
 
     def time_writemodel_from_corrected_all_flagged(self):
         uvcontsub(vis=ms_corr, outputvis=self.output, datacolumn='CORRECTED',
                         writemodel=True)
+    time_writemodel_from_corrected_all_flagged.version = "bb9609826a0e5903041743e876e9c1130f97601a78f33da3d9171171b66d44bc"
 
     def time_mixed_pols(self):
         uvcontsub(vis=ms_mixed_pols, outputvis=self.output)
+    time_mixed_pols.version = "90b6d31e3a0ee607357ff1720317395dc6ee5269a5e70d651ef0ef9c727c3878"
 
 
 class Numerical():
@@ -233,38 +255,40 @@ class Numerical():
     ms_cont_noise_order_1 = 'sim_alma_cont_poly_order_1_noise.ms'
     sim_mss = [ms_cont_nonoise_order_0, ms_cont_noise_order_0,
                ms_cont_nonoise_order_1, ms_cont_noise_order_1]
-
-    def setup_cache(self):
-        for sim in self.sim_mss:
-            datapath_sim = ctsys.resolve(os.path.join(datapath, sim))
-            shutil.copytree(datapath_sim, sim)
+    # Input MSs are always strictly read-only, as in BaseClassSetup
+    datasets = tuple(manifest.Dataset(os.path.join("unittest/uvcontsub", sim), writable=False)
+                     for sim in sim_mss)
 
     def setup(self):
-        # Input MS is always strictly read-only, one copy in setUpClass is enough
+        manifest.stage(self)
         # Default output name for simple tests
         self.output = 'test_numerical_uvcs_output.ms'
         self.fitspec = '0:0~59;86~127'
 
     def teardown(self):
-        if os.path.exists(self.output):
-            shutil.rmtree(self.output)
+        trash.discard(self.output)
+        manifest.clean(self)
 
     def time_sim_specline_nonoise_pol_0(self):
         """ Check fitting of continuum as polynomial order 0"""
         uvcontsub(vis=self.ms_cont_nonoise_order_0, outputvis=self.output,
                         fitorder=0, fitspec=self.fitspec)
+    time_sim_specline_nonoise_pol_0.version = "a06063282ce6f0ecae2282332b977438de648778798aab364359767983f41fac"
 
     def time_sim_specline_noise_pol_0(self):
         """ Check fitting of continuum as polynomial order 0"""
         uvcontsub(vis=self.ms_cont_noise_order_0, outputvis=self.output,
                         fitorder=0, fitspec=self.fitspec)
+    time_sim_specline_noise_pol_0.version = "a3dc88dff98704afaa2065680f87615524f3c67b46d920634e59c82d0f4cf406"
 
     def time_sim_specline_nonoise_pol_1(self):
         """ Check fitting of continuum as polynomial order 1"""
         uvcontsub(vis=self.ms_cont_nonoise_order_1, outputvis=self.output,
                         fitorder=1, fitspec=self.fitspec)
+    time_sim_specline_nonoise_pol_1.version = "0574b1e7222ff924033c48c38b27199dd8addd98dcec9671894b820ef6ec72d2"
 
     def time_sim_specline_noise_pol_1(self):
         """ Check fitting of continuum as polynomial order 1. Gaussian noise included"""
         uvcontsub(vis=self.ms_cont_noise_order_1, outputvis=self.output,
                         fitorder=1, fitspec=self.fitspec)
+    time_sim_specline_noise_pol_1.version = "4b6fc8f71c9d351593ef5059ab3339340b3e8aab807d18261c20224c22fd0b9c"
@@ -1,13 +1,13 @@
-from collections import OrderedDict
-import re, os, shutil
+import os, shutil
 from casatools import ctsys
-from casatasks import casalog
 from casatasks import flagdata
 from casatasks import gaincal
 from casatasks import applycal
 from casatasks import tclean
 from casatasks import bandpass
 
+from .harness import memprofile, staging, trash
+
 
 class tclean_memory_suite:
     """
@@ -86,77 +86,22 @@ class tclean_memory_suite:
 
         https://open-bitbucket.nrao.edu/projects/CASA/repos/casa6/browse/casatests/performance/test_perf_tclean_mem_setweighting.py?at=refs%2Fheads%2FCAS-13026#166-225
 
-        Requires user configuration ~/.casa/rc to contain `synthesis.imager.memprofile.enable: 1`
+        Requires user configuration ~/.casa/rc to contain `synthesis.imager.memprofile.enable: 1`,
+        or CASABENCH_MEMPROFILE=1 in the environment of asv
         Expected output is casa.synthesis.imager.memprofile.PID.HOSTNAME.DATE_TIME_when_test_started.txt
         """
         # attribute for tracking metric
         unit = "file descriptors"
 
-        casalog.setlogfile(self.templogfile)
-        tclean(
-            vis=self.datapath,
-            imagename=self.imagename,
-            phasecenter=self.phasecenter,
-            scan=["17,11,13"],
-            restoration=False,
-            datacolumn="data",
-            pbcor=False,
-            spw="0",
-            weighting="briggs",
-            intent="OBSERVE_TARGET#ON_SOURCE",
-            threshold="0mJy",
-            robust=0.5,
-            savemodel="none",
-            imsize=self.imsize,
-            stokes="I",
-            nchan=self.nchan,
-            deconvolver="hogbom",
-            field="Pillar_3",
-            npixels=0,
-            niter=0,
-            pblimit=0.2,
-            restoringbeam=[],
-            cell=["0.94arcsec"],
-            start="230.490186515GHz",
-            outframe="LSRK",
-            specmode="cube",
-            width="0.0610478663509MHz",
-            gridder="mosaic",
-            interactive=False,
-            parallel=False,
-        )
-
-        with open(self.templogfile) as mylog:
-            for line in mylog:
-                a_match = re.search("casa.synthesis.imager.memprofile", line)
-                if a_match:
-                    str_match = a_match.string
-                    break
-
-        # Get name of memprofile created by tclean
-        (start, middle, end) = str_match.partition("casa.synthesis.imager.memprofile")
-        mem_profile = middle + end.rstrip()
-
-        # Get the memory values of the second column named MemRSS_(VmRSS)_MB, for each row
-        with open(mem_profile, "r") as mfile:
-            memdict = OrderedDict()
-            maxFDSize = 0
-            for myrow in mfile:
-                linelist = []
-                print(myrow.rstrip())
-                if myrow.startswith("#"):
-                    continue
-
-                linelist = myrow.split(",")
-                tclean_step = str(linelist[-1].rstrip())
-                memdict[tclean_step.strip("[]")] = int(linelist[1])
-                maxFDSize = max(maxFDSize, int(linelist[7]))
-
-        return maxFDSize
+        # the same tclean run as peakmem_tclean_setweighting
+        profile = memprofile.capture(self.peakmem_tclean_setweighting, self.templogfile)
+        return profile.peak("fds")
+    # version pinned to the source hash from before harness.memprofile, keeping result history
+    track_tclean_file_descriptors_cubemode_mosaic_briggs.version = "f9c40e4b16d7caf92b2d5a831995e197fae67947f0ec9bdad00b852f28656239"
 
     def teardown(self):
         # remove the data products generated by the task
-        os.system("rm -rf memtest_*")
+        trash.discard("memtest_*")
         shutil.rmtree(self.input_ms, ignore_errors=True)
         try:
             os.remove(os.path.join(os.getcwd(), self.templogfile))
@@ -294,24 +239,16 @@ class calibration_suite:
         # iterations per sample
         self.number = 2
 
-        # fresh copy of the test MS to the tmp directory where tests are run
-        shutil.copytree(
-            os.path.join(self.dataroot, self.input_ms),
-            os.path.join(os.getcwd(), self.input_ms),
-        )
+        # fresh working copy of the test MS in the tmp directory where tests are run
+        staging.stage(os.path.join(self.dataroot, self.input_ms))
 
-        # Copy the callibrary (and associated tables) into temporary test directory
-        shutil.copyfile(
-            os.path.join(self.dataroot, self.applycal_library),
-            os.path.join(os.getcwd(), self.applycal_library),
-        )
+        # Stage the callibrary (and associated tables) into temporary test directory
+        staging.stage(os.path.join(self.dataroot, self.applycal_library))
 
+        # gaincal and bandpass write gaincal_table and bandpass_table; staging restores
+        # only the files they changed in the previous sample
         for st in self.library_subtables:
-            if not os.path.exists(st):
-                shutil.copytree(
-                    os.path.join(self.dataroot, st), os.path.join(os.getcwd(), st)
-                )
-        # Redundant to copy gaincal_table explicitly unless it changes
+            staging.stage(os.path.join(self.dataroot, st))
 
     def time_applycal_callib(self):
         """Taken from the hifa_bandpassflag step of ALMA pipeline run 2019.1.01056.S_2021_07_20T07_45_18.149/
@@ -342,6 +279,8 @@ class calibration_suite:
             applymode="calflagstrict",
             flagbackup=False,
         )
+    # versions pinned to the source hashes from before setup used harness.staging, keeping result history
+    time_applycal_callib.version = "25f369e7a681d0d6ccb62c48d6a227c1fa45a7e9f79792f60a3fd40a6997e2e2"
 
     def time_gaincal(self):
         """Taken from the hifa_bandpassflag step of ALMA pipeline run 2019.1.01056.S_2021_07_20T07_45_18.149/
@@ -388,6 +327,7 @@ class calibration_suite:
             spwmap=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 16, 18, 20, 22, 16, 16, 18, 18, 20, 20, 22,],
             parang=False,
         )
+    time_gaincal.version = "a5eafd63e34c53ae63cd3949f23f8acc371d5751a08dcd1681914bf7c0723779"
 
     def time_bandpass(self):
         """Taken from the hifa_bandpassflag step of ALMA pipeline run 2019.1.01056.S_2021_07_20T07_45_18.149/"""
@@ -415,9 +355,10 @@ class calibration_suite:
                 [],
             ],
         )
+    time_bandpass.version = "3ab2720c5ee4aa0f74882ac18410ea0ab34d6e7f1e940421a993d057380f2fdb"
 
     def teardown(self):
-        # remove the data products generated by the setup methods and the task
-        os.remove(self.applycal_library)
-        shutil.rmtree(self.gaincal_table, ignore_errors=True)
-        shutil.rmtree(self.input_ms, ignore_errors=True)
+        # keep the working copies, the next setup restores what the task modified
+        staging.release(self.input_ms)
+        for st in self.library_subtables:
+            staging.release(st)
@@ -0,0 +1,6 @@
+"""
+Shared harness for the casabench suites
+
+Helpers in this package manage test data and measurements around the benchmarked
+task calls; they never appear inside the measured region themselves.
+"""
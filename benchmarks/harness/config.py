@@ -0,0 +1,270 @@
+"""
+Runtime configuration of the benchmark harness
+
+Settings are read from environment variables so that they can differ per host (or
+per Bamboo plan) without editing asv.conf.json.
+"""
+import json
+import os
+import re
+import sys
+
+
+def harness_dir(*parts):
+    """Directory for harness state and side files, created on demand
+
+    Defaults to .casabench/ next to asv.conf.json; override with CASABENCH_HARNESS_DIR
+    """
+    root = os.environ.get("CASABENCH_HARNESS_DIR")
+    if not root:
+        root = os.path.join(os.environ.get("ASV_CONF_DIR", os.getcwd()), ".casabench")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# procfs, where the command line of the asv process is found
+_PROC = "/proc"
+
+
+def results_dir():
+    """asv results directory: the results_dir of the running asv command (see
+    asv_results_dir), else CASABENCH_RESULTS_DIR, else results/ next to asv.conf.json"""
+    return asv_results_dir() or os.environ.get("CASABENCH_RESULTS_DIR") or \
+        os.path.join(os.environ.get("ASV_CONF_DIR", os.getcwd()), "results")
+
+
+def published_results_dir():
+    """results_dir of asv.conf.json, the results that are published"""
+    conf_dir = os.environ.get("ASV_CONF_DIR", os.getcwd())
+    return os.path.join(conf_dir, _load_asv_conf(os.path.join(conf_dir, "asv.conf.json")).get(
+        "results_dir", "results"))
+
+
+def asv_results_dir():
+    """results_dir that the asv command running this process writes to, None outside asv
+
+    asv passes neither its config file (asv run --config) nor the results_dir in it to
+    the benchmarks, so both are read from the command line of the asv process, an
+    ancestor of the benchmark process (found through /proc, so on Linux only). Relative
+    paths are relative to the directory asv was started in.
+    """
+    command = _asv_command()
+    if command is None:
+        return None
+    cwd, args = command
+    path = None
+    for i, arg in enumerate(args):
+        if arg == "--config" and i + 1 < len(args):
+            path = args[i + 1]
+        elif arg.startswith("--config="):
+            path = arg[len("--config="):]
+    if path is None:
+        path = next((name for name in ("asv.conf.json", "asv.conf.jsonc")
+                     if os.path.exists(os.path.join(cwd, name))), "asv.conf.json")
+    conf = _load_asv_conf(os.path.join(cwd, path))
+    return os.path.join(cwd, conf.get("results_dir", "results"))
+
+
+def _asv_command():
+    """(working directory, arguments after 'asv') of the nearest asv ancestor process"""
+    pid = os.getppid()
+    while pid > 1:
+        try:
+            with open(os.path.join(_PROC, str(pid), "cmdline"), "rb") as fp:
+                argv = fp.read().decode(errors="replace").split("\0")
+            with open(os.path.join(_PROC, str(pid), "status")) as fp:
+                parent = int(re.search(r"^PPid:\s*(\d+)", fp.read(), re.M).group(1))
+        except (OSError, AttributeError, ValueError):
+            return None
+        # asv, python .../asv (the script run by its interpreter) or python -m asv
+        if os.path.basename(argv[0]) == "asv":
+            start = 1
+        elif len(argv) > 1 and os.path.basename(argv[1]) == "asv":
+            start = 2
+        elif argv[1:3] == ["-m", "asv"]:
+            start = 3
+        else:
+            pid = parent
+            continue
+        try:
+            return os.readlink(os.path.join(_PROC, str(pid), "cwd")), argv[start:]
+        except OSError:
+            return None
+    return None
+
+
+def _load_asv_conf(path):
+    try:
+        with open(path) as fp:
+            # asv allows // comment lines
+            return json.loads(re.sub(r"(?m)^\s*//.*$", "", fp.read()))
+    except (OSError, ValueError):
+        return {}
+
+
+def check_profiling():
+    """Raise ValueError if CASABENCH_PROFILE or CASABENCH_FLAMEGRAPH is set while asv
+    writes to the published results directory
+
+    Profiled samples run slower, and asv stores their timings like any others, so a
+    profiling run has to use an asv config with its own results_dir (e.g. asv run
+    --config asv.profile.conf.json). The results_dir is the one of the running asv
+    command (see asv_results_dir), or CASABENCH_RESULTS_DIR where that is unknown.
+    """
+    modes = [name for name in ("CASABENCH_PROFILE", "CASABENCH_FLAMEGRAPH")
+             if os.environ.get(name, "").strip()]
+    if not modes:
+        return
+    actual = asv_results_dir() or os.environ.get("CASABENCH_RESULTS_DIR")
+    if not actual or os.path.realpath(actual) == os.path.realpath(published_results_dir()):
+        raise ValueError("{} inflate the timings; run asv with a config whose results_dir is "
+                         "not {}".format(" and ".join(modes), published_results_dir()))
+
+
+def current_benchmark():
+    """Name of the asv benchmark being set up or run by the caller, None outside asv
+
+    asv_runner calls setup and the benchmark function from methods of its Benchmark
+    objects, which are found by walking up the stack.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        obj = frame.f_locals.get("self")
+        if hasattr(obj, "_setups") and isinstance(getattr(obj, "name", None), str):
+            return obj.name
+        frame = frame.f_back
+    return None
+
+
+def staging_mode():
+    """How working copies are materialized: 'auto', 'reflink' or 'copy'
+
+    auto    -- reflink where supported, else hard link what is never written (datasets
+               in the dataset cache only), else copy
+    reflink -- reflink where supported, else copy
+    copy    -- always copy (the behaviour of shutil.copytree)
+    """
+    mode = os.environ.get("CASABENCH_STAGING", "auto").lower()
+    if mode not in ("auto", "reflink", "copy"):
+        raise ValueError("CASABENCH_STAGING must be one of auto, reflink, copy; got " + mode)
+    return mode
+
+
+def copy_threads():
+    """Number of files copied concurrently when staging (CASABENCH_COPY_THREADS, default 8)"""
+    return max(1, int(os.environ.get("CASABENCH_COPY_THREADS", min(8, os.cpu_count() or 1))))
+
+
+def parse_bytes(text):
+    """Parse a byte count such as '500M' or '2T' (binary multiples)"""
+    text = str(text).strip().upper().rstrip("B").rstrip("I")
+    scale = 1
+    if text and text[-1] in "KMGT":
+        scale = 1024 ** ("KMGT".index(text[-1]) + 1)
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def cache_dir():
+    """Root of the local dataset cache (CASABENCH_CACHE_DIR), None when disabled"""
+    path = os.environ.get("CASABENCH_CACHE_DIR")
+    if not path:
+        return None
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_bytes():
+    """Size budget of the dataset cache (CASABENCH_CACHE_BYTES, default 100G)"""
+    return parse_bytes(os.environ.get("CASABENCH_CACHE_BYTES", "100G"))
+
+
+def prefetch_enabled():
+    """Whether upcoming datasets are fetched into the cache ahead of time (CASABENCH_PREFETCH)
+
+    On by default whenever the dataset cache is enabled; set CASABENCH_PREFETCH=0 to disable.
+    """
+    return cache_dir() is not None and os.environ.get("CASABENCH_PREFETCH", "1") != "0"
+
+
+def prefetch_ahead():
+    """Number of upcoming benchmarks whose datasets are prefetched (CASABENCH_PREFETCH_AHEAD)"""
+    return int(os.environ.get("CASABENCH_PREFETCH_AHEAD", "3"))
+
+
+def prefetch_rate():
+    """Read bandwidth allowed to the prefetcher in bytes/s (CASABENCH_PREFETCH_RATE, default 50M)"""
+    return parse_bytes(os.environ.get("CASABENCH_PREFETCH_RATE", "50M"))
+
+
+def workspace_dir():
+    """Memory-backed directory for benchmark workspaces (CASABENCH_WORKSPACE_DIR), None when disabled"""
+    path = os.environ.get("CASABENCH_WORKSPACE_DIR")
+    if not path:
+        return None
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def workspace_bytes():
+    """Largest workspace placed in memory (CASABENCH_WORKSPACE_BYTES, default 4G)"""
+    return parse_bytes(os.environ.get("CASABENCH_WORKSPACE_BYTES", "4G"))
+
+
+def sample_interval():
+    """Seconds between /proc samples of the measured region (CASABENCH_SAMPLE_INTERVAL)
+
+    0, the default, disables the resource sampler.
+    """
+    return float(os.environ.get("CASABENCH_SAMPLE_INTERVAL", "0"))
+
+
+def page_cache():
+    """Page cache state of the measured region, 'warm' or 'cold' (CASABENCH_PAGE_CACHE)
+
+    cold evicts the data of a benchmark from the page cache at the end of its setup;
+    benchmarks with a cache parameter choose per sample instead.
+    """
+    state = os.environ.get("CASABENCH_PAGE_CACHE", "warm").lower()
+    if state not in ("warm", "cold"):
+        raise ValueError("CASABENCH_PAGE_CACHE must be one of warm, cold; got " + state)
+    return state
+
+
+def perf_counters_enabled():
+    """Whether perf_event counters are read around the measured region (CASABENCH_PERF_COUNTERS=1)"""
+    return os.environ.get("CASABENCH_PERF_COUNTERS", "0") != "0"
+
+
+def profile_patterns():
+    """Benchmarks whose measured call is profiled with cProfile (CASABENCH_PROFILE)
+
+    A comma separated list of fnmatch patterns of benchmark names, or 1 for the
+    Python-heavy suites; empty, the default, profiles nothing.
+    """
+    return [p.strip() for p in os.environ.get("CASABENCH_PROFILE", "").split(",") if p.strip()]
+
+
+def flamegraph_patterns():
+    """Benchmarks whose measured call is sampled with perf (CASABENCH_FLAMEGRAPH)
+
+    A comma separated list of fnmatch patterns of benchmark names, or 1 for the
+    C++-heavy suites; empty, the default, samples nothing.
+    """
+    return [p.strip() for p in os.environ.get("CASABENCH_FLAMEGRAPH", "").split(",") if p.strip()]
+
+
+def flamegraph_frequency():
+    """perf sampling frequency in Hz (CASABENCH_FLAMEGRAPH_FREQUENCY, default 99)"""
+    return int(os.environ.get("CASABENCH_FLAMEGRAPH_FREQUENCY", "99"))
+
+
+def flamegraph_callgraph():
+    """perf stack unwinding method, dwarf, fp or lbr (CASABENCH_FLAMEGRAPH_CALLGRAPH, default dwarf)"""
+    return os.environ.get("CASABENCH_FLAMEGRAPH_CALLGRAPH", "dwarf")
+
+
+def memprofile_enabled():
+    """Whether tclean writes its imager memory profile (CASABENCH_MEMPROFILE=1)"""
+    return os.environ.get("CASABENCH_MEMPROFILE", "0") != "0"
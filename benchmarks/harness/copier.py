@@ -0,0 +1,79 @@
+"""
+File copies for staging, without the per-file overheads of shutil.copytree
+
+Large files are copied with copy_file_range(2), which lets the kernel (or an NFS 4.2
+server) move the data without a round trip through user space, falling back to
+sendfile(2) and finally to a read/write loop. copy_many() runs copies on a thread pool
+so that the hundreds of small files of a casacore table do not serialize on syscall
+latency while the large TSM files stream.
+"""
+import concurrent.futures
+import errno
+import os
+import shutil
+
+from . import config
+
+# files below this size go through shutil.copyfile, where setup costs dominate
+LARGE_FILE = 1 << 20
+
+# copy at most this many bytes per copy_file_range/sendfile call
+_CHUNK = 1 << 30
+
+# errno values meaning "this syscall cannot copy between these two files"
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTSUP}
+
+
+def copy_file(src, dst):
+    """Copy the contents and metadata of src to dst (like shutil.copy2), returning its size"""
+    size = os.stat(src).st_size
+    if size < LARGE_FILE:
+        shutil.copyfile(src, dst)
+    else:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            _copy_range(fsrc, fdst, size)
+    shutil.copystat(src, dst)
+    return size
+
+
+def copy_many(function, items, threads=None):
+    """Apply function to every item on a thread pool, returning the results in order
+
+    The first exception raised by function is re-raised once all calls have finished.
+    """
+    items = list(items)
+    threads = config.copy_threads() if threads is None else threads
+    if threads <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix="stage") as pool:
+        return list(pool.map(function, items))
+
+
+def _copy_range(fsrc, fdst, size):
+    for syscall in (getattr(os, "copy_file_range", None), os.sendfile):
+        if syscall is None:
+            continue
+        try:
+            if _copy_with(syscall, fsrc.fileno(), fdst.fileno(), size) == size:
+                return
+        except OSError as exc:
+            if exc.errno not in _FALLBACK_ERRNOS:
+                raise
+        # start over with the next method
+        fsrc.seek(0)
+        fdst.seek(0)
+        fdst.truncate()
+    shutil.copyfileobj(fsrc, fdst, 1 << 20)
+
+
+def _copy_with(syscall, fd_in, fd_out, size):
+    offset = 0
+    while offset < size:
+        if syscall is os.sendfile:
+            sent = os.sendfile(fd_out, fd_in, offset, min(_CHUNK, size - offset))
+        else:
+            sent = syscall(fd_in, fd_out, min(_CHUNK, size - offset))
+        if sent == 0:
+            break
+        offset += sent
+    return offset
@@ -0,0 +1,373 @@
+"""
+Local cache of the casatestdata datasets used by the benchmarks
+
+casatestdata usually lives on NFS. fetch() mirrors a dataset (a single file or a
+table/ASDM tree) into CASABENCH_CACHE_DIR on local disk and returns the local path,
+and resolve() does the same for the paths returned by ctsys.resolve(). stage() reads
+its sources through the cache, so every suite benefits without further changes.
+
+Entries are content addressed: a dataset shipped in several test directories (e.g.
+gaincaltest2.ms for applycal, gaincal and fringefit) is stored once. The cache is kept
+below CASABENCH_CACHE_BYTES by evicting the least recently used entries, except those
+that the working copies of the current process were staged from. Cached copies
+keep the sizes and mtimes of their source files, which are compared on every use so
+that a source update or an in-place write to the cache causes a refetch.
+
+The index also records which datasets each benchmark fetched, which lets the
+prefetcher (see prefetch) fill the cache for the upcoming benchmarks in the background.
+
+The cache is disabled unless CASABENCH_CACHE_DIR is set.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no inter-process locking on this platform
+    fcntl = None
+
+from . import config, copier
+
+_CHUNK = 1 << 20
+
+# entries used this recently are never evicted by a background fetch
+_PROTECT_SECONDS = 600
+
+# entries (digests) fetched in the foreground by this process, which its working copies and
+# read-only links may still point into; they are never evicted by this process
+_referenced = set()
+
+# serializes index updates between threads; fcntl.flock does the same between processes
+_lock = threading.RLock()
+
+# bytes copied into the cache by this process
+counters = {"bytes_fetched": 0}
+
+
+def enabled():
+    return config.cache_dir() is not None
+
+
+def is_cached(path):
+    """True if path is inside an entry of the (enabled) cache"""
+    root = config.cache_dir()
+    if root is None:
+        return False
+    objects = os.path.join(os.path.abspath(root), "objects") + os.sep
+    return os.path.abspath(path).startswith(objects)
+
+
+def resolve(path):
+    """ctsys.resolve() returning a cached local copy when path names a dataset
+
+    Directories of datasets (e.g. 'unittest/tclean/') are returned unchanged; the
+    datasets inside them are cached when staged.
+    """
+    from casatools import ctsys
+
+    resolved = ctsys.resolve(path)
+    if is_dataset(resolved):
+        return fetch(resolved)
+    return resolved
+
+
+def is_dataset(path):
+    """True for files, casacore tables and ASDMs"""
+    if os.path.isfile(path):
+        return True
+    return os.path.isfile(os.path.join(path, "table.dat")) or \
+        os.path.isfile(os.path.join(path, "ASDM.xml"))
+
+
+def fetch(source, rate=None):
+    """Local path of a cached copy of source, copying it in on a miss
+
+    Returns source itself when the cache is disabled or source does not exist. rate
+    (bytes/s) throttles the copy and marks a background fetch: it is abandoned (None is
+    returned) if another process is already fetching source, and it never evicts entries
+    that were used recently.
+    """
+    source = os.path.abspath(source.rstrip("/"))
+    root = config.cache_dir()
+    if root is None or not os.path.exists(source):
+        return source
+
+    benchmark = config.current_benchmark()
+    path = _fetch(root, source, rate, benchmark)
+    if benchmark is not None and config.prefetch_enabled():
+        from . import prefetch
+        prefetch.schedule(benchmark)
+    return path
+
+
+def _fetch(root, source, rate, benchmark):
+    signature = _signature(source)
+    while True:
+        with _index(root) as index:
+            if benchmark is not None:
+                used = index["used_by"].setdefault(benchmark, [])
+                if source not in used:
+                    used.append(source)
+            path = _lookup(root, index, source, signature)
+            if path is not None:
+                if rate is None:
+                    _referenced.add(index["sources"][source]["digest"])
+                return path
+            other = index["fetching"].get(source)
+            if other is None or not _alive(other["pid"]):
+                index["fetching"][source] = {"pid": os.getpid(), "hurry": False}
+                break
+            if rate is not None:
+                return None
+            # a background fetch of the same dataset is under way: lift its throttle and wait
+            other["hurry"] = True
+        time.sleep(0.2)
+
+    # copy outside of the lock so that other fetches are not held up by this one
+    tmp = tempfile.mkdtemp(dir=os.path.join(root, "tmp"))
+    try:
+        digest, nbytes = _copy_in(source, os.path.join(tmp, os.path.basename(source)),
+                                  _Throttle(root, source, rate))
+        counters["bytes_fetched"] += nbytes
+        with _index(root) as index:
+            entry_dir = os.path.join(root, "objects", digest)
+            if digest not in index["entries"] or not os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.rename(tmp, entry_dir)
+                # the signature of the cached files, which keep the mtimes of this source
+                index["entries"][digest] = {
+                    "name": os.path.basename(source),
+                    "bytes": nbytes,
+                    "signature": signature,
+                }
+            # a duplicate of an entry keeps that entry's files, and so its signature
+            index["entries"][digest]["last_used"] = time.time()
+            index["sources"][source] = {"signature": signature, "digest": digest}
+            if rate is None:
+                _referenced.add(digest)
+            _evict(root, index, keep=digest, protect=rate is not None)
+            return os.path.join(entry_dir, os.path.basename(source))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        with _index(root) as index:
+            index["fetching"].pop(source, None)
+
+
+def adopt(source, other):
+    """Serve source from the cache entry of other if the two have identical contents
+
+    Reads and hashes source without copying it. Returns True if source was adopted.
+    """
+    source = os.path.abspath(source.rstrip("/"))
+    other = os.path.abspath(other.rstrip("/"))
+    root = config.cache_dir()
+    if root is None or os.path.basename(source) != os.path.basename(other):
+        return False
+    with _index(root) as index:
+        known = index["sources"].get(other)
+    if known is None:
+        return False
+    signature = _signature(source)
+    digest = _digest(source)
+    with _index(root) as index:
+        if digest != known["digest"] or digest not in index["entries"]:
+            return False
+        index["sources"][source] = {"signature": signature, "digest": digest}
+    return True
+
+
+def usage():
+    """Benchmark name -> the sources it fetched in earlier runs"""
+    root = config.cache_dir()
+    if root is None:
+        return {}
+    with _index(root) as index:
+        return dict(index["used_by"])
+
+
+def discard(path):
+    """Drop the cache entry containing path, e.g. after a benchmark modified it"""
+    root = config.cache_dir()
+    if root is None:
+        return
+    objects = os.path.join(root, "objects") + os.sep
+    path = os.path.abspath(path)
+    if not path.startswith(objects):
+        return
+    digest = path[len(objects):].split(os.sep)[0]
+    with _index(root) as index:
+        _remove_entry(root, index, digest)
+
+
+def _lookup(root, index, source, signature):
+    known = index["sources"].get(source)
+    if known is None or known["signature"] != signature:
+        return None
+    digest = known["digest"]
+    entry = index["entries"].get(digest)
+    if entry is None:
+        return None
+    path = os.path.join(root, "objects", digest, entry["name"])
+    if not os.path.exists(path) or _signature(path) != entry["signature"]:
+        _remove_entry(root, index, digest)
+        return None
+    entry["last_used"] = time.time()
+    return path
+
+
+def _evict(root, index, keep, protect=False):
+    total = sum(entry["bytes"] for entry in index["entries"].values())
+    budget = config.cache_bytes()
+    recent = time.time() - _PROTECT_SECONDS if protect else float("inf")
+    for digest, entry in sorted(index["entries"].items(), key=lambda item: item[1]["last_used"]):
+        if total <= budget:
+            break
+        if digest != keep and digest not in _referenced and entry["last_used"] < recent:
+            total -= entry["bytes"]
+            _remove_entry(root, index, digest)
+
+
+def _remove_entry(root, index, digest):
+    index["entries"].pop(digest, None)
+    for source in [s for s, known in index["sources"].items() if known["digest"] == digest]:
+        del index["sources"][source]
+    shutil.rmtree(os.path.join(root, "objects", digest), ignore_errors=True)
+
+
+def _files(path):
+    """(relative path, absolute path) of every file of a dataset, in sorted order"""
+    if not os.path.isdir(path):
+        return [(os.path.basename(path), path)]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            found.append((os.path.relpath(full, path), full))
+    return sorted(found)
+
+
+def _signature(path):
+    """Cheap change detector: hash of the names, sizes and mtimes of all files"""
+    digest = hashlib.sha1()
+    for rel, full in _files(path):
+        st = os.stat(full)
+        digest.update("{}\0{}\0{}\n".format(rel, st.st_size, st.st_mtime_ns).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Throttle:
+    """Sleeps between chunks to hold a copy to rate bytes/s, until someone is waiting for it"""
+
+    def __init__(self, root, source, rate):
+        self.root = root
+        self.source = source
+        self.rate = rate
+        self.nbytes = 0
+        self.start = self.checked = time.monotonic()
+
+    def __call__(self, nbytes):
+        if self.rate is None:
+            return
+        self.nbytes += nbytes
+        now = time.monotonic()
+        if now - self.checked > 1.0:
+            self.checked = now
+            if self._hurry():
+                self.rate = None
+                return
+        ahead = self.nbytes / self.rate - (now - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def _hurry(self):
+        # the index is replaced atomically, so it can be read without taking the lock
+        try:
+            with open(os.path.join(self.root, "index.json")) as fp:
+                return json.load(fp)["fetching"][self.source]["hurry"]
+        except (OSError, ValueError, KeyError):
+            return False
+
+
+def _copy_in(source, dest, throttle):
+    """Copy source to dest, returning the content digest and the bytes copied
+
+    Files are copied (and hashed) concurrently, except by a throttled background fetch.
+    """
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            os.makedirs(os.path.join(dest, os.path.relpath(dirpath, source)), exist_ok=True)
+
+    def copy(item):
+        rel, full = item
+        target = dest if not os.path.isdir(source) else os.path.join(dest, rel)
+        file_digest = hashlib.sha256()
+        with open(full, "rb") as fsrc, open(target, "wb") as fdst:
+            for chunk in iter(lambda: fsrc.read(_CHUNK), b""):
+                file_digest.update(chunk)
+                fdst.write(chunk)
+                throttle(len(chunk))
+        shutil.copystat(full, target)
+        return rel, file_digest.hexdigest(), os.stat(target).st_size
+
+    threads = 1 if throttle.rate is not None else None
+    digest = hashlib.sha256(os.path.basename(source).encode("utf-8"))
+    nbytes = 0
+    for rel, file_digest, size in copier.copy_many(copy, _files(source), threads):
+        digest.update("{}\0{}\n".format(rel, file_digest).encode("utf-8"))
+        nbytes += size
+    return digest.hexdigest(), nbytes
+
+
+def _digest(source):
+    """The content digest _copy_in() computes, without copying"""
+    def hash_file(item):
+        rel, full = item
+        file_digest = hashlib.sha256()
+        with open(full, "rb") as fsrc:
+            for chunk in iter(lambda: fsrc.read(_CHUNK), b""):
+                file_digest.update(chunk)
+        return rel, file_digest.hexdigest()
+
+    digest = hashlib.sha256(os.path.basename(source).encode("utf-8"))
+    for rel, file_digest in copier.copy_many(hash_file, _files(source)):
+        digest.update("{}\0{}\n".format(rel, file_digest).encode("utf-8"))
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def _index(root):
+    """Locked read-modify-write access to the cache index"""
+    os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+    os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+    index_file = os.path.join(root, "index.json")
+    with _lock, open(os.path.join(root, "lock"), "a") as lock_fp:
+        if fcntl is not None:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+        try:
+            with open(index_file) as fp:
+                index = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        for key in ("entries", "sources", "used_by", "fetching"):
+            index.setdefault(key, {})
+        yield index
+        tmp = index_file + ".{}.tmp".format(os.getpid())
+        with open(tmp, "w") as fp:
+            json.dump(index, fp, indent=1)
+        os.replace(tmp, index_file)
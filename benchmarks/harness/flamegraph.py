@@ -0,0 +1,181 @@
+"""
+Native stack samples of the measured region, as folded stacks for flame graphs
+
+tclean, applycal and gaincal spend their time in casacore and the synthesis C++ code,
+where cProfile sees a single call. With CASABENCH_FLAMEGRAPH set, the harness attaches
+``perf record`` to the benchmark process (and the threads and processes it starts) from
+the end of setup to the start of teardown, for the benchmarks matching
+
+    CASABENCH_FLAMEGRAPH=1                -- the C++-heavy suites of NATIVE_HEAVY
+    CASABENCH_FLAMEGRAPH=<pattern>,...    -- benchmarks matching fnmatch patterns
+
+and folds the sampled stacks into the "frame;frame;...;frame count" lines read by
+flamegraph.pl, speedscope and casabench.flamegraphs. On Python 3.12 and later the perf
+trampoline is activated for the region, so Python functions appear as py::<function>
+frames between the C++ ones. Each sample is written, gzip compressed, to
+results/flamegraphs/<commit>-<environment>/<benchmark>[-<param index>].<pid>-<n>.folded.gz,
+i.e. per benchmark and per CASA version (environment).
+
+perf samples at CASABENCH_FLAMEGRAPH_FREQUENCY Hz (default 99) and unwinds with
+CASABENCH_FLAMEGRAPH_CALLGRAPH (default dwarf, which needs no frame pointers). Only user
+space is sampled unless kernel.perf_event_paranoid allows more. Like the cProfile mode,
+this slows the task down, and requires a separate results directory (see
+config.check_profiling).
+"""
+import collections
+import fnmatch
+import gzip
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+from . import config
+
+# benchmarks sampled with CASABENCH_FLAMEGRAPH=1
+NATIVE_HEAVY = (
+    "bench_tclean_time.*",
+    "bench_applycal.*",
+    "bench_gaincal.*",
+)
+
+# seconds to wait for perf to attach before the measured call starts
+ATTACH_TIMEOUT = 5.0
+
+# header line of a perf script event: the command (right aligned), pid[/tid], ...
+_HEADER = re.compile(r"^\s*(?P<comm>.+?)\s+\d+(/\d+)?\s")
+
+# "+0x1f" offset of a perf script frame symbol
+_OFFSET = re.compile(r"\+0x[0-9a-f]+$")
+
+# the perf process and data file of the current measured region, if any
+_current = None
+
+# samples written by this process
+_count = 0
+
+
+def available():
+    return shutil.which("perf") is not None and os.path.isdir("/proc/self")
+
+
+def enabled(benchmark):
+    """Whether the measured region of a benchmark is sampled"""
+    patterns = config.flamegraph_patterns()
+    if patterns == ["1"]:
+        patterns = NATIVE_HEAVY
+    return any(fnmatch.fnmatchcase(benchmark, pattern) for pattern in patterns)
+
+
+def start(benchmark):
+    """Attach perf to this process, returning whether the measured region is sampled"""
+    global _current
+    if _current is not None or not enabled(benchmark) or not available():
+        return False
+    data = os.path.join(config.harness_dir("flamegraphs"), "{}.perf.data".format(os.getpid()))
+    command = ["perf", "record", "--quiet", "-e", _event(),
+               "-F", str(config.flamegraph_frequency()),
+               "--call-graph", config.flamegraph_callgraph(),
+               "-p", str(os.getpid()), "-o", data]
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+    except OSError:
+        return False
+    # perf writes the header of its data file once it is attached
+    deadline = time.monotonic() + ATTACH_TIMEOUT
+    while not os.path.exists(data) and process.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if process.poll() is not None:
+        return False
+    if hasattr(sys, "activate_stack_trampoline"):
+        sys.activate_stack_trampoline("perf")
+    _current = (process, data)
+    return True
+
+
+def stop(benchmark, param_index):
+    """Detach perf and write the folded stacks of the sample"""
+    global _current, _count
+    if _current is None:
+        return
+    (process, data), _current = _current, None
+    if hasattr(sys, "deactivate_stack_trampoline"):
+        sys.deactivate_stack_trampoline()
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=60)
+        script = subprocess.run(["perf", "script", "-i", data], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True,
+                                errors="replace", check=True)
+        stacks = fold(script.stdout.splitlines())
+        path = folded_file(benchmark, param_index, "{}-{}".format(os.getpid(), _count))
+        _count += 1
+        with gzip.open(path, "wt") as fp:
+            fp.writelines("{} {}\n".format(stack, count) for stack, count in sorted(stacks.items()))
+    except (OSError, subprocess.SubprocessError):
+        process.kill()  # never fail a benchmark over its bookkeeping
+    finally:
+        if os.path.exists(data):
+            os.remove(data)
+
+
+def fold(lines):
+    """Folded stack -> samples, from the lines of ``perf script`` output
+
+    Each event is a header line ("comm pid/tid time: period event:") followed by one
+    tab indented line per frame, innermost first ("address symbol (dso)"), and a blank
+    line.
+    """
+    stacks = collections.Counter()
+    comm, frames = None, []
+    for line in lines + [""]:
+        if not line.strip():
+            if comm is not None:
+                stacks[";".join([comm] + frames[::-1])] += 1
+            comm, frames = None, []
+        elif line.startswith("\t"):
+            if comm is not None:
+                frames.append(_frame(line))
+        else:
+            match = _HEADER.match(line)
+            comm = match.group("comm").replace(" ", "_") if match else line.split(None, 1)[0]
+    return stacks
+
+
+def folded_file(benchmark, param_index, sample):
+    """Path of folded stacks of a benchmark for the current asv commit and environment"""
+    run = "{}-{}".format(os.environ.get("ASV_COMMIT", "unknown")[:8],
+                         os.environ.get("ASV_ENV_NAME", "unknown"))
+    directory = os.path.join(config.results_dir(), "flamegraphs", run)
+    os.makedirs(directory, exist_ok=True)
+    name = benchmark if not param_index else "{}-{}".format(benchmark, param_index)
+    return os.path.join(directory, "{}.{}.folded.gz".format(name, sample))
+
+
+def _frame(line):
+    """Function name of a perf script frame line, the library for unknown symbols"""
+    fields = line.strip().split(None, 1)
+    rest = fields[1] if len(fields) > 1 else "[unknown]"
+    symbol, _, dso = rest.rpartition(" (")
+    if not symbol:
+        symbol, dso = rest, ""
+    symbol = _OFFSET.sub("", symbol.strip())
+    dso = os.path.basename(dso.rstrip(")"))
+    if symbol == "[unknown]" and dso and dso != "[unknown]":
+        return "[{}]".format(dso)
+    # semicolons separate the frames of a folded stack
+    return symbol.replace(";", ":")
+
+
+def _event():
+    """cpu-clock, restricted to user space unless perf_event_paranoid permits the kernel"""
+    try:
+        with open("/proc/sys/kernel/perf_event_paranoid") as fp:
+            paranoid = int(fp.read())
+    except (OSError, ValueError):
+        paranoid = 2
+    return "cpu-clock" if paranoid < 2 else "cpu-clock:u"
@@ -0,0 +1,229 @@
+"""
+Declarative dataset requirements of the benchmark suites
+
+A suite lists its inputs as class metadata instead of copying them in imperative setup
+helpers::
+
+    class DataSetUp():
+        datasets = (
+            Dataset('unittest/applycal/gaincaltest2.ms', 'applycalcopy.ms', attr='vis'),
+            Dataset('unittest/applycal/refcallib.txt', writable=False, attr='callibfile'),
+        )
+        outputs = ('testoucal.cal',)
+
+        def setup_basic(self):
+            manifest.stage(self)
+
+stage() removes the declared outputs and stages the declared datasets through the
+dataset cache: writable ones as working copies (see staging), read-only ones as links
+to their cache entries that are checked for modifications at the end of every sample
+(as working copies too when the dataset cache is disabled). clean() releases the
+working copies and removes the outputs again.
+
+Because the requirements are data, the whole run can be planned before it starts:
+``python -m benchmarks.harness.manifest`` imports every suite, deduplicates the
+datasets shared between suites (e.g. gaincaltest2.ms is used by the applycal, gaincal
+and fringefit suites), and prints the data footprint of the run. With --fetch it also
+fills the dataset cache, copying each distinct dataset exactly once.
+"""
+import argparse
+import glob
+import hashlib
+import importlib
+import inspect
+import os
+import pkgutil
+import shutil
+
+from . import datacache, staging
+
+
+class Dataset:
+    """An input dataset of a suite
+
+    source   -- path below casatestdata (resolved with ctsys.resolve) or an absolute path
+    dest     -- name of the working copy, defaults to the basename of source
+    writable -- False for inputs the tasks only read, which are then linked, not copied
+    attr     -- attribute of the suite instance set to the working copy (or source) path
+    """
+
+    def __init__(self, source, dest=None, writable=True, attr=None):
+        self.source = source
+        self.dest = dest if dest is not None else os.path.basename(source.rstrip("/"))
+        self.writable = writable
+        self.attr = attr
+
+    @property
+    def path(self):
+        """Absolute path of the source dataset"""
+        if os.path.isabs(self.source):
+            return self.source.rstrip("/")
+        from casatools import ctsys
+
+        return ctsys.resolve(self.source).rstrip("/")
+
+    def stage(self):
+        """Working copy of the dataset, a guarded link to its cache entry if read-only"""
+        if not self.writable:
+            staging.link(self.path, self.dest)
+        else:
+            staging.stage(self.path, self.dest)
+        return self.dest
+
+    def __repr__(self):
+        return "Dataset({!r}, {!r}{})".format(
+            self.source, self.dest, "" if self.writable else ", writable=False")
+
+
+def declared(suite):
+    """Datasets declared by a suite class or instance"""
+    return tuple(getattr(suite, "datasets", ()))
+
+
+def stage(suite, *names):
+    """Remove the declared outputs and stage the declared datasets of a suite instance
+
+    names restricts staging to the datasets with these working copy names; asking for
+    a dataset that the suite does not declare is an error, so that the declarations
+    stay complete.
+    """
+    datasets = declared(suite)
+    if names:
+        unknown = set(names) - set(dataset.dest for dataset in datasets)
+        if unknown:
+            raise KeyError("{} does not declare {}".format(type(suite).__name__, ", ".join(sorted(unknown))))
+        datasets = [dataset for dataset in datasets if dataset.dest in names]
+    _remove_outputs(suite)
+    for dataset in datasets:
+        path = dataset.stage()
+        if dataset.attr is not None:
+            setattr(suite, dataset.attr, path)
+
+
+def clean(suite):
+    """Release the working copies of a suite instance and remove its declared outputs"""
+    for dataset in declared(suite):
+        staging.release(dataset.dest)
+    _remove_outputs(suite)
+
+
+def _remove_outputs(suite):
+    for pattern in getattr(suite, "outputs", ()):
+        for path in glob.glob(pattern):
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+
+class PlanEntry:
+    """A distinct dataset of the run and the suites that use it"""
+
+    def __init__(self, path, nbytes):
+        self.path = path
+        self.bytes = nbytes
+        self.aliases = []
+        self.consumers = []
+        self.writable = False
+
+
+def collect(package="benchmarks"):
+    """Suite name -> declared datasets, for every suite of the benchmark package"""
+    top = importlib.import_module(package)
+    suites = {}
+    for module_info in pkgutil.iter_modules(top.__path__):
+        if module_info.ispkg:
+            continue
+        module = importlib.import_module(package + "." + module_info.name)
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ == module.__name__ and declared(cls):
+                suites[module_info.name + "." + name] = declared(cls)
+    return suites
+
+
+def plan(suites):
+    """Distinct datasets needed by suites (name -> datasets), largest first
+
+    Datasets found under several paths (copies shipped for different tasks) are
+    recognized by their file names and sizes and counted once.
+    """
+    by_shape = {}
+    for suite, datasets in sorted(suites.items()):
+        for dataset in datasets:
+            path = os.path.realpath(dataset.path)
+            if not os.path.exists(path):
+                continue
+            shape, nbytes = _shape(path)
+            entry = by_shape.setdefault(shape, PlanEntry(path, nbytes))
+            if path != entry.path and path not in entry.aliases:
+                entry.aliases.append(path)
+            if suite not in entry.consumers:
+                entry.consumers.append(suite)
+            entry.writable = entry.writable or dataset.writable
+    return sorted(by_shape.values(), key=lambda entry: -entry.bytes)
+
+
+def footprint(suites, entries):
+    """Bytes of distinct source data and the peak bytes of working copies in a run
+
+    entries is the plan() of suites. Suites run one at a time, so the working copies
+    of the largest suite bound the space needed in the working directory.
+    """
+    sizes = {}
+    for entry in entries:
+        for path in [entry.path] + entry.aliases:
+            sizes[path] = entry.bytes
+    distinct = sum(entry.bytes for entry in entries)
+    working = 0
+    for datasets in suites.values():
+        working = max(working, sum(sizes.get(os.path.realpath(d.path), 0) for d in datasets if d.writable))
+    return distinct, working
+
+
+def _shape(path):
+    """Hash of the relative names and sizes of the files of a dataset, and its size"""
+    digest = hashlib.sha1(os.path.basename(path).encode("utf-8"))
+    nbytes = 0
+    for rel, full in datacache._files(path):
+        size = os.stat(full).st_size
+        digest.update("{}\0{}\n".format(rel, size).encode("utf-8"))
+        nbytes += size
+    return digest.hexdigest(), nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fetch", action="store_true",
+                        help="copy every distinct dataset into the dataset cache once")
+    args = parser.parse_args()
+
+    # as under asv, some suites locate their data relative to asv.conf.json
+    os.environ.setdefault("ASV_CONF_DIR", os.getcwd())
+    suites = collect()
+    entries = plan(suites)
+    for entry in entries:
+        print("{:>10.1f} MiB  {}{}  ({} suites)".format(
+            entry.bytes / (1 << 20), entry.path, "" if entry.writable else " [read-only]",
+            len(entry.consumers)))
+        for alias in entry.aliases:
+            print("{:>16}also {}".format("", alias))
+    missing = sorted(set(d.path for datasets in suites.values() for d in datasets if not os.path.exists(d.path)))
+    for path in missing:
+        print("{:>14}  {}".format("missing", path))
+    distinct, working = footprint(suites, entries)
+    print("{} suites, {} distinct datasets, {:.1f} GiB of source data, "
+          "peak working copies {:.1f} GiB".format(len(suites), len(entries), distinct / (1 << 30),
+                                                  working / (1 << 30)))
+
+    if args.fetch:
+        if not datacache.enabled():
+            parser.error("--fetch needs the dataset cache, set CASABENCH_CACHE_DIR")
+        for entry in entries:
+            print("fetched", datacache.fetch(entry.path))
+            for alias in entry.aliases:
+                if not datacache.adopt(alias, entry.path):
+                    print("fetched", datacache.fetch(alias))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Per-stage memory and file descriptor usage of tclean, from the imager memprofile
+
+With ``synthesis.imager.memprofile.enable: 1`` in its rc settings, the CASA imager
+writes casa.synthesis.imager.memprofile.<pid>.<host>.<date>.txt into the working
+directory and names that file in the log. Every row records the resident set (VmRSS),
+its high water mark (VmHWM) and the open file descriptors at one step of the run,
+labelled e.g. [Start Major Cycle]. capture() runs a task with the log redirected,
+locates and parses the profile; Profile.stages() groups the steps into the imager
+stages of STAGES and returns the peak of each quantity per stage, which suites report
+as track_ metrics.
+
+enable() turns the memprofile on for the benchmark processes without editing
+~/.casa/rc: it writes an rc file to the harness directory and adds it to CASARCFILES,
+which casacore reads when casatools is first imported. benchmarks/__init__.py calls it
+when CASABENCH_MEMPROFILE=1.
+"""
+import collections
+import os
+import re
+
+from . import config
+
+# imager stages, with the patterns that assign memprofile steps to them (first match wins)
+STAGES = collections.OrderedDict([
+    ("selection", re.compile(r"select|open|setdata|define", re.I)),
+    ("weighting", re.compile(r"weight", re.I)),
+    ("psf", re.compile(r"psf", re.I)),
+    ("major", re.compile(r"major|grid|residual|predict", re.I)),
+    ("minor", re.compile(r"minor|deconv", re.I)),
+    ("restore", re.compile(r"restor|pbcor", re.I)),
+    ("other", re.compile(r"")),
+])
+
+# quantity -> (pattern of the header column, column used when there is no header)
+QUANTITIES = collections.OrderedDict([
+    ("rss", (re.compile(r"VmRSS", re.I), 1)),
+    ("hwm", (re.compile(r"VmHWM|VmWHM", re.I), 2)),
+    ("fds", (re.compile(r"FD", re.I), 7)),
+])
+
+MARKER = "casa.synthesis.imager.memprofile"
+
+
+class MemprofileError(RuntimeError):
+    """tclean did not write a memprofile"""
+
+
+class Profile:
+    """The rows of a memprofile: (step, {quantity: value}), RSS and HWM in MB"""
+
+    def __init__(self, path, rows):
+        self.path = path
+        self.rows = rows
+
+    def steps(self):
+        """step -> peak of each quantity over the rows of that step, in order of appearance"""
+        found = collections.OrderedDict()
+        for step, values in self.rows:
+            peaks = found.setdefault(step, dict.fromkeys(QUANTITIES, 0))
+            for quantity, value in values.items():
+                peaks[quantity] = max(peaks[quantity], value)
+        return found
+
+    def stages(self):
+        """stage -> peak of each quantity over the steps of that stage, for stages seen"""
+        found = collections.OrderedDict()
+        for step, peaks in self.steps().items():
+            stage = stage_of(step)
+            totals = found.setdefault(stage, dict.fromkeys(QUANTITIES, 0))
+            for quantity, value in peaks.items():
+                totals[quantity] = max(totals[quantity], value)
+        return collections.OrderedDict((stage, found[stage]) for stage in STAGES if stage in found)
+
+    def peak(self, quantity):
+        """Peak of a quantity over the whole run"""
+        return max((values[quantity] for step, values in self.rows), default=0)
+
+
+def stage_of(step):
+    """The imager stage of a memprofile step label"""
+    for stage, pattern in STAGES.items():
+        if pattern.search(step):
+            return stage
+    return "other"
+
+
+def capture(task, logfile, *args, **kwargs):
+    """Run task(*args, **kwargs) logging to logfile and return the Profile it wrote"""
+    from casatasks import casalog
+
+    casalog.setlogfile(logfile)
+    task(*args, **kwargs)
+    path = locate(logfile)
+    if path is None:
+        raise MemprofileError("no {} named in {}; enable synthesis.imager.memprofile in "
+                              "~/.casa/rc or set CASABENCH_MEMPROFILE=1".format(MARKER, logfile))
+    return parse(path)
+
+
+def locate(logfile):
+    """Path of the memprofile named in a casalog file, None if there is none"""
+    with open(logfile) as fp:
+        for line in fp:
+            index = line.find(MARKER)
+            if index >= 0:
+                return line[index:].rstrip()
+    return None
+
+
+def parse(path):
+    """Profile of a memprofile file"""
+    columns = {quantity: default for quantity, (pattern, default) in QUANTITIES.items()}
+    rows = []
+    with open(path) as fp:
+        for line in fp:
+            fields = [field.strip() for field in line.lstrip("#").split(",")]
+            if line.startswith("#"):
+                for quantity, (pattern, default) in QUANTITIES.items():
+                    matches = [i for i, name in enumerate(fields) if pattern.search(name)]
+                    if matches:
+                        columns[quantity] = matches[0]
+                continue
+            if len(fields) < 2:
+                continue
+            try:
+                values = {quantity: _number(fields[column]) for quantity, column in columns.items()}
+            except (IndexError, ValueError):
+                continue
+            rows.append((fields[-1].strip("[]"), values))
+    return Profile(path, rows)
+
+
+def enable():
+    """Turn on the imager memprofile for casatools imported from now on"""
+    rc_file = os.path.join(config.harness_dir(), "memprofile.rc")
+    with open(rc_file, "w") as fp:
+        fp.write("synthesis.imager.memprofile.enable: 1\n")
+    files = [f for f in os.environ.get("CASARCFILES", "").split(":") if f]
+    if rc_file not in files:
+        os.environ["CASARCFILES"] = ":".join(files + [rc_file])
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
@@ -0,0 +1,219 @@
+"""
+Setup, teardown and measured-region wall time of every benchmark
+
+asv only reports the measured method; the time a benchmark spends staging data in
+setup and removing it in teardown is invisible. install() wraps the do_setup and
+do_teardown methods of asv's Benchmark class, so that every setup/sample/teardown cycle
+is timed without changes to the suites:
+
+    setup     -- wall time of the setup methods
+    measured  -- wall time from the end of setup to the start of teardown, i.e. the
+                 measured call plus asv's own (negligible) bookkeeping
+    teardown  -- wall time of the teardown methods
+
+together with the bytes copied, cloned and hard linked by staging and fetched into the
+dataset cache during the cycle (setup includes waiting for the removal of the previous
+sample's outputs, see trash), the placement of the working directory (see
+workspace, which is entered before the first setup) and the state of the page cache
+the sample ran with (see pagecache, which evicts cold samples' data in setup). The I/O of the measured region is
+recorded from /proc/<pid>/io of the benchmark process tree:
+
+    read_bytes, write_bytes -- bytes read from and written to storage
+    syscalls      -- read and write calls (syscr + syscw)
+    output_bytes  -- bytes on disk of the files in the workspace written during the
+                     measured region: images, caltables, new or rewritten MS columns
+
+read_bytes counts only what missed the page cache, and write_bytes what the kernel
+queued for writeback (a file removed before writeback still counts). The parallel
+efficiency of the measured region is recorded as
+
+    cpu_time         -- user plus system CPU seconds of the process tree
+    cores            -- cpu_time over the measured wall time, the effective core count
+    omp_num_threads  -- OMP_NUM_THREADS, or the usable cores when it is unset (OpenMP's
+                        default)
+
+so that a parallel loop of tclean or flagdata that silently went serial shows as a
+drop of cores rather than as an unexplained rise in wall time. With
+CASABENCH_PERF_COUNTERS=1 the hardware counters of the measured region (instructions,
+cycles, cache_misses, branch_misses, page_faults; see perfcounters) are recorded too.
+With CASABENCH_PROFILE set, the measured call of selected benchmarks runs under
+cProfile (see profiler), with CASABENCH_FLAMEGRAPH under perf record (see flamegraph);
+their records are marked as profiled and flamegraph respectively, and left out of
+the averages by casabench.companion. The resource sampler (see sampler)
+runs from the end of setup to the start of teardown. Each cycle is appended as one JSON
+line to metrics/<commit>-<environment>.jsonl in the harness directory (asv benchmark
+processes may end with os._exit, so nothing is buffered). ``python -m
+casabench.companion`` folds these records into the asv results files.
+"""
+import itertools
+import json
+import os
+import sys
+import time
+
+from . import (config, datacache, flamegraph, pagecache, perfcounters, profiler, sampler,
+               staging, trash, workspace)
+
+
+def install():
+    """Instrument asv's Benchmark class, if this process runs asv benchmarks"""
+    for cls in _benchmark_classes():
+        if getattr(cls.do_setup, "_casabench", False):
+            continue
+        cls.do_setup = _wrap_setup(cls.do_setup)
+        cls.do_teardown = _wrap_teardown(cls.do_teardown)
+
+
+def _benchmark_classes():
+    # asv >= 0.6 runs benchmarks through asv_runner; older versions run benchmark.py
+    # as a script, which defines Benchmark in __main__
+    try:
+        from asv_runner.benchmarks._base import Benchmark
+    except ImportError:
+        pass
+    else:
+        yield Benchmark
+    main = sys.modules.get("__main__")
+    cls = getattr(main, "Benchmark", None)
+    if isinstance(cls, type) and hasattr(cls, "do_setup") and hasattr(cls, "do_teardown"):
+        yield cls
+
+
+def _wrap_setup(do_setup):
+    def wrapper(self):
+        cycle = {"counters": _counters(), "start": time.perf_counter(), "started_at": time.time()}
+        self._casabench_cycle = cycle
+        try:
+            cycle["workspace"] = workspace.enter(self.name)
+            result = do_setup(self)
+            # the previous sample's outputs must not be removed during the measurement
+            trash.barrier()
+            cycle["page_cache"] = pagecache.state(self)
+            if cycle["page_cache"] == pagecache.COLD:
+                pagecache.evict(workspace.entries())
+            cycle["measured_at"] = workspace.stamp()
+        finally:
+            cycle["setup_end"] = time.perf_counter()
+        cycle["io"] = sampler.io_counters()
+        cycle["cpu_time"] = sampler.cpu_time()
+        sampler.start()
+        cycle["flamegraph"] = flamegraph.start(self.name)
+        cycle["profiled"] = profiler.start(self.name)
+        # last, so that perf record does not inherit the counters
+        perfcounters.start()
+        return result
+
+    wrapper._casabench = True
+    return wrapper
+
+
+def _wrap_teardown(do_teardown):
+    def wrapper(self):
+        start = time.perf_counter()
+        cycle = getattr(self, "_casabench_cycle", None)
+        counts = perfcounters.stop()
+        profiler.stop(self.name, _param_index(self))
+        try:
+            if cycle is not None:
+                cycle["perf_counters"] = counts
+            if cycle is not None and "io" in cycle:
+                cycle["cpu_time"] = sampler.cpu_time() - cycle["cpu_time"]
+                cycle["io"] = _io_delta(cycle["io"], sampler.io_counters())
+            flamegraph.stop(self.name, _param_index(self))
+            sampler.stop(self.name, _param_index(self))
+            output_bytes = workspace.measure(cycle.get("measured_at") if cycle else None)
+            if cycle is not None:
+                cycle["output_bytes"] = output_bytes
+            result = do_teardown(self)
+            # fail the sample if its task wrote to a dataset linked as read-only
+            staging.verify()
+            return result
+        finally:
+            if cycle is not None and "setup_end" in cycle:
+                self._casabench_cycle = None
+                _record(self, cycle, start, time.perf_counter())
+
+    wrapper._casabench = True
+    return wrapper
+
+
+def _counters():
+    counters = dict(staging.counters)
+    counters.update(datacache.counters)
+    counters.update(pagecache.counters)
+    return counters
+
+
+def _io_delta(before, after):
+    """I/O of the measured region: bytes read from and written to storage, and the
+    number of read and write calls"""
+    delta = {key: after[key] - before[key] for key in after}
+    return {
+        "read_bytes": delta["read_bytes"],
+        "write_bytes": delta["write_bytes"],
+        "syscalls": delta["syscr"] + delta["syscw"],
+    }
+
+
+def _cores(cpu_time, wall_time):
+    """Effective number of cores busy during the measured region"""
+    if cpu_time is None or wall_time <= 0:
+        return None
+    return cpu_time / wall_time
+
+
+def _omp_num_threads():
+    """OMP_NUM_THREADS in effect, the number of usable cores when it is not set"""
+    value = os.environ.get("OMP_NUM_THREADS", "").split(",")[0]
+    if value.strip().isdigit():
+        return int(value)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count()
+
+
+def _param_index(benchmark):
+    params = getattr(benchmark, "_params", None)
+    current = tuple(getattr(benchmark, "_current_params", ()))
+    if not params:
+        return 0
+    try:
+        return list(itertools.product(*params)).index(current)
+    except ValueError:
+        return None
+
+
+def _record(benchmark, cycle, teardown_start, teardown_end):
+    before = cycle["counters"]
+    record = {
+        "benchmark": benchmark.name,
+        "param_index": _param_index(benchmark),
+        "started_at": cycle["started_at"],
+        "setup": cycle["setup_end"] - cycle["start"],
+        "measured": teardown_start - cycle["setup_end"],
+        "teardown": teardown_end - teardown_start,
+        "workspace": cycle.get("workspace"),
+        "page_cache": cycle.get("page_cache"),
+        "profiled": cycle.get("profiled", False),
+        "flamegraph": cycle.get("flamegraph", False),
+        "output_bytes": cycle.get("output_bytes"),
+        "cpu_time": cycle.get("cpu_time"),
+        "cores": _cores(cycle.get("cpu_time"), teardown_start - cycle["setup_end"]),
+        "omp_num_threads": _omp_num_threads(),
+    }
+    record.update(cycle.get("io") or {})
+    record.update(cycle.get("perf_counters") or {})
+    for key, value in _counters().items():
+        record[key] = value - before.get(key, 0)
+    try:
+        with open(sidecar(), "a") as fp:
+            fp.write(json.dumps(record) + "\n")
+    except OSError:
+        pass  # never fail a benchmark over its bookkeeping
+
+
+def sidecar():
+    """Path of the metrics file of the current asv commit and environment"""
+    commit = os.environ.get("ASV_COMMIT", "unknown")[:8]
+    env_name = os.environ.get("ASV_ENV_NAME", "unknown")
+    return os.path.join(config.harness_dir("metrics"), "{}-{}.jsonl".format(commit, env_name))
@@ -0,0 +1,85 @@
+"""
+Cold and warm page cache for the measured region
+
+setup copies or links a benchmark's data and the task then reads it straight from the
+page cache, while in production the task reads an MS that nothing has touched for
+hours. evict() drops the files below a set of paths from the page cache with
+posix_fadvise(POSIX_FADV_DONTNEED), which needs no privileges; dirty pages cannot be
+dropped, so each file is flushed first.
+
+The harness evicts the workspace (the entries setup created, following the links to
+read-only datasets) at the end of setup when the sample is to run cold:
+
+- for benchmarks with a ``cache`` parameter, when its value is "cold", so a new suite
+  can run both ways with ``params = ['cold', 'warm']``;
+- for benchmarks whose function, class or module sets ``page_cache = 'cold'`` (or
+  'warm'), e.g. a cold subclass of an existing suite, which adds cold benchmarks next
+  to the existing ones and keeps their result history (a parameter would not: asv
+  matches results by parameter values);
+- for all other benchmarks, when CASABENCH_PAGE_CACHE=cold (default warm).
+
+Eviction is part of the setup time. Files on a memory-backed workspace (see workspace)
+live in the page cache and stay there. Linux only; elsewhere evict() does nothing.
+"""
+import os
+
+from . import config
+
+COLD = "cold"
+WARM = "warm"
+
+counters = {"bytes_evicted": 0}
+
+
+def available():
+    return hasattr(os, "posix_fadvise")
+
+
+def state(benchmark):
+    """COLD or WARM, for the current sample of an asv benchmark"""
+    names = list(getattr(benchmark, "param_names", ()))
+    current = getattr(benchmark, "_current_params", ())
+    if "cache" in names and len(current) == len(names):
+        return current[names.index("cache")]
+    # asv's attribute lookup order: function, class, module
+    for source in getattr(benchmark, "_attr_sources", ()):
+        declared = getattr(source, "page_cache", None)
+        if declared in (COLD, WARM):
+            return declared
+    return config.page_cache()
+
+
+def evict(paths):
+    """Drop the files below paths from the page cache, returning the bytes evicted"""
+    if not available():
+        return 0
+    nbytes = 0
+    for path in paths:
+        for file in _files(os.path.realpath(path)):
+            nbytes += _evict(file)
+    counters["bytes_evicted"] += nbytes
+    return nbytes
+
+
+def _evict(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return 0
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return os.fstat(fd).st_size
+    except OSError:
+        return 0
+    finally:
+        os.close(fd)
+
+
+def _files(path):
+    if not os.path.isdir(path):
+        return [path] if os.path.isfile(path) else []
+    found = []
+    for dirpath, dirnames, filenames in os.walk(path, followlinks=True):
+        found.extend(os.path.join(dirpath, name) for name in filenames)
+    return found
@@ -0,0 +1,144 @@
+"""
+Hardware performance counters of the measured region
+
+On a shared host the wall time of a task moves by a few percent from run to run, which
+hides regressions of that size; the number of instructions it retires hardly moves.
+With CASABENCH_PERF_COUNTERS=1, start() opens Linux perf_event counters for
+
+    instructions, cycles -- retired instructions and CPU cycles
+    cache_misses         -- last level cache misses
+    branch_misses        -- mispredicted branches
+    page_faults          -- page faults (a software counter)
+
+on the threads of the benchmark process at the end of setup, inherited by the threads
+and processes they start, and stop() reads them at the start of teardown. The threads of
+the harness (the sampler, the trash reclaimer, ..., see HARNESS_THREADS) are not
+counted, and those it starts during the measured call do so in paused(); on Python 3.7
+and earlier, which cannot tell the threads apart, every thread is counted. The counts
+cover user space only, which perf_event_paranoid <= 2 (the default) allows without
+privileges. When the PMU multiplexes more counters than it has, counts are scaled by
+the time each counter ran. Counters the host does not offer (e.g. hardware counters in
+most virtual machines) are reported as None.
+"""
+import collections
+import contextlib
+import ctypes
+import os
+import platform
+import struct
+import threading
+
+from . import config
+
+# counter -> (perf type, perf config)
+EVENTS = collections.OrderedDict([
+    ("instructions", (0, 1)),   # PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS
+    ("cycles", (0, 0)),         # PERF_COUNT_HW_CPU_CYCLES
+    ("cache_misses", (0, 3)),   # PERF_COUNT_HW_CACHE_MISSES
+    ("branch_misses", (0, 5)),  # PERF_COUNT_HW_BRANCH_MISSES
+    ("page_faults", (1, 2)),    # PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS
+])
+
+# name prefixes of the threads the harness runs next to the benchmark
+HARNESS_THREADS = ("sampler", "trash", "tasklog", "prefetch", "stage")
+
+_SYSCALLS = {"x86_64": 298, "aarch64": 241, "ppc64le": 319, "ppc64": 319}
+
+_ATTR_SIZE = 128
+# read_format: PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING
+_READ_FORMAT = 1 | 2
+# flags: disabled, inherit, exclude_kernel, exclude_hv
+_FLAGS = 1 << 0 | 1 << 1 | 1 << 5 | 1 << 6
+
+_IOC_ENABLE = 0x2400
+_IOC_DISABLE = 0x2401
+
+# counter -> file descriptors (one per thread) of the current measured region
+_open = None
+
+
+def available():
+    return config.perf_counters_enabled() and platform.machine() in _SYSCALLS and \
+        os.path.isdir("/proc/self/task")
+
+
+def start():
+    """Open and enable the counters on the benchmark threads of this process"""
+    global _open
+    if _open is not None or not available():
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    tids = _benchmark_threads()
+    _open = collections.OrderedDict()
+    for name, (type_, config_) in EVENTS.items():
+        fds = []
+        for tid in tids:
+            fd = _perf_event_open(libc, type_, config_, tid)
+            if fd >= 0:
+                fds.append(fd)
+        _open[name] = fds
+    for fds in _open.values():
+        for fd in fds:
+            libc.ioctl(fd, _IOC_ENABLE, 0)
+
+
+def stop():
+    """Disable, read and close the counters, returning counter -> count (None if not offered)"""
+    global _open
+    if _open is None:
+        return {}
+    opened, _open = _open, None
+    libc = ctypes.CDLL(None, use_errno=True)
+    for fds in opened.values():
+        for fd in fds:
+            libc.ioctl(fd, _IOC_DISABLE, 0)
+    counts = collections.OrderedDict()
+    for name, fds in opened.items():
+        counts[name] = None
+        for fd in fds:
+            try:
+                value, enabled, running = struct.unpack("QQQ", os.read(fd, 24))
+            except (OSError, struct.error):
+                continue
+            finally:
+                os.close(fd)
+            if running:
+                counts[name] = (counts[name] or 0) + int(round(value * enabled / running))
+            elif counts[name] is None:
+                counts[name] = 0
+    return counts
+
+
+@contextlib.contextmanager
+def paused():
+    """Stop counting for the duration, e.g. while the harness starts a thread
+
+    Threads and processes started while paused inherit the counters disabled, so they
+    are not counted at all.
+    """
+    if _open is None:
+        yield
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    fds = [fd for fds in _open.values() for fd in fds]
+    for fd in fds:
+        libc.ioctl(fd, _IOC_DISABLE, 0)
+    try:
+        yield
+    finally:
+        for fd in fds:
+            libc.ioctl(fd, _IOC_ENABLE, 0)
+
+
+def _benchmark_threads():
+    """Ids of the threads of this process, except those of the harness"""
+    harness = {getattr(thread, "native_id", None) for thread in threading.enumerate()
+               if thread.name.startswith(HARNESS_THREADS)}
+    return [int(tid) for tid in os.listdir("/proc/self/task") if int(tid) not in harness]
+
+
+def _perf_event_open(libc, type_, config_, tid):
+    attr = ctypes.create_string_buffer(_ATTR_SIZE)
+    # type, size, config, sample_period, sample_type, read_format, flags
+    struct.pack_into("IIQQQQQ", attr, 0, type_, _ATTR_SIZE, config_, 0, 0, _READ_FORMAT, _FLAGS)
+    return libc.syscall(_SYSCALLS[platform.machine()], attr, tid, -1, -1, 0)
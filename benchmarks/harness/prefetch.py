@@ -0,0 +1,150 @@
+"""
+Background prefetch of the datasets of the upcoming benchmarks
+
+asv runs the benchmarks one after the other in a fixed order (sorted by name, grouped
+by setup_cache), each in a short-lived process. Whenever a benchmark fetches its data,
+schedule() looks up the next few benchmarks in that order, takes the datasets they
+fetched in earlier runs from the dataset cache index, and queues them for a detached
+prefetch process. The prefetcher runs at the lowest CPU priority (which is also the
+lowest I/O priority under the CFQ and BFQ schedulers) and copies on a single I/O thread
+throttled to CASABENCH_PREFETCH_RATE, so that it stays out of the way of the sample
+being measured. When a benchmark needs a dataset that is still being prefetched, it
+waits for the copy and the throttle is lifted.
+
+Prefetching requires the dataset cache (CASABENCH_CACHE_DIR) and is disabled with
+CASABENCH_PREFETCH=0. The queue and the prefetcher's log are kept in the harness
+directory under prefetch/.
+"""
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import config, datacache
+
+# benchmark names in the order asv runs them, read once per process
+_order = None
+
+
+def schedule(current):
+    """Queue the datasets of the benchmarks that follow current, starting the prefetcher"""
+    order = planned_order()
+    if current not in order:
+        return
+    position = order.index(current)
+    usage = datacache.usage()
+    own = set(usage.get(current, []))
+    upcoming = []
+    found = 0
+    # the order is cyclic: asv interleaves its rounds over the same sequence
+    for name in order[position + 1:] + order[:position]:
+        if name not in usage:
+            continue
+        upcoming.extend(s for s in usage[name] if s not in own and s not in upcoming)
+        found += 1
+        if found >= config.prefetch_ahead():
+            break
+
+    with _queue() as queue:
+        queue[:] = upcoming
+    if upcoming:
+        _start()
+
+
+def planned_order():
+    """Benchmark names in the order asv runs them, from the results benchmarks.json"""
+    global _order
+    if _order is None:
+        try:
+            with open(os.path.join(config.results_dir(), "benchmarks.json")) as fp:
+                benchmarks = json.load(fp)
+        except (OSError, ValueError):
+            benchmarks = {}
+        groups = {}
+        for name, benchmark in sorted(benchmarks.items()):
+            if isinstance(benchmark, dict):
+                groups.setdefault(benchmark.get("setup_cache_key"), []).append(name)
+        _order = [name for names in groups.values() for name in names]
+    return _order
+
+
+def main():
+    """Prefetcher loop: fetch queued datasets until the queue is empty"""
+    with open(_lock_file(), "a") as lock_fp:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another prefetcher is running
+        os.nice(19)
+        while True:
+            with _queue() as queue:
+                if not queue:
+                    break
+                source = queue.pop(0)
+            worker = threading.Thread(target=_fetch, args=(source,), name="prefetch-io")
+            worker.start()
+            worker.join()
+
+
+def _fetch(source):
+    try:
+        path = datacache.fetch(source, rate=config.prefetch_rate())
+    except OSError as exc:
+        print("prefetch of {} failed: {}".format(source, exc), flush=True)
+    else:
+        print("prefetched {} -> {}".format(source, path), flush=True)
+
+
+def _start():
+    """Start the prefetcher unless it is already running"""
+    if fcntl is not None:
+        with open(_lock_file(), "a") as lock_fp:
+            try:
+                fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+    # run from the directory containing the benchmarks package, detached from asv; the
+    # shell exits once it has started the prefetcher in the background, so that the
+    # prefetcher is not a child of the benchmark process and the sampler and the
+    # process-tree counters do not count its I/O and CPU time
+    top = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with open(os.path.join(config.harness_dir("prefetch"), "prefetch.log"), "a") as log:
+        subprocess.run(["/bin/sh", "-c", '"$@" &', "sh", sys.executable, "-m", __name__],
+                       cwd=top, stdin=subprocess.DEVNULL, stdout=log,
+                       stderr=subprocess.STDOUT, start_new_session=True, check=False)
+
+
+def _lock_file():
+    """Held by the running prefetcher"""
+    return os.path.join(config.harness_dir("prefetch"), "prefetch.lock")
+
+
+@contextlib.contextmanager
+def _queue():
+    """Locked read-modify-write access to the list of queued sources"""
+    path = os.path.join(config.harness_dir("prefetch"), "queue.json")
+    with open(path + ".lock", "a") as lock_fp:
+        if fcntl is not None:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+        try:
+            with open(path) as fp:
+                queue = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            queue = []
+        yield queue
+        tmp = path + ".{}.tmp".format(os.getpid())
+        with open(tmp, "w") as fp:
+            json.dump(queue, fp, indent=1)
+        os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    main()
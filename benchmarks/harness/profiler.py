@@ -0,0 +1,90 @@
+"""
+cProfile capture of the measured region
+
+Much of the time of sdbaseline, uvcontsub, sdcal, importasdm or flagdata's list mode
+goes to the Python task layer (parameter handling, command parsing, table bookkeeping)
+rather than to C++. asv's own profiler (``asv run --profile``) calls the benchmark a
+second time after timing it, which these suites cannot do: the first call has already
+written the MS or applied the flags. With CASABENCH_PROFILE set, the harness instead
+profiles the measured call itself, from the end of setup to the start of teardown, of
+the benchmarks matching
+
+    CASABENCH_PROFILE=1                   -- the Python-heavy suites of PYTHON_HEAVY
+    CASABENCH_PROFILE=<pattern>,...       -- benchmarks matching fnmatch patterns
+
+Each sample is dumped in pstats format, gzip compressed, to
+results/profiles/<commit>-<environment>/<benchmark>[-<param index>].<pid>-<n>.pstats.gz.
+``python -m casabench.companion`` merges the samples of a benchmark into asv's
+"profile" result column, where ``asv profile`` and ``python -m casabench.profiles``
+read them. Profiling slows the task down, so timings of profiled samples (marked in
+the overhead metrics) are not comparable: the harness refuses to profile unless asv
+writes to a results directory other than the published one (see
+config.check_profiling). Do not combine it with ``asv run --profile``.
+"""
+import cProfile
+import fnmatch
+import gzip
+import marshal
+import os
+
+from . import config
+
+# benchmarks profiled with CASABENCH_PROFILE=1
+PYTHON_HEAVY = (
+    "bench_sdbaseline.*",
+    "bench_uvcontsub.*",
+    "bench_flagdata.ListMode.*",
+    "bench_sdcal.*",
+    "bench_importasdm.*",
+)
+
+# the profiler of the current measured region, if any
+_current = None
+
+# samples written by this process
+_count = 0
+
+
+def enabled(benchmark):
+    """Whether the measured region of a benchmark is profiled"""
+    patterns = config.profile_patterns()
+    if patterns == ["1"]:
+        patterns = PYTHON_HEAVY
+    return any(fnmatch.fnmatchcase(benchmark, pattern) for pattern in patterns)
+
+
+def start(benchmark):
+    """Start profiling the measured region, returning whether it is profiled"""
+    global _current
+    if _current is not None or not enabled(benchmark):
+        return False
+    _current = cProfile.Profile()
+    _current.enable()
+    return True
+
+
+def stop(benchmark, param_index):
+    """Stop profiling and write the profile of the sample"""
+    global _current, _count
+    if _current is None:
+        return
+    profiler, _current = _current, None
+    profiler.disable()
+    profiler.create_stats()
+    path = profile_file(benchmark, param_index, "{}-{}".format(os.getpid(), _count))
+    _count += 1
+    try:
+        with gzip.open(path, "wb") as fp:
+            fp.write(marshal.dumps(profiler.stats))
+    except OSError:
+        pass  # never fail a benchmark over its bookkeeping
+
+
+def profile_file(benchmark, param_index, sample):
+    """Path of a profile of a benchmark for the current asv commit and environment"""
+    run = "{}-{}".format(os.environ.get("ASV_COMMIT", "unknown")[:8],
+                         os.environ.get("ASV_ENV_NAME", "unknown"))
+    directory = os.path.join(config.results_dir(), "profiles", run)
+    os.makedirs(directory, exist_ok=True)
+    name = benchmark if not param_index else "{}-{}".format(benchmark, param_index)
+    return os.path.join(directory, "{}.{}.pstats.gz".format(name, sample))
@@ -0,0 +1,234 @@
+"""
+Resource usage time series of the measured region
+
+A peakmem_ benchmark reports one number; when it moves, the question is which part of
+the task made it move. With CASABENCH_SAMPLE_INTERVAL set to a number of seconds, a
+sampler thread reads /proc for the benchmark process and all of its descendants (e.g.
+the MPI servers of a parallel tclean) from the end of setup to the start of teardown,
+and records the sums of
+
+    rss, pss            -- resident and proportional set size, bytes
+    utime, stime        -- user and system CPU time, seconds
+    threads, fds        -- threads and open file descriptors
+    read_bytes, write_bytes -- bytes read from and written to storage
+
+at every tick, with t the seconds since the start of the measured region. Each sample
+of a benchmark is appended to
+results/timeseries/<commit>-<environment>/<benchmark>[-<param index>].csv.gz as a
+separate gzip member, headed by a "# sample <n> <start time>" line; the file can be read
+with gzip.open and split on those lines. Linux only; values a process does not let us
+read (e.g. /proc/<pid>/io of another user) count as 0.
+"""
+import gzip
+import os
+import resource
+import threading
+import time
+
+from . import config
+
+COLUMNS = ("t", "rss", "pss", "utime", "stime", "threads", "fds", "read_bytes", "write_bytes")
+
+IO_FIELDS = ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# procfs, where the usage of the process tree is read
+_PROC = "/proc"
+
+
+class Sampler(threading.Thread):
+    """Samples the process tree of this process until stop()"""
+
+    def __init__(self, interval):
+        threading.Thread.__init__(self, name="sampler", daemon=True)
+        self.interval = interval
+        self.rows = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.rows.append(self.sample())
+
+    def sample(self):
+        root = os.getpid()
+        totals = [0] * (len(COLUMNS) - 1)
+        for pid in _tree(root):
+            for i, value in enumerate(_usage(pid, reaped=pid == root)):
+                totals[i] += value
+        totals[2] = round(totals[2], 2)
+        totals[3] = round(totals[3], 2)
+        if self.is_alive():
+            totals[4] -= 1  # not counting the sampler itself
+        return [round(time.perf_counter() - self._start, 3)] + totals
+
+    def stop(self):
+        """Stop sampling, taking a last sample, and return the rows"""
+        self._stopped.set()
+        self.join()
+        self.rows.append(self.sample())
+        return self.rows
+
+
+# the sampler of the current measured region, if any
+_current = None
+
+# samples written by this process, per benchmark file
+_samples = {}
+
+
+def available():
+    return config.sample_interval() > 0 and os.path.isdir(os.path.join(_PROC, "self"))
+
+
+def start():
+    """Start sampling the measured region"""
+    global _current
+    if _current is not None or not available():
+        return
+    _current = Sampler(config.sample_interval())
+    _current.rows.append(_current.sample())
+    _current.start()
+
+
+def stop(benchmark, param_index):
+    """Stop sampling and append the series to the time series file of the benchmark"""
+    global _current
+    if _current is None:
+        return
+    sampler, _current = _current, None
+    rows = sampler.stop()
+    path = timeseries_file(benchmark, param_index)
+    sample = _samples.get(path, 0)
+    _samples[path] = sample + 1
+    lines = ["# sample {} {:.3f}".format(sample, sampler.started_at), ",".join(COLUMNS)]
+    lines.extend(",".join(str(value) for value in row) for row in rows)
+    try:
+        with gzip.open(path, "at") as fp:
+            fp.write("\n".join(lines) + "\n")
+    except OSError:
+        pass  # never fail a benchmark over its bookkeeping
+
+
+def timeseries_file(benchmark, param_index):
+    """Path of the time series of a benchmark for the current asv commit and environment"""
+    run = "{}-{}".format(os.environ.get("ASV_COMMIT", "unknown")[:8],
+                         os.environ.get("ASV_ENV_NAME", "unknown"))
+    directory = os.path.join(config.results_dir(), "timeseries", run)
+    os.makedirs(directory, exist_ok=True)
+    name = benchmark if not param_index else "{}-{}".format(benchmark, param_index)
+    return os.path.join(directory, name + ".csv.gz")
+
+
+def _tree(pid):
+    """pid and the pids of all of its descendants"""
+    pids = [pid]
+    for parent in pids:
+        pids.extend(_children(parent))
+    return pids
+
+
+def _children(pid):
+    children = []
+    try:
+        tasks = os.listdir(os.path.join(_PROC, str(pid), "task"))
+    except OSError:
+        return children
+    for tid in tasks:
+        try:
+            with open(os.path.join(_PROC, str(pid), "task", tid, "children")) as fp:
+                children.extend(int(child) for child in fp.read().split())
+        except (OSError, ValueError):
+            pass
+    return children
+
+
+def _usage(pid, reaped=False):
+    """rss, pss, utime, stime, threads, fds, read_bytes, write_bytes of one process
+
+    reaped adds the CPU time of the children that the process has waited for.
+    """
+    try:
+        with open(os.path.join(_PROC, str(pid), "stat")) as fp:
+            # the command name may contain spaces, the fields after it do not
+            fields = fp.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return [0] * 8
+    utime = int(fields[11]) / _CLOCK_TICKS
+    stime = int(fields[12]) / _CLOCK_TICKS
+    if reaped:
+        utime += int(fields[13]) / _CLOCK_TICKS
+        stime += int(fields[14]) / _CLOCK_TICKS
+    threads = int(fields[17])
+    rss = int(fields[21]) * _PAGE_SIZE
+
+    pss = 0
+    try:
+        with open(os.path.join(_PROC, str(pid), "smaps_rollup")) as fp:
+            for line in fp:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+
+    try:
+        fds = len(os.listdir(os.path.join(_PROC, str(pid), "fd")))
+    except OSError:
+        fds = 0
+
+    io = _io(pid)
+    return [rss, pss, utime, stime, threads, fds, io["read_bytes"], io["write_bytes"]]
+
+
+def cpu_time():
+    """User plus system CPU seconds of this process and its descendants so far
+
+    Children that have been waited for are counted through getrusage, live ones (and
+    what they have waited for) through /proc/<pid>/stat.
+    """
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    if os.path.isdir(os.path.join(_PROC, "self")):
+        for pid in _tree(os.getpid())[1:]:
+            try:
+                with open(os.path.join(_PROC, str(pid), "stat")) as fp:
+                    fields = fp.read().rsplit(")", 1)[1].split()
+                total += sum(int(ticks) for ticks in fields[11:15]) / _CLOCK_TICKS
+            except (OSError, IndexError, ValueError):
+                pass
+    return total
+
+
+def io_counters():
+    """I/O counters of /proc/<pid>/io summed over this process and its descendants
+
+    rchar and wchar count the bytes passed to read and write calls, syscr and syscw the
+    calls, read_bytes and write_bytes the bytes that went to storage. Children that have
+    been waited for are included in the counters of their parent.
+    """
+    totals = dict.fromkeys(IO_FIELDS, 0)
+    if not os.path.isdir(os.path.join(_PROC, "self")):
+        return totals
+    for pid in _tree(os.getpid()):
+        for key, value in _io(pid).items():
+            totals[key] += value
+    return totals
+
+
+def _io(pid):
+    counters = dict.fromkeys(IO_FIELDS, 0)
+    try:
+        with open(os.path.join(_PROC, str(pid), "io")) as fp:
+            for line in fp:
+                key, _, value = line.partition(":")
+                if key in counters:
+                    counters[key] = int(value)
+    except OSError:
+        pass
+    return counters
@@ -0,0 +1,416 @@
+"""
+Staging of test datasets into the benchmark working directory
+
+Every suite runs with ``number = 1``, so each sample starts from a fresh working copy
+of its input MS. stage() materializes that copy, from the local dataset cache when it
+is enabled (see datacache), as cheaply as the filesystem allows:
+
+1. reflink (copy-on-write clone) of each file where the filesystem supports it
+2. otherwise, for datasets served from the dataset cache, a hard link for every large
+   file that no task has been seen to modify, and a real copy of everything else
+   (files of the casatestdata checkout itself are never hard linked: the working copy
+   would share their inodes, and a task writing one of them in place would change the
+   shared test data for good)
+3. otherwise (or with CASABENCH_STAGING=copy) a plain copy
+
+Files are staged concurrently on CASABENCH_COPY_THREADS threads, and copies go through
+copier.copy_file(), so that large files are copied in the kernel.
+
+The set of modified files is learned per dataset: the first staging of a dataset is
+always a full copy, and unstage() compares the working copy against the source to
+record which files the task wrote. Every later consumer of the dataset copies the
+union of those files and links the rest. If a linked file is nevertheless modified
+in place, unstage() records it and raises StagingError, since the source dataset has
+been changed under the benchmark.
+
+Between the samples of a benchmark the working copy does not have to be rebuilt:
+stage() remembers the size, mtime and inode of every file it materialized, and when
+it is called again for the same destination and source it only restages the files
+the task modified or replaced, and deletes the files the task added. Teardowns that
+want this call release() instead of unstage(); asv removes the working directory
+after the last sample.
+
+Datasets that the benchmarked task only reads need no copy at all: link() makes the
+working copy a symbolic link to the dataset cache entry and records the size, mtime and
+inode of its files. release(), unstage() and verify() compare the entry against that
+record and raise StagingError if the task wrote to it after all; the modified entry is
+discarded so that the next run fetches a clean copy. Without the dataset cache there is
+no entry to link to, and link() stages a writable working copy instead: a link into the
+casatestdata checkout would let a task spoil the test data of every later benchmark.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on every platform, reflinks are then skipped
+    fcntl = None
+
+from . import config, copier, datacache
+
+# ioctl request for a whole-file clone, from linux/fs.h
+FICLONE = 0x40049409
+
+# Files below this size are always copied. This covers table.dat, table.lock and
+# table.info, which casacore rewrites in place whenever a table is opened for update
+LINK_MIN_SIZE = 1 << 20
+
+# casacore rewrites the lock file of a table whenever it is opened, even for reading
+_UNGUARDED = {"table.lock"}
+
+# errno values meaning "this pair of filesystems cannot reflink", not "this file failed"
+_NO_REFLINK_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+# (source device, destination device) pairs already known not to support reflinks
+_no_reflink = set()
+
+# working copy path -> StagedData, for the working copies made by this process
+_staged = {}
+
+# guards the StagedData updates made from the staging threads
+_lock = threading.Lock()
+
+# bytes materialized by this process, over all working copies
+counters = {"bytes_copied": 0, "bytes_cloned": 0, "bytes_linked": 0}
+
+
+class StagingError(RuntimeError):
+    """A benchmark modified a source dataset through a hard link or a read-only link"""
+
+
+class StagedData:
+    """A working copy made by stage() and how it was materialized"""
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self.copied = []
+        self.cloned = []
+        # relative path -> (st_ino, st_size, st_mtime_ns) at link time
+        self.linked = {}
+        # relative path -> (st_ino, st_size, st_mtime_ns) of every file after staging
+        self.snapshot = {}
+        # bytes and time spent by the latest stage() call, a full staging or a restore
+        self.bytes_copied = 0
+        self.bytes_cloned = 0
+        self.bytes_linked = 0
+        self.seconds = 0.0
+        self.restored = False
+        # made by link(): path is a symbolic link to source, which must not change
+        self.readonly = False
+
+    @property
+    def rate(self):
+        """Bytes materialized per second by the latest stage() call (links excluded)"""
+        if self.seconds <= 0:
+            return 0.0
+        return (self.bytes_copied + self.bytes_cloned) / self.seconds
+
+    def __repr__(self):
+        return "<StagedData {} copied={} cloned={} linked={} {:.3f}s {:.1f} MiB/s>".format(
+            self.path, self.bytes_copied, self.bytes_cloned, self.bytes_linked, self.seconds,
+            self.rate / (1 << 20))
+
+
+def stage(source, dest=None):
+    """Materialize a writable working copy of source (a table tree or a single file)
+
+    dest defaults to the basename of source in the current working directory, and is
+    replaced if it already exists; a working copy of the same source made earlier by
+    this process is restored instead. Returns the StagedData describing the copy.
+    """
+    source = os.path.abspath(source.rstrip("/"))
+    if dest is None:
+        dest = os.path.basename(source)
+    dest = os.path.abspath(dest.rstrip("/"))
+    source = datacache.fetch(source)
+    mode = config.staging_mode()
+
+    previous = _staged.get(dest)
+    if previous is not None and not previous.readonly and previous.source == source and \
+            os.path.lexists(dest):
+        return _restore(previous, mode)
+    unstage(dest)
+
+    start = time.perf_counter()
+    staged = StagedData(source, dest)
+    if os.path.isdir(source):
+        written = _load_written(source) if _linkable(source, mode) else None
+        rels = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            rel_dir = os.path.relpath(dirpath, source)
+            os.makedirs(os.path.normpath(os.path.join(dest, rel_dir)), exist_ok=True)
+            for name in filenames:
+                rels.append(os.path.normpath(os.path.join(rel_dir, name)))
+        copier.copy_many(lambda rel: _stage_file(staged, rel, mode, written), rels)
+    else:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _stage_file(staged, None, mode, None)
+    staged.snapshot = _snapshot(dest)
+    staged.seconds = time.perf_counter() - start
+    _staged[dest] = staged
+    return staged
+
+
+def link(source, dest=None):
+    """Make dest (by default the basename of source) a read-only working copy of source
+
+    The working copy is a symbolic link to the dataset cache entry of source. Without
+    one (the dataset cache is disabled) it is a working copy made by stage(). Returns
+    the StagedData describing it.
+    """
+    source = os.path.abspath(source.rstrip("/"))
+    if dest is None:
+        dest = os.path.basename(source)
+    dest = os.path.abspath(dest.rstrip("/"))
+    cached = datacache.fetch(source)
+    if not datacache.is_cached(cached):
+        return stage(source, dest)
+    source = cached
+
+    previous = _staged.get(dest)
+    if previous is not None and previous.readonly and previous.source == source and \
+            os.path.islink(dest):
+        _verify(previous)
+        previous.restored = True
+        return previous
+    unstage(dest)
+
+    start = time.perf_counter()
+    staged = StagedData(source, dest)
+    staged.readonly = True
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.symlink(source, dest)
+    staged.snapshot = _guarded(source)
+    staged.seconds = time.perf_counter() - start
+    _staged[dest] = staged
+    return staged
+
+
+def verify():
+    """Raise StagingError if a read-only working copy made by this process was modified"""
+    for staged in list(_staged.values()):
+        if staged.readonly:
+            _verify(staged)
+
+
+def release(path):
+    """End of a sample: learn what the task wrote but keep the working copy for stage()"""
+    staged = _staged.get(os.path.abspath(path.rstrip("/")))
+    if staged is not None and staged.readonly:
+        _verify(staged)
+    elif staged is not None and os.path.isdir(staged.source):
+        _learn(staged)
+
+
+def unstage(path):
+    """Remove a working copy, learning which files of its source the task wrote
+
+    Safe to call on paths that were never staged (they are simply removed).
+    """
+    path = os.path.abspath(path.rstrip("/"))
+    staged = _staged.pop(path, None)
+    try:
+        if staged is not None and staged.readonly:
+            _verify(staged)
+        elif staged is not None and os.path.isdir(staged.source):
+            _learn(staged)
+    finally:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+
+def _restore(staged, mode):
+    """Bring a working copy back to its staged state, restaging only what changed"""
+    start = time.perf_counter()
+    if os.path.isdir(staged.source):
+        _learn(staged)
+    written = _load_written(staged.source) if _linkable(staged.source, mode) else None
+    current = _snapshot(staged.path)
+    staged.bytes_copied = staged.bytes_cloned = staged.bytes_linked = 0
+
+    for rel in current:
+        if rel not in staged.snapshot:
+            os.remove(staged.path if rel is None else os.path.join(staged.path, rel))
+    if os.path.isdir(staged.source):
+        # directories created by the task, deepest first
+        for dirpath, dirnames, filenames in os.walk(staged.path, topdown=False):
+            if not os.path.isdir(os.path.join(staged.source, os.path.relpath(dirpath, staged.path))):
+                shutil.rmtree(dirpath)
+
+    changed = [rel for rel, state in staged.snapshot.items() if current.get(rel) != state]
+    for rel in changed:
+        dst = staged.path if rel is None else os.path.join(staged.path, rel)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if rel in staged.copied:
+            staged.copied.remove(rel)
+        if rel in staged.cloned:
+            staged.cloned.remove(rel)
+        staged.linked.pop(rel, None)
+    copier.copy_many(lambda rel: _stage_file(staged, rel, mode, None if rel is None else written),
+                     changed)
+
+    staged.snapshot = _snapshot(staged.path)
+    staged.seconds = time.perf_counter() - start
+    staged.restored = True
+    return staged
+
+
+def _linkable(source, mode):
+    """Whether large files of source may be hard linked: only cache entries, which a
+    write through a link can spoil but the cache then discards"""
+    return mode == "auto" and datacache.is_cached(source)
+
+
+def _snapshot(path):
+    """relative path -> (st_ino, st_size, st_mtime_ns) of the files of a working copy"""
+    if not os.path.isdir(path):
+        st = _stat(path)
+        return {} if st is None else {None: (st.st_ino, st.st_size, st.st_mtime_ns)}
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            st = os.lstat(full)
+            found[os.path.relpath(full, path)] = (st.st_ino, st.st_size, st.st_mtime_ns)
+    return found
+
+
+def _stage_file(staged, rel, mode, written):
+    if rel is None:
+        src, dst = staged.source, staged.path
+    else:
+        src, dst = os.path.join(staged.source, rel), os.path.join(staged.path, rel)
+    size = os.stat(src).st_size
+
+    if mode != "copy" and _reflink(src, dst):
+        with _lock:
+            staged.cloned.append(rel)
+            staged.bytes_cloned += size
+            counters["bytes_cloned"] += size
+        return
+
+    if written is not None and rel not in written and size >= LINK_MIN_SIZE:
+        try:
+            os.link(src, dst)
+        except OSError:
+            pass
+        else:
+            st = os.stat(dst)
+            with _lock:
+                staged.linked[rel] = (st.st_ino, st.st_size, st.st_mtime_ns)
+                staged.bytes_linked += size
+                counters["bytes_linked"] += size
+            return
+
+    copier.copy_file(src, dst)
+    with _lock:
+        staged.copied.append(rel)
+        staged.bytes_copied += size
+        counters["bytes_copied"] += size
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    key = (os.stat(src).st_dev, os.stat(os.path.dirname(dst)).st_dev)
+    if key in _no_reflink:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as exc:
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if exc.errno not in _NO_REFLINK_ERRNOS:
+            raise
+        _no_reflink.add(key)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _learn(staged):
+    """Record the files the task wrote, raise if any of them was a hard link"""
+    if not os.path.isdir(staged.path):
+        return  # removed by the suite itself, nothing to learn from
+    written = set()
+    for rel in staged.copied + staged.cloned:
+        current = _stat(os.path.join(staged.path, rel))
+        original = _stat(os.path.join(staged.source, rel))
+        if current is None or original is None or \
+                (current.st_size, current.st_mtime_ns) != (original.st_size, original.st_mtime_ns):
+            written.add(rel)
+
+    modified = []
+    for rel, (ino, size, mtime_ns) in staged.linked.items():
+        current = _stat(os.path.join(staged.path, rel))
+        # a replaced file (new inode) left the source alone, an in-place write did not
+        if current is not None and current.st_ino == ino and \
+                (current.st_size, current.st_mtime_ns) != (size, mtime_ns):
+            modified.append(rel)
+    written.update(modified)
+
+    if written or _load_written(staged.source) is None:
+        _save_written(staged.source, written)
+    if modified:
+        # the source is corrupt from here on; a cached copy can at least be refetched
+        datacache.discard(staged.source)
+        raise StagingError("benchmark modified hard linked files of {} in place: {}".format(
+            staged.source, ", ".join(sorted(modified))))
+
+
+def _guarded(source):
+    """The snapshot of source that a read-only working copy must leave unchanged"""
+    return {rel: state for rel, state in _snapshot(source).items()
+            if rel is None or os.path.basename(rel) not in _UNGUARDED}
+
+
+def _verify(staged):
+    current = _guarded(staged.source)
+    modified = sorted(str(rel) for rel in set(current) | set(staged.snapshot)
+                      if current.get(rel) != staged.snapshot.get(rel))
+    if modified:
+        _staged.pop(staged.path, None)
+        datacache.discard(staged.source)
+        raise StagingError("benchmark modified read-only dataset {}: {}".format(
+            staged.source, ", ".join(modified)))
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _state_file(source):
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    return os.path.join(config.harness_dir("staging"), digest + ".json")
+
+
+def _load_written(source):
+    """Files of source known to be written by some task, None if never observed"""
+    try:
+        with open(_state_file(source)) as fp:
+            return set(json.load(fp)["written"])
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def _save_written(source, written):
+    written = written | (_load_written(source) or set())
+    state_file = _state_file(source)
+    tmp = state_file + ".{}.tmp".format(os.getpid())
+    with open(tmp, "w") as fp:
+        json.dump({"source": source, "written": sorted(written)}, fp, indent=1)
+    os.replace(tmp, state_file)
@@ -0,0 +1,143 @@
+"""
+Phase durations of CASA tasks, from their log
+
+asv times a task call as a whole. The task's log marks where its phases start: tclean
+announces its stages with banners such as "------ Run Major Cycle 1 -------", the
+calibration solvers log "Solving for G" and "Writing solutions to table". run() calls a
+task with casalog redirected to a file of its own and stamps every log line as it is
+written; durations() turns the stamped lines into the time spent in each phase of
+PHASES, which suites report as track_ metrics:
+
+    setup -- from "Begin Task" to the first phase marker (data selection, set up)
+    <phase> -- from its marker to the next marker, or to "End Task"
+
+casalog itself only records whole seconds, so run() follows the log file on a thread
+(not counted by the perf counters) and uses the time each line arrives instead; read() gives the same entries with the
+logged (second resolution) times for a log written without run().
+"""
+import collections
+import os
+import re
+import threading
+import time
+
+from . import perfcounters
+
+# phase -> pattern of the log message that starts it (first match wins)
+PHASES = collections.OrderedDict([
+    ("psf", re.compile(r"-{3,}\s*Make PSF", re.I)),
+    ("primary_beam", re.compile(r"-{3,}\s*Make (Primary Beam|PB)", re.I)),
+    ("major_cycle", re.compile(r"-{3,}\s*Run (\(Last\) )?Major Cycle", re.I)),
+    ("minor_cycle", re.compile(r"-{3,}\s*Run Minor Cycle", re.I)),
+    ("restore", re.compile(r"-{3,}\s*Restor", re.I)),
+    ("solve", re.compile(r"^Solving for", re.I)),
+    ("write", re.compile(r"^Writing solutions to table", re.I)),
+])
+
+BEGIN = re.compile(r"#+\s*Begin Task")
+END = re.compile(r"#+\s*End Task")
+
+# seconds between reads of the log file by run()
+POLL_INTERVAL = 0.01
+
+
+class _Follower(threading.Thread):
+    """Reads the lines appended to a file, stamping each with its arrival time"""
+
+    def __init__(self, path):
+        threading.Thread.__init__(self, name="tasklog", daemon=True)
+        self.path = path
+        self.entries = []
+        # only what is appended from now on
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+        self._fp = None
+        self._partial = ""
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(POLL_INTERVAL):
+            self.poll()
+
+    def poll(self):
+        if self._fp is None:
+            try:
+                self._fp = open(self.path, errors="replace")
+            except FileNotFoundError:
+                return
+            self._fp.seek(self._offset)
+        data = self._partial + self._fp.read()
+        now = time.perf_counter()
+        lines = data.split("\n")
+        self._partial = lines.pop()
+        self.entries.extend((now, _message(line)) for line in lines if line)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.poll()
+        if self._fp is not None:
+            self._fp.close()
+        return self.entries
+
+
+def run(task, logfile, *args, **kwargs):
+    """Call task(*args, **kwargs) logging to logfile, return the stamped log messages
+
+    The entries are (seconds, message) pairs, seconds counted from the call.
+    """
+    from casatasks import casalog
+
+    casalog.setlogfile(logfile)
+    follower = _Follower(logfile)
+    with perfcounters.paused():
+        follower.start()
+    start = time.perf_counter()
+    try:
+        task(*args, **kwargs)
+    finally:
+        entries = follower.stop()
+    return [(stamp - start, message) for stamp, message in entries]
+
+
+def read(logfile):
+    """(seconds, message) pairs of a casalog file, with the logged times"""
+    entries = []
+    with open(logfile, errors="replace") as fp:
+        for line in fp:
+            fields = line.rstrip("\n").split("\t", 3)
+            try:
+                stamp = time.mktime(time.strptime(fields[0], "%Y-%m-%d %H:%M:%S"))
+            except (ValueError, OverflowError):
+                continue
+            entries.append((stamp, _message(line)))
+    return entries
+
+
+def durations(entries):
+    """phase -> seconds spent in it, over all task calls in the entries"""
+    spent = collections.OrderedDict()
+    phase = started = None
+    for stamp, message in entries:
+        if BEGIN.search(message):
+            phase, started = "setup", stamp
+            continue
+        if phase is None:
+            continue
+        if END.search(message):
+            spent[phase] = spent.get(phase, 0.0) + stamp - started
+            phase = None
+            continue
+        for name, pattern in PHASES.items():
+            if pattern.search(message):
+                spent[phase] = spent.get(phase, 0.0) + stamp - started
+                phase, started = name, stamp
+                break
+    if phase is not None and entries:
+        spent[phase] = spent.get(phase, 0.0) + entries[-1][0] - started
+    return spent
+
+
+def _message(line):
+    """The message of a casalog line: date time, priority, origin, message"""
+    fields = line.rstrip("\n").split("\t", 3)
+    return fields[-1].strip()
@@ -0,0 +1,109 @@
+"""
+Background removal of task outputs
+
+Removing the image cubes and tables written by a task can take as long as the task
+itself, and teardowns used to do it with os.system('rm -rf ...'), forking a shell and
+waiting for every unlink. discard() instead renames the matching paths into a trash
+directory on the same filesystem, which is a single metadata update, and returns; a
+background thread running at the lowest CPU (and, under CFQ/BFQ, I/O) priority removes
+them while the next sample is set up. The harness calls barrier() at the end of every
+setup (see overhead), so the removal never overlaps a measured call.
+
+Suites that need the disk space of the previous sample back before their own setup
+stages data call barrier() at the start of their setup. The trash
+directory lives in the working directory of the benchmark, so whatever is left when the
+benchmark process ends is removed by asv together with that directory.
+"""
+import errno
+import glob
+import itertools
+import os
+import queue
+import shutil
+import threading
+
+# name of the trash directory created next to the discarded paths
+TRASH_NAME = ".casabench-trash"
+
+# device -> trash directory on that device
+_trash_dirs = {}
+
+# numbers the entries of the trash directories
+_count = itertools.count()
+
+# discarded paths waiting for removal
+_pending = queue.Queue()
+
+_worker = None
+_lock = threading.Lock()
+
+
+def discard(*patterns):
+    """Remove the paths matching the glob patterns in the background"""
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            _discard(os.path.abspath(path))
+
+
+def barrier():
+    """Wait until everything discarded so far has been removed"""
+    _pending.join()
+
+
+def _discard(path):
+    try:
+        trash = _trash_dir(path)
+        target = os.path.join(trash, "{}.{}.{}".format(os.getpid(), next(_count), os.path.basename(path)))
+        os.rename(path, target)
+    except OSError as exc:
+        if exc.errno == errno.ENOENT:
+            return
+        # e.g. a mount point between path and the trash, remove it in place
+        _remove(path)
+        return
+    _start()
+    _pending.put(target)
+
+
+def _trash_dir(path):
+    device = os.lstat(path).st_dev
+    trash = _trash_dirs.get(device)
+    if trash is None or not os.path.isdir(trash):
+        trash = os.path.join(os.path.dirname(path), TRASH_NAME)
+        os.makedirs(trash, exist_ok=True)
+        _trash_dirs[device] = trash
+    return trash
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _start():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_reclaim, name="trash", daemon=True)
+            _worker.start()
+
+
+def _reclaim():
+    # on Linux the nice value is per thread, so this leaves the benchmark's priority alone
+    get_native_id = getattr(threading, "get_native_id", None)
+    if get_native_id is not None and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, get_native_id(), 19)
+        except OSError:
+            pass
+    while True:
+        path = _pending.get()
+        try:
+            _remove(path)
+        finally:
+            _pending.task_done()
@@ -0,0 +1,194 @@
+"""
+Placement of the benchmark working directory in memory
+
+asv runs every benchmark in a temporary directory on whatever disk holds the asv
+environments, so the time tclean spends writing its images or uvcontsub its output MS
+depends on the host's storage. With CASABENCH_WORKSPACE_DIR pointing to a memory-backed
+filesystem (e.g. /dev/shm), enter() moves a benchmark process, before its first setup,
+into a private workspace there, provided that the benchmark fits:
+
+- the workspace footprint of the benchmark (working copies plus outputs, measured at
+  the end of each sample by measure()) is known from an earlier run, and
+- it is below CASABENCH_WORKSPACE_BYTES and the free space of the filesystem.
+
+Otherwise the benchmark stays in asv's directory on disk; the first run of a benchmark
+is therefore always on disk. The entries of asv's directory (e.g. the products of
+setup_cache) are linked into the workspace, so suites see the same relative paths in
+either place. The placement of every sample is recorded with the overhead metrics.
+
+Workspaces of benchmark processes that have exited are removed by the next enter().
+"""
+import atexit
+import contextlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import config, trash
+
+DISK = "disk"
+MEMORY = "memory"
+
+# the Workspace of this process, set by the first enter()
+_active = None
+
+
+class Workspace:
+    """Where a benchmark process writes, and what it wrote at most"""
+
+    def __init__(self, benchmark, origin, path, placement):
+        self.benchmark = benchmark
+        self.origin = origin
+        self.path = path
+        self.placement = placement
+        # entries present before the first setup, e.g. the products of setup_cache
+        self.inherited = set(os.listdir(path))
+        self.peak = 0
+
+
+def enter(benchmark):
+    """Change into the workspace of the benchmark process, returning its placement"""
+    global _active
+    if _active is not None:
+        return _active.placement
+    origin = os.getcwd()
+    root = config.workspace_dir()
+    if root is None or not _fits(root, benchmark):
+        _active = Workspace(benchmark, origin, origin, DISK)
+        return DISK
+
+    path = tempfile.mkdtemp(prefix="{}-".format(os.getpid()), dir=root)
+    for name in os.listdir(origin):
+        os.symlink(os.path.join(origin, name), os.path.join(path, name))
+    os.chdir(path)
+    atexit.register(_remove, path, origin)
+    _active = Workspace(benchmark, origin, path, MEMORY)
+    return MEMORY
+
+
+def entries():
+    """Paths of the workspace entries created since the first setup"""
+    if _active is None:
+        return []
+    return [os.path.join(_active.path, name) for name in os.listdir(_active.path)
+            if name not in _active.inherited and name != trash.TRASH_NAME]
+
+
+def stamp():
+    """Time from which files written count as outputs, for measure(since=...)
+
+    The kernel stamps files with its clock as of the last tick, so a file written just
+    after time.time() may carry an earlier mtime. Waiting for the next tick (a few ms)
+    separates the files written before from those written after.
+    """
+    clock = getattr(time, "CLOCK_REALTIME_COARSE", None)
+    if clock is None:
+        return time.time()
+    start = time.clock_gettime(clock)
+    while True:
+        now = time.clock_gettime(clock)
+        if now != start:
+            return now
+        time.sleep(0.001)
+
+
+def measure(since=None):
+    """Record the bytes currently in the workspace as a footprint of the benchmark
+
+    Returns the bytes on disk of the files written since the stamp() since, i.e. the
+    outputs of the measured region (images, caltables, MS columns), or None.
+    """
+    if _active is None:
+        return None
+    nbytes = written = 0
+    for path in entries():
+        apparent, allocated = _sizes(path, since)
+        nbytes += apparent
+        written += allocated
+    if nbytes > _active.peak:
+        _active.peak = nbytes
+        with _footprints() as footprints:
+            footprints[_active.benchmark] = max(footprints.get(_active.benchmark, 0), nbytes)
+    return written if since is not None else None
+
+
+def _fits(root, benchmark):
+    _reap(root)
+    with _footprints() as footprints:
+        needed = footprints.get(benchmark)
+    if needed is None:
+        return False
+    st = os.statvfs(root)
+    return needed <= min(config.workspace_bytes(), st.f_bavail * st.f_frsize)
+
+
+def _sizes(path, since=None):
+    """Bytes of the files below path as they would take when copied (links are free), and
+    the bytes allocated on disk to those of them modified since the stamp() since
+    """
+    if os.path.islink(path):
+        return 0, 0
+    if os.path.isdir(path):
+        files = (os.path.join(dirpath, name)
+                 for dirpath, dirnames, filenames in os.walk(path) for name in filenames)
+    else:
+        files = [path]
+    apparent = allocated = 0
+    for file in files:
+        try:
+            st = os.lstat(file)
+        except FileNotFoundError:
+            continue
+        if stat.S_ISLNK(st.st_mode):
+            continue
+        apparent += st.st_size
+        if since is not None and st.st_mtime >= since:
+            allocated += st.st_blocks * 512
+    return apparent, allocated
+
+
+def _reap(root):
+    """Remove the workspaces of processes that are gone"""
+    for name in os.listdir(root):
+        pid = name.split("-", 1)[0]
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        except PermissionError:
+            pass
+
+
+def _remove(path, origin):
+    if os.getcwd() == path:
+        os.chdir(origin)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _footprints():
+    """Locked read-modify-write access to the benchmark name -> footprint bytes map"""
+    path = os.path.join(config.harness_dir("workspace"), "footprints.json")
+    with open(path + ".lock", "a") as lock_fp:
+        if fcntl is not None:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+        try:
+            with open(path) as fp:
+                footprints = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            footprints = {}
+        yield footprints
+        tmp = path + ".{}.tmp".format(os.getpid())
+        with open(tmp, "w") as fp:
+            json.dump(footprints, fp, indent=1, sort_keys=True)
+        os.replace(tmp, path)
@@ -0,0 +1,3 @@
+"""
+Tools for the casabench results database
+"""
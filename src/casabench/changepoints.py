@@ -0,0 +1,239 @@
+"""
+Ranked regressions and improvements of all benchmark series
+
+asv looks for steps one benchmark at a time, in pure Python. This tool loads every
+series of the results store (see casabench.results; one per machine, Python environment
+and parameter combination, current benchmark versions only) into one array, ordered by
+casatasks version, and looks for change points in all of them at once:
+
+1. candidates -- at every position of every series, the mean of the log medians over
+   the WINDOW versions before is compared to the mean over the WINDOW versions after
+   (from cumulative sums, so all positions of all series take a few array operations).
+   A position is a candidate when the difference exceeds Z_CANDIDATE standard errors and
+   MIN_CHANGE, and is the largest within WINDOW versions on either side.
+2. significance -- for each candidate, BOOTSTRAP resamples of both windows draw versions
+   with replacement and, for versions with stored samples (asv run --record-samples), one
+   of their samples. Versions without samples contribute their median, perturbed by a
+   normal error with the standard deviation implied by their 99% confidence interval (or
+   else their interquartile range), so that a step within the measurement noise of its
+   points is not significant however few the versions. A step is significant when the
+   bootstrap distribution of the difference lies on one side of 0 with probability ALPHA
+   or better, after a Bonferroni correction for the steps scanned in the series (about
+   one per WINDOW versions), of which the candidate is the largest.
+
+Steps are ranked by their relative size; a regression is an increase (asv benchmarks
+measure times and memory, so lower is better). Each step is reported with the last
+version before it and the first version after it, and the Python it was run with:
+
+    python -m casabench.changepoints [results_dir] [--machine casa-perf-test] \\
+        [--since 6.6] [--top 50] [--json regressions.json]
+"""
+import argparse
+import collections
+import json
+import math
+
+import numpy
+
+from . import results, store
+
+# versions on either side of a change point
+WINDOW = 5
+# fewest versions on a side of a change point
+MIN_POINTS = 3
+# standard errors a candidate step has to exceed
+Z_CANDIDATE = 3.0
+# smallest relative step reported
+MIN_CHANGE = 0.05
+# bootstrap resamples, and the one-sided probability a significant step may reach 0
+BOOTSTRAP = 1000
+ALPHA = 0.01
+# standard normal quantile of a two-sided 99% confidence interval, and the interquartile
+# range of the standard normal, which convert the stored bounds to standard deviations
+Z_99 = 2.576
+IQR_SIGMAS = 1.349
+
+Step = collections.namedtuple(
+    "Step", "benchmark machine python params before after value_before value_after change p")
+
+
+class Matrix:
+    """Series packed into arrays, one row per series, missing values removed
+
+    values holds the log medians, left-aligned and padded with NaN; samples the log
+    samples of each version, padded with NaN, or the log median where there are none;
+    noise the standard deviation of the log median of the versions without samples, and
+    0 for the others.
+    """
+
+    def __init__(self, series):
+        self.series = []
+        self.versions = []
+        rows = []
+        for s in series:
+            valid = numpy.isfinite(s.median) & (s.median > 0)
+            if valid.sum() < 2 * MIN_POINTS:
+                continue
+            self.series.append(s)
+            self.versions.append(s.versions[valid])
+            samples = s.samples[valid]
+            rows.append((numpy.log(s.median[valid]),
+                         numpy.where(samples > 0, samples, numpy.nan),
+                         noise(s)[valid]))
+        self.lengths = numpy.array([len(v) for v, _, _ in rows], dtype=int)
+        width = self.lengths.max() if rows else 0
+        depth = max([s.shape[1] for _, s, _ in rows] + [1])
+        self.values = numpy.full((len(rows), width), numpy.nan)
+        self.samples = numpy.full((len(rows), width, depth), numpy.nan)
+        self.noise = numpy.zeros((len(rows), width))
+        for i, (values, samples, sigma) in enumerate(rows):
+            self.values[i, :len(values)] = values
+            self.samples[i, :len(values), :samples.shape[1]] = numpy.log(samples)
+            # versions without samples are represented by their median and its noise
+            empty = ~numpy.isfinite(self.samples[i, :len(values)]).any(axis=1)
+            self.samples[i, :len(values)][empty, 0] = values[empty]
+            self.noise[i, :len(values)][empty] = sigma[empty]
+        # move the finite samples of every version to the front, and count them
+        order = numpy.argsort(~numpy.isfinite(self.samples), axis=2, kind="stable")
+        self.samples = numpy.take_along_axis(self.samples, order, axis=2)
+        self.counts = numpy.isfinite(self.samples).sum(axis=2)
+
+
+def noise(series):
+    """Standard deviation of the log median of every version of a results.Series
+
+    Taken from the 99% confidence interval of the median, or from the interquartile
+    range where the interval is unknown or unbounded; versions with neither get the
+    median noise of the series (0 if no version has any).
+    """
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ci = (numpy.log(series.ci_99_b) - numpy.log(series.ci_99_a)) / (2 * Z_99)
+        iqr = (numpy.log(series.q_75) - numpy.log(series.q_25)) / IQR_SIGMAS
+    sigma = numpy.where(numpy.isfinite(ci) & (ci >= 0), ci, iqr)
+    known = numpy.isfinite(sigma) & (sigma >= 0)
+    return numpy.where(known, sigma, numpy.median(sigma[known]) if known.any() else 0.0)
+
+
+def candidates(matrix, window=WINDOW):
+    """Series and positions (first version after the step) of the candidate steps, with
+    the difference of the window means of the log medians"""
+    n, width = matrix.values.shape
+    if not n or width < 2:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int), numpy.zeros(0)
+    values = numpy.nan_to_num(matrix.values)
+    zero = numpy.zeros((n, 1))
+    s1 = numpy.hstack([zero, numpy.cumsum(values, axis=1)])
+    s2 = numpy.hstack([zero, numpy.cumsum(values ** 2, axis=1)])
+    t = numpy.broadcast_to(numpy.arange(1, width), (n, width - 1))
+    lo = numpy.maximum(t - window, 0)
+    hi = numpy.minimum(t + window, matrix.lengths[:, None])
+    nb = (t - lo).astype(float)
+    na = (hi - t).astype(float)
+    usable = (nb >= MIN_POINTS) & (na >= MIN_POINTS)
+    nb[~usable] = na[~usable] = 1.0
+
+    def window_sums(sums, a, b):
+        return (numpy.take_along_axis(sums, numpy.clip(b, 0, width), axis=1) -
+                numpy.take_along_axis(sums, numpy.clip(a, 0, width), axis=1))
+
+    mean_b = window_sums(s1, lo, t) / nb
+    mean_a = window_sums(s1, t, hi) / na
+    var_b = numpy.maximum(window_sums(s2, lo, t) / nb - mean_b ** 2, 0) * nb / numpy.maximum(nb - 1, 1)
+    var_a = numpy.maximum(window_sums(s2, t, hi) / na - mean_a ** 2, 0) * na / numpy.maximum(na - 1, 1)
+    delta = mean_a - mean_b
+    noise = numpy.sqrt(var_b / nb + var_a / na)
+    score = numpy.where(usable, numpy.abs(delta) / numpy.maximum(noise, 1e-12), 0.0)
+    score[numpy.abs(delta) < math.log1p(MIN_CHANGE)] = 0.0
+
+    # keep the largest score within window positions on either side
+    # (a running maximum over shifted views, numpy<1.20 has no sliding_window_view)
+    padded = numpy.pad(score, ((0, 0), (window, window)))
+    peak = score.copy()
+    for shift in range(2 * window + 1):
+        numpy.maximum(peak, padded[:, shift:shift + width - 1], out=peak)
+    rows, positions = numpy.nonzero((score >= Z_CANDIDATE) & (score >= peak))
+    return rows, positions + 1, delta[rows, positions]
+
+
+def bootstrap(matrix, rows, positions, window=WINDOW, resamples=BOOTSTRAP, rng=None):
+    """One-sided probability that each candidate step is 0 or of the opposite sign"""
+    rng = rng or numpy.random.default_rng(0)
+    if not len(rows):
+        return numpy.zeros(0)
+    lo = numpy.maximum(positions - window, 0)
+    hi = numpy.minimum(positions + window, matrix.lengths[rows])
+
+    def draw(start, stop):
+        # versions with replacement, then one sample of each, or their perturbed median
+        size = (stop - start)[:, None, None]
+        picks = start[:, None, None] + (rng.random((len(rows), resamples, window)) * size).astype(int)
+        counts = matrix.counts[rows[:, None, None], picks]
+        which = (rng.random(picks.shape) * counts).astype(int)
+        drawn = matrix.samples[rows[:, None, None], picks, which] + \
+            matrix.noise[rows[:, None, None], picks] * rng.standard_normal(picks.shape)
+        # windows shorter than window versions use their first draws only
+        used = numpy.arange(window)[None, None, :] < size
+        return numpy.where(used, drawn, 0.0).sum(axis=2) / size[:, :, 0]
+
+    delta = draw(positions, hi) - draw(lo, positions)
+    observed = numpy.sign(numpy.mean(delta, axis=1))
+    return numpy.mean(delta * observed[:, None] <= 0, axis=1)
+
+
+def detect(series, window=WINDOW, resamples=BOOTSTRAP, alpha=ALPHA, seed=0):
+    """Significant steps of a list of results.Series, largest relative change first"""
+    matrix = Matrix(series)
+    rows, positions, delta = candidates(matrix, window)
+    p = bootstrap(matrix, rows, positions, window, resamples, numpy.random.default_rng(seed))
+    # a candidate is the largest of the steps scanned in its series, about one per window
+    # of its positions: correct its probability for that many tests (Bonferroni)
+    scanned = numpy.maximum((matrix.lengths[rows] - 2 * MIN_POINTS + 1) / window, 1.0)
+    p = numpy.minimum(p * scanned, 1.0)
+    steps = []
+    for row, position, d, p_value in zip(rows, positions, delta, p):
+        if p_value > alpha:
+            continue
+        s = matrix.series[row]
+        versions = matrix.versions[row]
+        values = numpy.exp(matrix.values[row, :matrix.lengths[row]])
+        steps.append(Step(s.benchmark, s.machine, s.python, list(s.params),
+                          str(versions[position - 1]), str(versions[position]),
+                          float(numpy.median(values[max(position - window, 0):position])),
+                          float(numpy.median(values[position:position + window])),
+                          float(math.expm1(d)), float(p_value)))
+    steps.sort(key=lambda step: -abs(math.log1p(step.change)))
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("--store", default=None, help="database file (default .casabench/results.sqlite)")
+    parser.add_argument("--benchmark", default="*", help="glob pattern of benchmark names")
+    parser.add_argument("--machine", default=None)
+    parser.add_argument("--since", default=None, help="only steps after this casatasks version, e.g. 6.6")
+    parser.add_argument("--top", type=int, default=50, help="steps listed")
+    parser.add_argument("--json", default=None, help="also write all steps to this file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the bootstrap")
+    args = parser.parse_args()
+
+    db = results.load(args.results_dir, args.store)
+    series = [s for name in db.benchmarks(args.benchmark)
+              for s in db.series(name, args.machine)]
+    steps = detect(series, seed=args.seed)
+    if args.since is not None:
+        since = store.version_key(args.since)
+        steps = [step for step in steps if store.version_key(step.after) >= since]
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump([step._asdict() for step in steps], fp, indent=1)
+    print("{} series, {} steps ({} regressions)".format(
+        len(series), len(steps), sum(step.change > 0 for step in steps)))
+    for step in steps[:args.top]:
+        print("{:+8.1%}  {} -> {}  {}{} on {} py{} (p={:.3f})".format(
+            step.change, step.before, step.after, step.benchmark,
+            step.params if step.params else "", step.machine, step.python, step.p))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Fold the harness overhead metrics into the asv results files
+
+While asv runs, the benchmark harness (benchmarks/harness/overhead.py) appends one record
+per setup/sample/teardown cycle to .casabench/metrics/<commit>-<environment>.jsonl.
+This tool averages those records per benchmark and parameter combination and stores
+them in the matching results file under a top-level "companion" key::
+
+    "companion": {
+        "columns": ["setup", "measured", "teardown", "bytes_copied", ..., "samples"],
+        "results": {"bench_importasdm.Alma_12m.time_importasdm": [[12.1, 3.4, 0.9, ...]]},
+        "workspace": {"bench_importasdm.Alma_12m.time_importasdm": ["disk"]},
+        "page_cache": {"bench_importasdm.Alma_12m.time_importasdm": ["cold"]}
+    }
+
+with one row per parameter combination, in the order of the benchmark's "params". Times
+are in seconds, byte counts in bytes, both per sample; read_bytes, write_bytes,
+syscalls, output_bytes, cpu_time and cores (CPU time over wall time) and the perf_event
+counters (None unless CASABENCH_PERF_COUNTERS=1) cover the measured call only. Samples
+profiled with cProfile or perf are not averaged (their timings are inflated), and a
+column is averaged over the samples that recorded it, None if none did. "workspace"
+tells where the samples wrote their working copies and outputs ("disk" or "memory", see
+benchmarks/harness/workspace.py), "disk+memory" if that changed during the run;
+"page_cache" whether their data was evicted from the page cache before the measured call
+("cold") or not ("warm", see benchmarks/harness/pagecache.py). asv drops unknown keys
+when it rewrites a results file, so run this after ``asv run`` (before normalizing the
+results for publishing); running it again simply recomputes the key. Profiles of the
+measured calls (CASABENCH_PROFILE) are stored in asv's own "profile" column instead,
+see casabench.profiles.
+
+    python -m casabench.companion [results_dir] [--harness-dir .casabench]
+"""
+import argparse
+import glob
+import json
+import os
+
+from . import profiles
+
+COLUMNS = ["setup", "measured", "teardown", "bytes_copied", "bytes_cloned", "bytes_linked",
+           "bytes_fetched", "bytes_evicted", "read_bytes", "write_bytes", "syscalls", "output_bytes",
+           "cpu_time", "cores", "omp_num_threads", "instructions", "cycles", "cache_misses",
+           "branch_misses", "page_faults"]
+
+
+def load(path):
+    """benchmark name -> param index -> list of records, from a metrics file"""
+    records = {}
+    with open(path) as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a killed benchmark
+            index = record.get("param_index")
+            if index is None:
+                continue
+            records.setdefault(record["benchmark"], {}).setdefault(index, []).append(record)
+    return records
+
+
+def summarize(records):
+    """Per-sample means of the companion columns, one row per parameter combination
+
+    Samples measured under cProfile or perf are left out, and each column is averaged
+    over the samples that recorded it (None if none did).
+    """
+    results = {}
+    for name, by_index in records.items():
+        rows = [None] * (max(by_index) + 1)
+        for index, samples in by_index.items():
+            samples = [s for s in samples if not s.get("profiled") and not s.get("flamegraph")]
+            if not samples:
+                continue
+            row = [_mean([s.get(c) for s in samples]) for c in COLUMNS]
+            rows[index] = row + [len(samples)]
+        results[name] = rows
+    return results
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def placements(records, key="workspace", default="disk"):
+    """Workspace placements (or another key) of the samples, one entry per parameter combination"""
+    found = {}
+    for name, by_index in records.items():
+        rows = [None] * (max(by_index) + 1)
+        for index, samples in by_index.items():
+            rows[index] = "+".join(sorted(set(s.get(key) or default for s in samples)))
+        found[name] = rows
+    return found
+
+
+def fold(results_file, metrics_dir):
+    """Store the companion metrics and profiles of one results file, returns False if
+    there are none"""
+    with open(results_file) as fp:
+        results = json.load(fp)
+    run = profiles.run_name(results)
+    if run is None:
+        return False
+    metrics = os.path.join(metrics_dir, run + ".jsonl")
+    results_dir = os.path.dirname(os.path.dirname(os.path.abspath(results_file)))
+    stored = profiles.store(results, profiles.collect(os.path.join(results_dir, "profiles", run)))
+    if not os.path.exists(metrics) and not stored:
+        return False
+
+    if os.path.exists(metrics):
+        records = load(metrics)
+        results["companion"] = {
+            "columns": COLUMNS + ["samples"],
+            "results": summarize(records),
+            "workspace": placements(records),
+            "page_cache": placements(records, "page_cache", "warm"),
+        }
+    tmp = results_file + ".tmp"
+    with open(tmp, "w") as fp:
+        json.dump(results, fp)
+    os.replace(tmp, results_file)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("--harness-dir", default=os.environ.get("CASABENCH_HARNESS_DIR", ".casabench"))
+    args = parser.parse_args()
+
+    metrics_dir = os.path.join(args.harness_dir, "metrics")
+    for results_file in sorted(glob.glob(os.path.join(args.results_dir, "*", "*.json"))):
+        if os.path.basename(results_file) in ("machine.json", "benchmarks.json"):
+            continue
+        if fold(results_file, metrics_dir):
+            print("folded companion metrics and profiles into", results_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Flame graphs of the native stack samples of the measured calls
+
+With CASABENCH_FLAMEGRAPH set, the benchmark harness (benchmarks/harness/flamegraph.py)
+writes the folded stacks of every sample it records to
+results/flamegraphs/<commit>-<environment>/. This tool merges the samples of each
+benchmark of such a directory, i.e. of one CASA version, and writes
+<benchmark>.folded (for flamegraph.pl or speedscope) and a self-contained
+<benchmark>.svg flame graph:
+
+    python -m casabench.flamegraphs results/flamegraphs/<commit>-<environment> \\
+        [--benchmark 'bench_tclean_time.*'] [-o flamegraphs]
+"""
+import argparse
+import collections
+import fnmatch
+import glob
+import gzip
+import hashlib
+import html
+import os
+import re
+
+_SAMPLE = re.compile(r"^(?P<benchmark>.+?)(-\d+)?\.\d+-\d+\.folded\.gz$")
+
+WIDTH = 1200
+FRAME_HEIGHT = 16
+# frames narrower than this many pixels are left out
+MIN_WIDTH = 0.1
+
+
+def samples(flamegraphs_dir, pattern="*"):
+    """benchmark name -> Counter of folded stack -> samples, for each benchmark sample"""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(flamegraphs_dir, "*.folded.gz"))):
+        match = _SAMPLE.match(os.path.basename(path))
+        if match is None or not fnmatch.fnmatchcase(match.group("benchmark"), pattern):
+            continue
+        try:
+            with gzip.open(path, "rt") as fp:
+                stacks = parse(fp)
+        except (OSError, EOFError):
+            continue  # stacks cut short by a killed benchmark
+        found.setdefault(match.group("benchmark"), []).append(stacks)
+    return found
+
+
+def collect(flamegraphs_dir, pattern="*"):
+    """benchmark name -> Counter of folded stack -> samples, merged over the samples"""
+    found = {}
+    for name, stacks in samples(flamegraphs_dir, pattern).items():
+        found[name] = sum(stacks, collections.Counter())
+    return found
+
+
+def parse(lines):
+    """Counter of folded stack -> samples, from "frame;...;frame count" lines"""
+    stacks = collections.Counter()
+    for line in lines:
+        stack, _, count = line.rstrip("\n").rpartition(" ")
+        try:
+            stacks[stack] += int(count)
+        except ValueError:
+            continue
+    return stacks
+
+
+def svg(stacks, title, color=None):
+    """SVG flame graph of folded stacks, root at the bottom
+
+    color(frames) returns the fill of the frame at the end of a stack prefix (a tuple of
+    frames); by default a warm color derived from the frame name.
+    """
+    root = _tree(stacks)
+    total = root["value"] or 1
+    depth = _depth(root)
+    height = (depth + 2) * FRAME_HEIGHT
+    scale = WIDTH / total
+    color = color or _warm
+    rects = []
+
+    def draw(node, frames, x, level):
+        for name, child in node["children"].items():
+            width = child["value"] * scale
+            if width >= MIN_WIDTH:
+                path = frames + (name,)
+                y = height - (level + 2) * FRAME_HEIGHT
+                label = html.escape(name)
+                tip = "{} ({} samples, {:.2f}%)".format(label, child["value"], 100.0 * child["value"] / total)
+                text = html.escape(name[:int(width / 7)]) if width > 21 else ""
+                rects.append(
+                    '<g><title>{}</title><rect x="{:.1f}" y="{}" width="{:.1f}" height="{}" '
+                    'fill="{}" rx="2"/><text x="{:.1f}" y="{}">{}</text></g>'.format(
+                        tip, x, y, width, FRAME_HEIGHT - 1, color(path), x + 3,
+                        y + FRAME_HEIGHT - 4, text))
+                draw(child, path, x, level + 1)
+            x += width
+
+    draw(root, (), 0.0, 0)
+    return "\n".join([
+        '<?xml version="1.0" standalone="no"?>',
+        '<svg version="1.1" width="{}" height="{}" xmlns="http://www.w3.org/2000/svg" '
+        'font-family="Verdana" font-size="11">'.format(WIDTH, height),
+        '<text x="{}" y="{}" text-anchor="middle" font-size="14">{}</text>'.format(
+            WIDTH // 2, FRAME_HEIGHT, html.escape(title)),
+    ] + rects + ["</svg>", ""])
+
+
+def _tree(stacks):
+    root = {"value": 0, "children": collections.OrderedDict()}
+    for stack, count in sorted(stacks.items()):
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"value": 0, "children": collections.OrderedDict()})
+            node["value"] += count
+    return root
+
+
+def _depth(node):
+    return max((1 + _depth(child) for child in node["children"].values()), default=0)
+
+
+def _warm(frames):
+    shade = hashlib.md5(frames[-1].encode("utf-8")).digest()
+    return "rgb({},{},{})".format(205 + shade[0] % 50, 80 + shade[1] % 150, shade[2] % 55)
+
+
+def write(stacks, name, output_dir, title=None):
+    """Write <name>.folded and <name>.svg of folded stacks to output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, name + ".folded"), "w") as fp:
+        fp.writelines("{} {}\n".format(stack, count) for stack, count in sorted(stacks.items()))
+    with open(os.path.join(output_dir, name + ".svg"), "w") as fp:
+        fp.write(svg(stacks, title or name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("flamegraphs_dir", help="results/flamegraphs/<commit>-<environment>")
+    parser.add_argument("--benchmark", default="*", help="fnmatch pattern of benchmark names")
+    parser.add_argument("-o", "--output-dir", default="flamegraphs")
+    args = parser.parse_args()
+
+    run = os.path.basename(os.path.normpath(args.flamegraphs_dir))
+    for name, stacks in sorted(collect(args.flamegraphs_dir, args.benchmark).items()):
+        write(stacks, name, args.output_dir, "{} ({})".format(name, run))
+        print("wrote", os.path.join(args.output_dir, name + ".svg"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Normalize new asv results files for publishing
+
+asv treats every casatasks build as a separate entry of its dependency matrix. To have
+the published graphs show the results as contiguous tests of one package, the version
+is replaced by "trunk" in the "params" and "requirements" of each results file and in
+its "env_name", and the casatestutils dependency is dropped (see "Saving results" in
+the README):
+
+    "env_name": "virtualenv-py3.6-pip+casatasks-pip+casatasks6.5.0.1-pip+casatestutils6.5.0.1"
+    -> "env_name": "virtualenv-py3.6-pip+casatasks-trunk"
+
+The original name, which names the profiles and flamegraphs directories of the run, is
+kept as "asv_env_name".
+
+The file itself is renamed after the versions it was run with, minus the dropped
+dependencies (e.g. 3024d718-virtualenv-py3.6-pip+casatasks6.5.0.1.json), which is where
+the casatasks version survives normalization. Each file is read, checked against its
+"result_columns" and written in a single pass; files that do not validate are reported
+and left as they are, as are files whose normalized name is taken by a file with other
+results (if the results are the same, the file is a duplicate and removed). The content
+hashes of the normalized files are kept in .casabench/normalized.json, so later runs skip
+them without parsing, and a file that is already normalized is never rewritten.
+
+    python -m casabench.normalize [results_dir] [--harness-dir .casabench] \\
+        [--drop pip+casatestutils] [--dry-run]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+
+from . import profiles, store
+
+# dependencies removed from the results files, e.g. helpers of the benchmarks themselves
+DROPPED = ["pip+casatestutils"]
+TRUNK = "trunk"
+
+# columns every asv results file (version 2) has, see asv.results
+REQUIRED_COLUMNS = ["result", "params", "version"]
+# columns with one value per parameter combination
+PER_COMBINATION = ["result", "stats_ci_99_a", "stats_ci_99_b", "stats_q_25", "stats_q_75",
+                   "stats_number", "stats_repeat", "samples", "profile"]
+
+
+class InvalidResults(ValueError):
+    """A results file that does not match its result_columns"""
+
+
+class ConflictingResults(ValueError):
+    """A results file whose normalized name is taken by a file with other results"""
+
+
+def manifest_path(harness_dir):
+    return os.path.join(harness_dir, "normalized.json")
+
+
+def load_manifest(harness_dir):
+    """Content hashes of the results files already normalized"""
+    try:
+        with open(manifest_path(harness_dir)) as fp:
+            return set(json.load(fp))
+    except (OSError, ValueError):
+        return set()
+
+
+def save_manifest(harness_dir, hashes):
+    os.makedirs(harness_dir, exist_ok=True)
+    tmp = manifest_path(harness_dir) + ".tmp"
+    with open(tmp, "w") as fp:
+        json.dump(sorted(hashes), fp)
+    os.replace(tmp, manifest_path(harness_dir))
+
+
+def validate(results):
+    """Raise InvalidResults if results do not match their result_columns"""
+    for key in ("commit_hash", "env_name", "params", "requirements", "result_columns", "results"):
+        if key not in results:
+            raise InvalidResults("no {!r}".format(key))
+    if not isinstance(results["params"], dict) or not isinstance(results["requirements"], dict):
+        raise InvalidResults("params or requirements is not a dict")
+    columns = results["result_columns"]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise InvalidResults("result_columns lack {}".format(", ".join(missing)))
+    for name, row in results["results"].items():
+        if not isinstance(row, list) or len(row) > len(columns):
+            raise InvalidResults("{}: {} values for {} result_columns".format(
+                name, len(row) if isinstance(row, list) else row, len(columns)))
+        entry = dict(zip(columns, row))
+        params = entry["params"] or []  # None if the benchmark failed
+        if not isinstance(params, list) or not all(isinstance(p, list) for p in params):
+            raise InvalidResults("{}: params is not a list of lists".format(name))
+        if not isinstance(entry["version"], str):
+            raise InvalidResults("{}: no benchmark version".format(name))
+        combinations = len(list(itertools.product(*params))) if params else 1
+        for column in PER_COMBINATION:
+            values = entry.get(column)
+            if column == "result" and not isinstance(values, (list, type(None))):
+                raise InvalidResults("{}: result is not a list".format(name))  # None if it failed
+            if isinstance(values, list) and values and len(values) != combinations:
+                raise InvalidResults("{}: {} values of {} for {} parameter combinations".format(
+                    name, len(values), column, combinations))
+
+
+def normalize(results, dropped=DROPPED):
+    """Normalize results in place, returns the versions they were run with (dependency ->
+    version, without the dropped ones)"""
+    params = results["params"]
+    requirements = results["requirements"]
+    versions = {}
+    for name in sorted(set(requirements) | set(dep for dep in params if "+" in dep)):
+        version = next((v for v in (params.get(name), requirements.get(name)) if v and v != TRUNK), None)
+        if name in dropped:
+            params.pop(name, None)
+            requirements.pop(name, None)
+            continue
+        versions[name] = version
+        requirements[name] = TRUNK
+        if name in params:
+            params[name] = TRUNK
+    tool = results["env_name"].split("-py", 1)[0]
+    python = results.get("python") or params.get("python")
+    env_name = "-".join(["{}-py{}".format(tool, python)] +
+                        ["{}-{}".format(name, TRUNK) for name in sorted(requirements)])
+    if env_name != results["env_name"]:
+        # the profiles and flamegraphs of the run are named after the original
+        results.setdefault(profiles.ENV_NAME, results["env_name"])
+        results["env_name"] = env_name
+    return versions
+
+
+def filename(results, versions):
+    """Name of a normalized results file, which keeps the versions it was run with"""
+    tool = results["env_name"].split("-py", 1)[0]
+    python = results.get("python") or results["params"].get("python")
+    parts = ["{}-py{}".format(tool, python)]
+    parts.extend(name + version for name, version in sorted(versions.items()) if version)
+    return "{}-{}.json".format(results["commit_hash"][:8], "-".join(parts))
+
+
+def process(path, known, dropped=DROPPED, dry_run=False):
+    """Normalize one results file
+
+    Returns "skipped" (known hash), "unchanged" (already normalized), "duplicate" (the
+    normalized file exists with the same results, the file is removed) or "normalized",
+    the path of the normalized file and its content hash. Raises ConflictingResults if
+    the normalized file exists with other results; neither file is touched then.
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest in known:
+        return "skipped", path, digest
+    try:
+        results = json.loads(data.decode("utf-8"))
+    except ValueError as error:
+        raise InvalidResults("not JSON: {}".format(error))
+    if not isinstance(results, dict):
+        raise InvalidResults("not an asv results file")
+    validate(results)
+    before = json.dumps(results, sort_keys=True)
+    versions = normalize(results, dropped)
+    target = path
+    if any(versions.values()):
+        target = os.path.join(os.path.dirname(path), filename(results, versions))
+    if json.dumps(results, sort_keys=True) == before and target == path:
+        return "unchanged", path, digest
+    data = json.dumps(results).encode("utf-8")
+    if target != path and os.path.exists(target):
+        with open(target, "rb") as fp:
+            existing = fp.read()
+        try:
+            same = json.loads(existing.decode("utf-8")) == results
+        except ValueError:
+            same = False
+        if not same:
+            raise ConflictingResults("{} exists with other results".format(target))
+        if not dry_run:
+            os.remove(path)
+        return "duplicate", target, hashlib.sha256(existing).hexdigest()
+    if not dry_run:
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp, target)
+        if target != path:
+            os.remove(path)
+    return "normalized", target, hashlib.sha256(data).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("--harness-dir", default=os.environ.get("CASABENCH_HARNESS_DIR", ".casabench"))
+    parser.add_argument("--drop", action="append", default=None,
+                        help="dependency removed from the results files (default pip+casatestutils)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+
+    dropped = args.drop or DROPPED
+    known = load_manifest(args.harness_dir)
+    hashes = set()
+    counts = {"normalized": 0, "unchanged": 0, "duplicate": 0, "skipped": 0, "invalid": 0,
+              "conflicting": 0}
+    for path in store.results_files(args.results_dir):
+        try:
+            status, target, digest = process(path, known, dropped, args.dry_run)
+        except InvalidResults as error:
+            counts["invalid"] += 1
+            print("{}: {}".format(path, error))
+            continue
+        except ConflictingResults as error:
+            counts["conflicting"] += 1
+            print("{}: {}".format(path, error))
+            continue
+        counts[status] += 1
+        hashes.add(digest)
+        if status == "normalized":
+            print("normalized", target)
+        elif status == "duplicate":
+            print("removed {}, same results as {}".format(path, target))
+    if not args.dry_run:
+        save_manifest(args.harness_dir, hashes)
+    print("{normalized} results files normalized, {unchanged} already normalized, "
+          "{duplicate} duplicates removed, {skipped} skipped, {invalid} invalid, "
+          "{conflicting} conflicting".format(**counts))
+    if counts["invalid"] or counts["conflicting"]:
+        parser.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Differential profile of a benchmark between two results entries
+
+A red dot on the asv graph says that a benchmark got slower, not where. Given two
+results files of the same machine (e.g. casa-perf-test for casatasks 6.6.5.4 and
+6.7.0.8) and a benchmark, this tool compares the self time of every function in the
+profiles recorded for both (see casabench.profiles and casabench.flamegraphs):
+
+- Python functions, from the cProfile samples in results/profiles/<commit>-<environment>/
+  or, without those, from the merged profile in the "profile" column of the results file;
+- native (and, on Python 3.12+, Python) frames, from the perf stack samples in
+  results/flamegraphs/<commit>-<environment>/.
+
+Functions are matched by file and name (cProfile) or symbol (perf), so line numbers
+that moved between versions do not matter. A change counts when it is beyond noise:
+
+    several samples per version -- more than Z standard errors of the difference of means
+    a single sample per version -- perf: more than Z Poisson standard deviations
+                                   sqrt(a + b); cProfile: more than MIN_RELATIVE of the
+                                   base time
+
+and at least MIN_SHARE of the base total. The report lists the functions whose self
+time grew or shrank, largest change first; for perf stacks it also writes a
+differential flame graph, i.e. the flame graph of the new version with every frame
+colored by the change of its inclusive time: red grew, blue shrank.
+
+    python -m casabench.profdiff <base results file> <new results file> <benchmark> \\
+        [--top 30] [-o profdiff]
+"""
+import argparse
+import collections
+import json
+import math
+import os
+
+from . import flamegraphs, profiles
+
+# standard errors (or Poisson standard deviations) a change has to exceed
+Z = 3.0
+# smallest change of a function reported, as a fraction of the base total
+MIN_SHARE = 0.005
+# smallest relative change of a function reported with a single cProfile sample per version
+MIN_RELATIVE = 0.10
+
+Change = collections.namedtuple("Change", "function base new delta significant")
+
+
+class Run:
+    """The profiles of a benchmark recorded for one results entry"""
+
+    def __init__(self, results_file, benchmark):
+        with open(results_file) as fp:
+            results = json.load(fp)
+        self.results_file = results_file
+        self.machine = results.get("params", {}).get("machine") or \
+            os.path.basename(os.path.dirname(os.path.abspath(results_file)))
+        self.label = results.get("env_name", os.path.basename(results_file))
+        run = profiles.run_name(results) or "unknown"
+        results_dir = os.path.dirname(os.path.dirname(os.path.abspath(results_file)))
+
+        # function -> self seconds, one dict per sample
+        self.python = [python_self_times(stats) for stats in
+                       profiles.samples(os.path.join(results_dir, "profiles", run)).get(benchmark, [])]
+        if not self.python:
+            stats = profiles.load(results_file, benchmark)
+            self.python = [python_self_times(stats)] if stats is not None else []
+        # folded stacks, one Counter per sample
+        self.stacks = flamegraphs.samples(os.path.join(results_dir, "flamegraphs", run),
+                                          benchmark).get(benchmark, [])
+
+
+def python_self_times(stats):
+    """'file:function' -> self seconds of a pstats.Stats"""
+    times = collections.Counter()
+    for (filename, line, function), (cc, nc, tt, ct, callers) in stats.stats.items():
+        times["{}:{}".format(os.path.basename(filename), function)] += tt
+    return times
+
+
+def native_self_counts(stacks):
+    """innermost frame -> stack samples, of folded stacks"""
+    counts = collections.Counter()
+    for stack, count in stacks.items():
+        counts[stack.rsplit(";", 1)[-1]] += count
+    return counts
+
+
+def compare(base, new, counts=False):
+    """Changes of self time between two lists of per-sample function -> time dicts
+
+    counts tells that the times are sample counts of a sampling profiler, whose noise
+    is Poisson. Returns all functions, largest change first.
+    """
+    functions = set()
+    for sample in base + new:
+        functions.update(sample)
+    base_total = sum(_mean(base, f) for f in functions)
+    changes = []
+    for function in functions:
+        a, b = _mean(base, function), _mean(new, function)
+        delta = b - a
+        if len(base) > 1 and len(new) > 1:
+            noise = Z * math.sqrt(_variance(base, function) / len(base) +
+                                  _variance(new, function) / len(new))
+        elif counts:
+            noise = Z * math.sqrt(a + b)
+        else:
+            noise = MIN_RELATIVE * a
+        significant = abs(delta) > noise and abs(delta) >= MIN_SHARE * base_total
+        changes.append(Change(function, a, b, delta, significant))
+    changes.sort(key=lambda change: (-abs(change.delta), change.function))
+    return changes
+
+
+def report(benchmark, base, new, count=30):
+    """Markdown report of the significant changes between two Runs"""
+    lines = ["# {}".format(benchmark), "",
+             "base: {} ({})  ".format(base.label, base.machine),
+             "new: {} ({})".format(new.label, new.machine), ""]
+    sections = [("Python self time (cProfile), seconds per sample", base.python, new.python, False),
+                ("Native self time (perf), stack samples per sample",
+                 [native_self_counts(s) for s in base.stacks],
+                 [native_self_counts(s) for s in new.stacks], True)]
+    for title, a, b, counts in sections:
+        lines.extend(["## " + title, ""])
+        if not a or not b:
+            lines.extend(["No profiles in {}.".format("either run" if not a and not b else
+                                                     "the base run" if not a else "the new run"), ""])
+            continue
+        changes = [change for change in compare(a, b, counts) if change.significant]
+        lines.append("{} samples in base, {} in new; {} functions changed beyond noise.".format(
+            len(a), len(b), len(changes)))
+        lines.append("")
+        if changes:
+            lines.extend(["| function | base | new | change | |", "|---|---:|---:|---:|---:|"])
+            for change in changes[:count]:
+                relative = "{:+.0%}".format(change.delta / change.base) if change.base else "new"
+                lines.append("| `{}` | {:.4g} | {:.4g} | {:+.4g} | {} |".format(
+                    change.function, change.base, change.new, change.delta, relative))
+            lines.append("")
+    return "\n".join(lines)
+
+
+def differential_svg(benchmark, base, new):
+    """Flame graph of the new stacks colored by the change of inclusive time per frame"""
+    a = _inclusive(base.stacks)
+    b = _inclusive(new.stacks)
+    merged = sum(new.stacks, collections.Counter())
+    scale = max([abs(b[prefix] - a.get(prefix, 0)) for prefix in b] + [1])
+
+    def color(frames):
+        delta = b.get(frames, 0) - a.get(frames, 0)
+        shade = int(200 * (1 - abs(delta) / scale))
+        if delta > 0:
+            return "rgb(255,{0},{0})".format(shade + 55)
+        if delta < 0:
+            return "rgb({0},{0},255)".format(shade + 55)
+        return "rgb(235,235,235)"
+
+    title = "{}: {} vs {}".format(benchmark, new.label, base.label)
+    return flamegraphs.svg(merged, title, color)
+
+
+def _inclusive(samples):
+    """stack prefix (tuple of frames) -> mean stack samples per sample"""
+    totals = collections.Counter()
+    for stacks in samples:
+        for stack, count in stacks.items():
+            frames = tuple(stack.split(";"))
+            for depth in range(1, len(frames) + 1):
+                totals[frames[:depth]] += count
+    return {prefix: count / len(samples) for prefix, count in totals.items()} if samples else {}
+
+
+def _mean(samples, function):
+    return sum(sample.get(function, 0) for sample in samples) / len(samples) if samples else 0.0
+
+
+def _variance(samples, function):
+    mean = _mean(samples, function)
+    return sum((sample.get(function, 0) - mean) ** 2 for sample in samples) / (len(samples) - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base", help="results file of the base version")
+    parser.add_argument("new", help="results file of the new version")
+    parser.add_argument("benchmark")
+    parser.add_argument("--top", type=int, default=30, help="changes listed per profile")
+    parser.add_argument("-o", "--output-dir", default="profdiff")
+    args = parser.parse_args()
+
+    base = Run(args.base, args.benchmark)
+    new = Run(args.new, args.benchmark)
+    if base.machine != new.machine:
+        parser.error("{} and {} are from different machines ({}, {})".format(
+            args.base, args.new, base.machine, new.machine))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    text = report(args.benchmark, base, new, args.top)
+    with open(os.path.join(args.output_dir, args.benchmark + ".md"), "w") as fp:
+        fp.write(text)
+    print(text)
+    if base.stacks and new.stacks:
+        path = os.path.join(args.output_dir, args.benchmark + ".svg")
+        with open(path, "w") as fp:
+            fp.write(differential_svg(args.benchmark, base, new))
+        print("wrote", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+cProfile profiles of the measured calls, stored in asv's "profile" result column
+
+With CASABENCH_PROFILE set, the benchmark harness (benchmarks/harness/profiler.py)
+dumps the profile of every measured call it profiles to
+results/profiles/<commit>-<environment>/. ``python -m casabench.companion`` merges the
+samples of each benchmark (over all parameter combinations, as ``asv run --profile``
+does) into the "profile" column of the matching results file, compressed the way asv
+stores it, so ``asv profile`` can show them too. This tool renders the hot functions
+of a stored profile:
+
+    python -m casabench.profiles <results file> <benchmark> [-n 25] [--sort tottime]
+"""
+import argparse
+import base64
+import glob
+import gzip
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import tempfile
+import zlib
+
+_SAMPLE = re.compile(r"^(?P<benchmark>.+?)(-\d+)?\.\d+-\d+\.pstats\.gz$")
+
+# key under which casabench.normalize keeps the environment name asv ran a results file in
+ENV_NAME = "asv_env_name"
+
+
+class _Dump:
+    """Stand-in profiler handing already collected stats to pstats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def run_name(results):
+    """<commit>-<environment> of a results entry, which names its profiles, flamegraphs
+    and timeseries directories, or None if unknown
+
+    The environment is the one asv ran in (ASV_ENV_NAME), not the normalized "env_name".
+    """
+    commit = results.get("commit_hash")
+    env_name = results.get(ENV_NAME) or results.get("env_name")
+    if not commit or not env_name:
+        return None
+    return "{}-{}".format(commit[:8], env_name)
+
+
+def samples(profiles_dir):
+    """benchmark name -> pstats.Stats of each sample in a profiles directory"""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(profiles_dir, "*.pstats.gz"))):
+        match = _SAMPLE.match(os.path.basename(path))
+        if match is None:
+            continue
+        try:
+            with gzip.open(path, "rb") as fp:
+                stats = _loads(fp.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            continue  # a profile cut short by a killed benchmark
+        found.setdefault(match.group("benchmark"), []).append(stats)
+    return found
+
+
+def collect(profiles_dir):
+    """benchmark name -> pstats.Stats merged over the samples in a profiles directory"""
+    found = {}
+    for name, stats in samples(profiles_dir).items():
+        found[name] = stats[0]
+        for other in stats[1:]:
+            found[name].add(other)
+    return found
+
+
+def store(results, profiles):
+    """Put profiles (benchmark -> pstats.Stats) into the profile column of asv results"""
+    columns = results.get("result_columns", [])
+    if "profile" not in columns:
+        return 0
+    index = columns.index("profile")
+    stored = 0
+    for name, stats in profiles.items():
+        row = results.get("results", {}).get(name)
+        if row is None:
+            continue
+        row.extend([None] * (index + 1 - len(row)))
+        row[index] = base64.b64encode(zlib.compress(_dumps(stats))).decode("ascii")
+        stored += 1
+    return stored
+
+
+def load(results_file, benchmark):
+    """pstats.Stats of a benchmark stored in a results file, None if it has no profile"""
+    with open(results_file) as fp:
+        results = json.load(fp)
+    columns = results.get("result_columns", [])
+    row = results.get("results", {}).get(benchmark)
+    if row is None or "profile" not in columns or len(row) <= columns.index("profile"):
+        return None
+    data = row[columns.index("profile")]
+    if not data:
+        return None
+    return _loads(zlib.decompress(base64.b64decode(data)))
+
+
+def top(stats, count=25, sort="tottime"):
+    """The count hottest functions of stats as pstats prints them"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.strip_dirs().sort_stats(sort).print_stats(count)
+    return stream.getvalue()
+
+
+def _dumps(stats):
+    # pstats only dumps to files, in the format asv and pstats.Stats(path) read
+    fd, path = tempfile.mkstemp(suffix=".pstats")
+    os.close(fd)
+    try:
+        stats.dump_stats(path)
+        with open(path, "rb") as fp:
+            return fp.read()
+    finally:
+        os.remove(path)
+
+
+def _loads(data):
+    return pstats.Stats(_Dump(marshal.loads(data)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_file")
+    parser.add_argument("benchmark")
+    parser.add_argument("-n", "--count", type=int, default=25, help="number of functions shown")
+    parser.add_argument("--sort", default="tottime",
+                        help="pstats sort key, e.g. tottime (self time) or cumulative")
+    args = parser.parse_args()
+
+    stats = load(args.results_file, args.benchmark)
+    if stats is None:
+        parser.exit(1, "no profile of {} in {}\n".format(args.benchmark, args.results_file))
+    print(top(stats, args.count, args.sort), end="")
+
+
+if __name__ == "__main__":
+    main()
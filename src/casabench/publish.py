@@ -0,0 +1,180 @@
+"""
+Publish the graph data and regressions of the results database as plain JSON
+
+This does not replace ``asv publish``, which still generates the HTML site: asv's pages
+read their own graph and index files, not the layout written here. These files are for
+scripts that want the series and regressions of the database (reports, dashboards)
+without parsing asv's output or loading every results file. They are published from
+the results store (see casabench.store), by default to .casabench/published, outside of
+asv's html_dir, which ``asv publish`` deletes along with the fingerprints kept there:
+
+    <output_dir>/graphs/<machine>/<benchmark>.json -- one series per Python environment
+                                                     and parameter combination: versions,
+                                                     dates, commits, medians and 99% CI
+                                                     bounds
+    <output_dir>/index.json                        -- one entry per (benchmark, machine):
+                                                     unit, points, latest version and
+                                                     value of each series, regressions,
+                                                     fingerprint
+    <output_dir>/regressions.json                  -- the regressions of all series
+
+Regressions are found as asv finds them (asv.step_detect), on the medians ordered by
+casatasks version, and reported by the versions between which each step occurred. Only
+results of the current version of each benchmark are published (see
+casabench.results). The fingerprint of a series summarizes its rows in the store (count,
+runs, start times and results) and the current benchmark version, and only the series
+whose fingerprint changed are recomputed; the index and regressions.json are then
+rewritten from the stored entries. A results file holds a whole run of one machine, so a
+nightly run still recomputes every series of that machine; the series of other machines
+and of benchmarks that were not run (e.g. ``asv run --bench`` of a few suites) are
+skipped.
+
+    python -m casabench.publish [results_dir] [-o .casabench/published] [--store ...] [--force]
+"""
+import argparse
+import json
+import math
+import os
+
+from asv import step_detect
+
+from . import results, store
+
+# relative size of the steps reported as regressions, asv's default regressions_thresholds
+THRESHOLD = 0.05
+
+
+def fingerprints(conn):
+    """(benchmark, machine) -> fingerprint of the rows of each series in the store"""
+    query = ("SELECT benchmark, machine, COUNT(*), TOTAL(run_id), TOTAL(started_at), "
+             "TOTAL(result), MAX(benchmarks.version) FROM results "
+             "JOIN runs ON runs.id = results.run_id "
+             "LEFT JOIN benchmarks ON benchmarks.name = results.benchmark "
+             "GROUP BY benchmark, machine")
+    return {(benchmark, machine): "{}:{:.0f}:{:.0f}:{!r}:{}".format(
+                count, runs, started, total, version)
+            for benchmark, machine, count, runs, started, total, version in conn.execute(query)}
+
+
+def graph_path(output_dir, benchmark, machine):
+    return os.path.join(output_dir, "graphs", machine, benchmark + ".json")
+
+
+def regressions(series, threshold=THRESHOLD):
+    """Regressions of a Series: (version before, version after, value before, best value
+    after) of every upward step of its medians, or [] if there are none"""
+    if not (series.median == series.median).any():
+        return []
+    width = series.ci_99_b - series.ci_99_a
+    weights = [1.0 / w if w > 0 else None for w in width]
+    steps = step_detect.detect_steps(_values(series.median), weights)
+    latest, best, jumps = step_detect.detect_regressions(steps, threshold)
+    if latest is None:
+        return []
+    return [[str(series.versions[before]) if before is not None else None,
+             str(series.versions[after]) if after is not None else None, value, best_after]
+            for before, after, value, best_after in jumps]
+
+
+def build(db, benchmark, machine, threshold=THRESHOLD):
+    """Graph data and index entry of the series of one (benchmark, machine), one per
+    Python environment and parameter combination"""
+    found = db.series(benchmark, machine)
+    info = store.benchmark_info(db.conn, benchmark) or {}
+    graph = {"benchmark": benchmark, "machine": machine, "unit": info.get("unit"),
+             "param_names": info.get("param_names", []), "series": []}
+    entry = {"benchmark": benchmark, "machine": machine, "unit": info.get("unit"),
+             "points": 0, "latest": [], "regressions": []}
+    for series in found:
+        graph["series"].append({
+            "python": series.python,
+            "params": list(series.params),
+            "version": series.version,
+            "versions": series.versions.tolist(),
+            "dates": series.dates.astype("int64").tolist(),
+            "commits": series.commits.tolist(),
+            "median": _values(series.median),
+            "ci_99_a": _values(series.ci_99_a),
+            "ci_99_b": _values(series.ci_99_b),
+        })
+        entry["points"] += len(series)
+        entry["latest"].append([series.python, list(series.params), str(series.versions[-1]),
+                                _values(series.median[-1:])[0]])
+        for jump in regressions(series, threshold):
+            entry["regressions"].append([series.python, list(series.params)] + jump)
+    return graph, entry
+
+
+def publish(conn, output_dir, force=False, threshold=THRESHOLD):
+    """Recompute the series that changed since the last publish to output_dir
+
+    Returns the numbers of series recomputed and removed.
+    """
+    index_file = os.path.join(output_dir, "index.json")
+    try:
+        with open(index_file) as fp:
+            index = json.load(fp)
+    except (OSError, ValueError):
+        index = {}
+    current = fingerprints(conn)
+    db = results.Results(conn)
+
+    changed = 0
+    for (benchmark, machine), fingerprint in sorted(current.items()):
+        key = "{}/{}".format(machine, benchmark)
+        path = graph_path(output_dir, benchmark, machine)
+        if not force and index.get(key, {}).get("fingerprint") == fingerprint and os.path.exists(path):
+            continue
+        graph, entry = build(db, benchmark, machine, threshold)
+        entry["fingerprint"] = fingerprint
+        _write_json(path, graph)
+        index[key] = entry
+        changed += 1
+
+    keys = {"{}/{}".format(machine, benchmark) for benchmark, machine in current}
+    removed = [key for key in index if key not in keys]
+    for key in removed:
+        entry = index.pop(key)
+        path = graph_path(output_dir, entry["benchmark"], entry["machine"])
+        if os.path.exists(path):
+            os.remove(path)
+
+    if changed or removed or not os.path.exists(index_file):
+        _write_json(index_file, index)
+        _write_json(os.path.join(output_dir, "regressions.json"), {"regressions": [
+            [entry["benchmark"], entry["machine"]] + regression
+            for key, entry in sorted(index.items()) for regression in entry["regressions"]]})
+    return changed, len(removed)
+
+
+def _values(array):
+    # NaN is not JSON
+    return [None if math.isnan(value) else value for value in array.tolist()]
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fp:
+        json.dump(data, fp)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("-o", "--output-dir", default=os.path.join(".casabench", "published"))
+    parser.add_argument("--store", default=None, help="database file (default .casabench/results.sqlite)")
+    parser.add_argument("--force", action="store_true", help="recompute every series")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative size of the steps reported as regressions")
+    args = parser.parse_args()
+
+    conn = store.connect(args.store)
+    store.sync(conn, args.results_dir)
+    changed, removed = publish(conn, args.output_dir, args.force, args.threshold)
+    print("{} series recomputed, {} removed".format(changed, removed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+NumPy series of the results database
+
+    from casabench import results
+
+    db = results.load("results")
+    for series in db.series("bench_tclean_time.TcleanCube.time_cube_standard_hogbom", since="6.6"):
+        print(series.machine, series.python, series.params, series.versions[-1], series.median[-1])
+
+A Series holds the results of one version of a benchmark (by default its current one,
+as asv publish shows) on one machine, in one Python environment, for one parameter
+combination, one point per results file, ordered by casatasks version and date:
+
+    versions, dates, commits -- casatasks version, datetime64[ms] and commit of each point
+    median                   -- asv's result (the median of the samples of a timing
+                                benchmark; the value of a memory or track benchmark)
+    ci_99_a, ci_99_b         -- bounds of asv's 99% confidence interval of the median
+    q_25, q_75               -- quartiles of the samples
+    samples                  -- the raw samples, one row per point, padded with NaN
+
+Missing values are NaN. Results are read through the SQLite store of casabench.store,
+which load() brings up to date with the results directory (parsing only new or changed
+files); only the rows of the benchmarks asked for are then turned into arrays, and
+each series is built once.
+"""
+import collections
+import fnmatch
+
+import numpy
+
+from . import store
+
+
+class Series:
+    """Results of one benchmark on one machine and Python for one parameter combination"""
+
+    def __init__(self, benchmark, machine, python, params, unit, rows):
+        self.benchmark = benchmark
+        self.machine = machine
+        self.python = python
+        self.params = tuple(params)
+        self.version = rows[0].version if rows else None
+        self.unit = unit
+        self.versions = numpy.array([row.casatasks or "" for row in rows], dtype=str)
+        self.dates = numpy.array([row.date for row in rows], dtype="datetime64[ms]")
+        self.commits = numpy.array([row.commit_hash or "" for row in rows], dtype=str)
+        self.median = _floats(row.result for row in rows)
+        self.ci_99_a = _floats(row.ci_99_a for row in rows)
+        self.ci_99_b = _floats(row.ci_99_b for row in rows)
+        self.q_25 = _floats(row.q_25 for row in rows)
+        self.q_75 = _floats(row.q_75 for row in rows)
+        width = max([len(row.samples) for row in rows if row.samples is not None] + [0])
+        self.samples = numpy.full((len(rows), width), numpy.nan)
+        for i, row in enumerate(rows):
+            if row.samples is not None:
+                self.samples[i, :len(row.samples)] = row.samples
+
+    def __len__(self):
+        return len(self.median)
+
+    def __repr__(self):
+        return "<Series {} on {} py{}{} ({} points)>".format(
+            self.benchmark, self.machine, self.python, list(self.params) if self.params else "",
+            len(self))
+
+
+class Results:
+    """The results database, read lazily benchmark by benchmark"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._series = {}
+
+    def benchmarks(self, pattern="*"):
+        """Names of the benchmarks with results, matching a glob pattern"""
+        names = [name for name, in self.conn.execute("SELECT DISTINCT benchmark FROM results")]
+        return sorted(fnmatch.filter(names, pattern))
+
+    def machines(self):
+        return sorted(machine for machine, in self.conn.execute("SELECT DISTINCT machine FROM runs"))
+
+    def series(self, benchmark, machine=None, since=None, until=None, python=None, version=None):
+        """Series of a benchmark, one per machine, Python and parameter combination
+
+        since and until bound the casatasks version (inclusive), e.g. since="6.6".
+        Only the results of the current version of the benchmark are included, i.e. the
+        one in benchmarks.json (else the version of its latest result), unless another
+        version is asked for: results of older code are not comparable.
+        """
+        key = (benchmark, machine, since, until, python, version)
+        if key not in self._series:
+            info = store.benchmark_info(self.conn, benchmark) or {}
+            if version is None:
+                version = store.current_version(self.conn, benchmark)
+            grouped = collections.OrderedDict()
+            for row in store.select(self.conn, _escape(benchmark), machine, since, until, python,
+                                    version):
+                grouped.setdefault((row.machine, row.python, tuple(row.params)), []).append(row)
+            self._series[key] = [Series(benchmark, machine_, python_, params, info.get("unit"), rows)
+                                 for (machine_, python_, params), rows in grouped.items()]
+        return self._series[key]
+
+
+def load(results_dir="results", path=None):
+    """Results of a results directory, syncing the store at path (default .casabench/results.sqlite)"""
+    conn = store.connect(path)
+    store.sync(conn, results_dir)
+    return Results(conn)
+
+
+def _floats(values):
+    return numpy.array([numpy.nan if value is None else value for value in values], dtype=float)
+
+
+def _escape(name):
+    # select() takes a glob pattern
+    return "".join("[{}]".format(c) if c in "*?[" else c for c in name)
@@ -0,0 +1,248 @@
+"""
+Indexed SQLite copy of the asv results database
+
+The results directory holds one JSON file per machine and environment, several hundred
+of them, and every analysis (or ``asv publish``) parses all of them again. sync() loads
+them into an SQLite database, keyed by benchmark, machine, casatasks version, python
+and date, with one row per benchmark, parameter combination and results file; the
+samples are unpacked into float64 arrays. Files are tracked by size and modification
+time, so a sync only parses the files added or changed since the last one, and drops
+the rows of files that were removed.
+
+    runs       -- one row per results file: machine, commit, environment, casatasks
+                  version (from the file name, which keeps it after normalization),
+                  python, date
+    results    -- run, benchmark, parameter index and values, benchmark version, result,
+                  stats_ci_99_a/b, stats_q_25/75, stats_number, stats_repeat, samples
+    benchmarks -- type, unit and parameters of every benchmark (from benchmarks.json)
+
+select() answers queries such as all tclean memory results of casa-perf-test since 6.6
+from the indexes:
+
+    select(conn, "bench_tclean_memory.*", machine="casa-perf-test", since="6.6")
+
+The database lives in the harness directory (.casabench/results.sqlite) rather than in
+the results directory, which is tracked in git:
+
+    python -m casabench.store [results_dir] [--store .casabench/results.sqlite]
+"""
+import argparse
+import array
+import collections
+import glob
+import itertools
+import json
+import os
+import re
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE, machine TEXT, commit_hash TEXT,
+    env_name TEXT, casatasks TEXT, casatasks_key TEXT, python TEXT, date INTEGER);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER REFERENCES runs(id) ON DELETE CASCADE, benchmark TEXT,
+    param_index INTEGER, params TEXT, version TEXT, result REAL,
+    ci_99_a REAL, ci_99_b REAL, q_25 REAL, q_75 REAL, number INTEGER, repeat INTEGER,
+    samples BLOB, started_at INTEGER, duration REAL,
+    PRIMARY KEY (run_id, benchmark, param_index));
+CREATE TABLE IF NOT EXISTS benchmarks (
+    name TEXT PRIMARY KEY, type TEXT, unit TEXT, param_names TEXT, params TEXT, version TEXT);
+CREATE INDEX IF NOT EXISTS results_benchmark ON results (benchmark, run_id);
+CREATE INDEX IF NOT EXISTS runs_machine ON runs (machine, casatasks_key);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (date);
+"""
+
+# casatasks version in a results file name, e.g. ...-pip+casatasks6.5.1.1.json
+_CASATASKS = re.compile(r"casatasks-?(\d+(\.\d+)*)")
+
+Row = collections.namedtuple(
+    "Row", "benchmark machine casatasks python date commit_hash param_index params version "
+           "result ci_99_a ci_99_b q_25 q_75 number repeat samples")
+
+
+def default_path():
+    """.casabench/results.sqlite, in CASABENCH_HARNESS_DIR if set"""
+    return os.path.join(os.environ.get("CASABENCH_HARNESS_DIR") or ".casabench", "results.sqlite")
+
+
+def connect(path=None):
+    """Open (and create) the results store"""
+    path = path or default_path()
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def version_key(version):
+    """Sortable text of a version: '6.6.5.4' -> '00006.00006.00005.00004'"""
+    parts = re.findall(r"\d+", str(version))
+    return ".".join("{:05d}".format(int(part)) for part in parts)
+
+
+def results_files(results_dir):
+    """The asv results files of a results directory"""
+    return sorted(path for path in glob.glob(os.path.join(results_dir, "*", "*.json"))
+                  if os.path.basename(path) not in ("machine.json", "benchmarks.json"))
+
+
+def sync(conn, results_dir):
+    """Bring the store up to date with a results directory
+
+    Returns the numbers of results files added or changed, and removed.
+    """
+    results_dir = os.path.abspath(results_dir)
+    known = {path: (mtime_ns, size) for path, mtime_ns, size in
+             conn.execute("SELECT path, mtime_ns, size FROM files")}
+    present = set()
+    changed = 0
+    with conn:
+        benchmarks_file = os.path.join(results_dir, "benchmarks.json")
+        for path in results_files(results_dir) + [benchmarks_file]:
+            if not os.path.exists(path):
+                continue
+            st = os.stat(path)
+            present.add(path)
+            if known.get(path) == (st.st_mtime_ns, st.st_size):
+                continue
+            if path == benchmarks_file:
+                _ingest_benchmarks(conn, path)
+            else:
+                _ingest(conn, path)
+                changed += 1
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                         (path, st.st_mtime_ns, st.st_size))
+        removed = [path for path in known if path not in present]
+        for path in removed:
+            conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+            conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    return changed, len(removed)
+
+
+def select(conn, benchmark="*", machine=None, since=None, until=None, python=None,
+           version=None):
+    """Rows of the results of benchmarks matching a glob pattern, oldest version first
+
+    since and until bound the casatasks version (inclusive), e.g. since="6.6"; version
+    selects the results of one benchmark version (the hash asv derives from its code).
+    """
+    where = ["results.benchmark GLOB ?"]
+    args = [benchmark]
+    if machine is not None:
+        where.append("runs.machine = ?")
+        args.append(machine)
+    if since is not None:
+        where.append("runs.casatasks_key >= ?")
+        args.append(version_key(since))
+    if until is not None:
+        # 6.6 includes 6.6.x.y
+        where.append("runs.casatasks_key < ?")
+        args.append(version_key(until) + ".99999")
+    if python is not None:
+        where.append("runs.python = ?")
+        args.append(python)
+    if version is not None:
+        where.append("results.version = ?")
+        args.append(version)
+    query = (
+        "SELECT results.benchmark, runs.machine, runs.casatasks, runs.python, runs.date, "
+        "runs.commit_hash, param_index, params, version, result, ci_99_a, ci_99_b, q_25, q_75, "
+        "number, repeat, samples FROM results JOIN runs ON runs.id = results.run_id "
+        "WHERE {} ORDER BY results.benchmark, runs.machine, runs.casatasks_key, runs.date, "
+        "param_index".format(" AND ".join(where)))
+    rows = []
+    for row in conn.execute(query, args):
+        row = list(row)
+        row[7] = json.loads(row[7])
+        row[16] = array.array("d", row[16]) if row[16] is not None else None
+        rows.append(Row(*row))
+    return rows
+
+
+def current_version(conn, name):
+    """Version of a benchmark in benchmarks.json, else the one of its latest result"""
+    found = conn.execute("SELECT version FROM benchmarks WHERE name = ?", (name,)).fetchone()
+    if found is None or found[0] is None:
+        found = conn.execute(
+            "SELECT results.version FROM results JOIN runs ON runs.id = results.run_id "
+            "WHERE results.benchmark = ? ORDER BY runs.date DESC LIMIT 1", (name,)).fetchone()
+    return found[0] if found is not None else None
+
+
+def benchmark_info(conn, name):
+    """type, unit, param_names and params of a benchmark, None if unknown"""
+    found = conn.execute("SELECT type, unit, param_names, params, version FROM benchmarks "
+                         "WHERE name = ?", (name,)).fetchone()
+    if found is None:
+        return None
+    return {"type": found[0], "unit": found[1], "param_names": json.loads(found[2]),
+            "params": json.loads(found[3]), "version": found[4]}
+
+
+def _ingest(conn, path):
+    with open(path) as fp:
+        data = json.load(fp)
+    conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+    columns = data.get("result_columns")
+    if not columns:
+        return  # not an asv results file (or one from before asv 0.5)
+    params = data.get("params", {})
+    match = _CASATASKS.search(os.path.basename(path))
+    casatasks = match.group(1) if match else params.get("pip+casatasks")
+    run_id = conn.execute(
+        "INSERT INTO runs (path, machine, commit_hash, env_name, casatasks, casatasks_key, "
+        "python, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (path, params.get("machine") or os.path.basename(os.path.dirname(path)),
+         data.get("commit_hash"), data.get("env_name"), casatasks,
+         version_key(casatasks) if casatasks else None, data.get("python"), data.get("date"))
+    ).lastrowid
+    rows = []
+    for benchmark, values in data.get("results", {}).items():
+        entry = dict(itertools.zip_longest(columns, values[:len(columns)]))
+        combinations = list(itertools.product(*entry["params"])) if entry["params"] else [()]
+        for index, combination in enumerate(combinations):
+            def column(name):
+                value = entry.get(name)
+                return value[index] if isinstance(value, list) and index < len(value) else None
+
+            samples = column("samples")
+            rows.append((
+                run_id, benchmark, index, json.dumps(list(combination)), entry["version"],
+                column("result"),
+                column("stats_ci_99_a"), column("stats_ci_99_b"), column("stats_q_25"),
+                column("stats_q_75"), column("stats_number"), column("stats_repeat"),
+                array.array("d", [s if s is not None else float("nan") for s in samples]).tobytes()
+                if samples else None,
+                entry.get("started_at"), entry.get("duration")))
+    conn.executemany("INSERT OR REPLACE INTO results VALUES "
+                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def _ingest_benchmarks(conn, path):
+    with open(path) as fp:
+        data = json.load(fp)
+    conn.execute("DELETE FROM benchmarks")
+    conn.executemany("INSERT INTO benchmarks VALUES (?, ?, ?, ?, ?, ?)", [
+        (name, info.get("type"), info.get("unit"), json.dumps(info.get("param_names", [])),
+         json.dumps(info.get("params", [])), info.get("version"))
+        for name, info in data.items() if isinstance(info, dict)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results_dir", nargs="?", default="results")
+    parser.add_argument("--store", default=None, help="database file (default .casabench/results.sqlite)")
+    args = parser.parse_args()
+
+    conn = connect(args.store)
+    changed, removed = sync(conn, args.results_dir)
+    print("{} results files loaded, {} removed".format(changed, removed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+COLUMNS = ["result", "params", "version", "started_at", "duration", "stats_ci_99_a",
+           "stats_ci_99_b", "stats_q_25", "stats_q_75", "stats_number", "stats_repeat",
+           "samples", "profile"]
+
+
+class ResultsDir:
+    """Writes normalized asv results files, as they are kept in results/"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.benchmarks = {}
+        self.count = 0
+
+    def add(self, machine, casatasks, python, values, date=None, commit=None, ci=0.05):
+        """values: benchmark name -> (version, median) or (version, medians, params);
+        ci is the relative half width of the 99% confidence intervals"""
+        self.count += 1
+        commit = commit or "{:08x}".format(self.count) + "0" * 32
+        date = date if date is not None else 1600000000000 + self.count * 86400000
+        results = {}
+        for name, value in values.items():
+            version, median = value[0], value[1]
+            params = value[2] if len(value) > 2 else []
+            medians = median if isinstance(median, list) else [median]
+            results[name] = [
+                medians, params, version, date, 1.0,
+                [m * (1 - ci) if m is not None else None for m in medians],
+                [m * (1 + ci) if m is not None else None for m in medians],
+                [m * 0.98 if m is not None else None for m in medians],
+                [m * 1.02 if m is not None else None for m in medians],
+                [1] * len(medians), [5] * len(medians)]
+            self.benchmarks.setdefault(name, {"version": version, "unit": "seconds",
+                                              "type": "time", "param_names": [],
+                                              "params": params})
+        env = "virtualenv-py{}-pip+casatasks-trunk".format(python)
+        data = {
+            "commit_hash": commit, "env_name": env, "date": date,
+            "params": {"machine": machine, "python": python, "pip+casatasks": "trunk"},
+            "python": python, "requirements": {"pip+casatasks": "trunk"}, "env_vars": {},
+            "result_columns": COLUMNS, "results": results, "durations": {}, "version": 2,
+        }
+        os.makedirs(os.path.join(self.path, machine), exist_ok=True)
+        path = os.path.join(self.path, machine, "{}-virtualenv-py{}-pip+casatasks{}.json".format(
+            commit[:8], python, casatasks))
+        with open(path, "w") as fp:
+            json.dump(data, fp)
+        self.write_benchmarks()
+        return path
+
+    def write_benchmarks(self):
+        with open(os.path.join(self.path, "benchmarks.json"), "w") as fp:
+            json.dump(dict(self.benchmarks, version=2), fp)
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    return ResultsDir(tmp_path / "results")
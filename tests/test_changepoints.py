@@ -0,0 +1,82 @@
+import numpy
+
+from casabench import changepoints, results
+
+NAME = "bench_a.Suite.time_a"
+
+
+def series(results_dir, tmp_path, *runs):
+    for python, values in runs:
+        for i, value in enumerate(values):
+            results_dir.add("casa-perf-test", "6.6.{}.1".format(i), python, {NAME: ("v1", value)})
+    return results.load(results_dir.path, str(tmp_path / "db.sqlite")).series(NAME)
+
+
+def noisy(levels, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return [float(level * (1 + 0.01 * rng.standard_normal())) for level in levels]
+
+
+def test_detects_a_step(results_dir, tmp_path):
+    found = series(results_dir, tmp_path, ("3.8", noisy([1.0] * 10 + [1.5] * 10)))
+    step, = changepoints.detect(found)
+    assert (step.python, step.before, step.after) == ("3.8", "6.6.9.1", "6.6.10.1")
+    assert abs(step.change - 0.5) < 0.05
+    assert step.p <= changepoints.ALPHA
+
+
+def test_no_step_in_noise(results_dir, tmp_path):
+    found = series(results_dir, tmp_path, ("3.8", noisy([1.0] * 20)))
+    assert changepoints.detect(found) == []
+
+
+def test_no_step_within_the_measurement_noise(results_dir, tmp_path):
+    # 8% noise between versions, which their 99% confidence intervals account for: the
+    # medians alone would show steps of over 10%
+    rng = numpy.random.default_rng(0)
+    for i in range(30):
+        value = float(numpy.exp(0.08 * rng.standard_normal()))
+        results_dir.add("casa-perf-test", "6.6.{}.1".format(i), "3.8", {NAME: ("v1", value)}, ci=0.2)
+    found = results.load(results_dir.path, str(tmp_path / "db.sqlite")).series(NAME)
+    rows, positions, delta = changepoints.candidates(changepoints.Matrix(found))
+    assert len(rows) and abs(delta).max() > numpy.log(1.1)
+    assert changepoints.detect(found) == []
+
+
+def test_noise_from_confidence_intervals_or_quartiles(results_dir, tmp_path):
+    found, = series(results_dir, tmp_path, ("3.8", [1.0, 2.0, 4.0]))
+    found.ci_99_a[1] = 0.0
+    found.ci_99_a[2] = found.q_25[2] = numpy.nan
+    sigma = changepoints.noise(found)
+    assert numpy.allclose(sigma[0], numpy.log(1.05 / 0.95) / (2 * changepoints.Z_99))
+    assert numpy.allclose(sigma[1], numpy.log(1.02 / 0.98) / changepoints.IQR_SIGMAS)
+    assert numpy.allclose(sigma[2], numpy.median(sigma[:2]))
+
+
+def test_small_steps_are_ignored(results_dir, tmp_path):
+    found = series(results_dir, tmp_path, ("3.8", noisy([1.0] * 10 + [1.02] * 10)))
+    assert changepoints.detect(found) == []
+
+
+def test_pythons_are_separate_series(results_dir, tmp_path):
+    # interleaved, one environment twice as slow would look like steps everywhere
+    found = series(results_dir, tmp_path, ("3.8", noisy([1.0] * 12, 1)),
+                   ("3.10", noisy([2.0] * 6 + [1.0] * 6, 2)))
+    step, = changepoints.detect(found)
+    assert step.python == "3.10"
+    assert step.change < 0
+
+
+def test_short_series_are_skipped(results_dir, tmp_path):
+    found = series(results_dir, tmp_path, ("3.8", [1.0, 1.0, 2.0, 2.0]))
+    assert changepoints.Matrix(found).values.shape == (0, 0)
+    assert changepoints.detect(found) == []
+
+
+def test_peak_is_the_largest_score_within_the_window():
+    matrix = changepoints.Matrix([])
+    matrix.values = numpy.log([[1.0] * 8 + [1.3] + [2.0] * 8])
+    matrix.lengths = numpy.array([17])
+    rows, positions, delta = changepoints.candidates(matrix, window=4)
+    assert rows.tolist() == [0]
+    assert positions.tolist() in ([8], [9])
@@ -0,0 +1,41 @@
+import json
+
+from casabench import companion
+
+
+def record(index=0, **values):
+    return dict({"benchmark": "bench_a.Suite.time_a", "param_index": index}, **values)
+
+
+def column(rows, index, name):
+    return rows[index][companion.COLUMNS.index(name)]
+
+
+def test_summarize_leaves_out_profiled_samples():
+    records = {"bench_a.Suite.time_a": {0: [
+        record(measured=1.0), record(measured=3.0),
+        record(measured=9.0, profiled=True), record(measured=7.0, flamegraph=True)]}}
+    rows = companion.summarize(records)["bench_a.Suite.time_a"]
+    assert column(rows, 0, "measured") == 2.0
+    assert rows[0][-1] == 2
+
+
+def test_summarize_averages_recorded_values_only():
+    records = {"bench_a.Suite.time_a": {
+        0: [record(measured=1.0, instructions=100), record(measured=2.0, instructions=None)],
+        2: [record(2, measured=4.0)]}}
+    rows = companion.summarize(records)["bench_a.Suite.time_a"]
+    assert column(rows, 0, "instructions") == 100
+    assert column(rows, 2, "instructions") is None
+    assert rows[1] is None
+
+
+def test_summarize_all_profiled():
+    records = {"bench_a.Suite.time_a": {0: [record(measured=9.0, profiled=True)]}}
+    assert companion.summarize(records) == {"bench_a.Suite.time_a": [None]}
+
+
+def test_load_skips_cut_lines(tmp_path):
+    path = tmp_path / "run.jsonl"
+    path.write_text(json.dumps(record(measured=1.0)) + "\n" + '{"benchmark": "bench_a.Su')
+    assert companion.load(str(path)) == {"bench_a.Suite.time_a": {0: [record(measured=1.0)]}}
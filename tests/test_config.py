@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.harness import config
+
+
+@pytest.fixture
+def conf_dir(tmp_path, monkeypatch):
+    (tmp_path / "asv.conf.json").write_text('{\n  // published\n  "results_dir": "results"\n}\n')
+    monkeypatch.setenv("ASV_CONF_DIR", str(tmp_path))
+    for name in ("CASABENCH_PROFILE", "CASABENCH_FLAMEGRAPH", "CASABENCH_RESULTS_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    return tmp_path
+
+
+def test_published_results_dir(conf_dir):
+    assert config.published_results_dir() == str(conf_dir / "results")
+
+
+@pytest.mark.parametrize("mode", ["CASABENCH_PROFILE", "CASABENCH_FLAMEGRAPH"])
+def test_profiling_needs_a_separate_results_dir(conf_dir, monkeypatch, mode):
+    config.check_profiling()
+    monkeypatch.setenv(mode, "1")
+    with pytest.raises(ValueError):
+        config.check_profiling()
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(conf_dir / "results"))
+    with pytest.raises(ValueError):
+        config.check_profiling()
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(conf_dir / "results-profile"))
+    config.check_profiling()
+
+
+def fake_asv(tmp_path, monkeypatch, conf_dir, *args):
+    """A /proc in which the parent of this process was started by asv with args"""
+    proc = tmp_path / "proc"
+    for pid, ppid, argv in ((100, 50, ["python", "-m", "asv_runner", "run_server"]),
+                            (50, 1, ["/usr/bin/python3", "/usr/local/bin/asv"] + list(args))):
+        (proc / str(pid)).mkdir(parents=True)
+        (proc / str(pid) / "cmdline").write_bytes("\0".join(argv).encode() + b"\0")
+        (proc / str(pid) / "status").write_text("Name:\tpython\nPPid:\t{}\n".format(ppid))
+        (proc / str(pid) / "cwd").symlink_to(conf_dir)
+    monkeypatch.setattr(config, "_PROC", str(proc))
+    monkeypatch.setattr(config.os, "getppid", lambda: 100)
+
+
+def test_results_dir_of_the_asv_command(conf_dir, monkeypatch):
+    (conf_dir / "asv.profile.conf.json").write_text('{"results_dir": "results-profile"}')
+    assert config.asv_results_dir() is None
+    fake_asv(conf_dir, monkeypatch, conf_dir, "run", "--config", "asv.profile.conf.json", "HEAD^!")
+    assert config.asv_results_dir() == str(conf_dir / "results-profile")
+    assert config.results_dir() == str(conf_dir / "results-profile")
+    fake_asv(conf_dir / "other", monkeypatch, conf_dir, "run", "--config=asv.profile.conf.json")
+    assert config.asv_results_dir() == str(conf_dir / "results-profile")
+
+
+def test_profiling_checks_the_results_dir_asv_writes_to(conf_dir, monkeypatch):
+    (conf_dir / "asv.profile.conf.json").write_text('{"results_dir": "results-profile"}')
+    monkeypatch.setenv("CASABENCH_PROFILE", "1")
+    # the variable names a separate directory, but asv runs with the published config
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(conf_dir / "results-profile"))
+    fake_asv(conf_dir, monkeypatch, conf_dir, "run", "HEAD^!")
+    with pytest.raises(ValueError):
+        config.check_profiling()
+
+    monkeypatch.delenv("CASABENCH_RESULTS_DIR")
+    fake_asv(conf_dir / "profile", monkeypatch, conf_dir, "run", "--config", "asv.profile.conf.json")
+    config.check_profiling()
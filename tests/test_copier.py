@@ -0,0 +1,157 @@
+import errno
+import os
+import stat
+import threading
+
+import pytest
+
+from benchmarks.harness import copier, staging
+
+
+def make_file(path, size, mode=0o640):
+    data = os.urandom(size)
+    with open(path, "wb") as fp:
+        fp.write(data)
+    os.chmod(path, mode)
+    return data
+
+
+def read(path):
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+def failing(errnum, calls):
+    def syscall(*args):
+        calls.append(errnum)
+        raise OSError(errnum, os.strerror(errnum))
+    return syscall
+
+
+@pytest.fixture
+def large(tmp_path):
+    src = str(tmp_path / "table.f0")
+    return src, make_file(src, copier.LARGE_FILE + 12345)
+
+
+def test_large_file_keeps_content_and_metadata(tmp_path, large):
+    src, data = large
+    os.utime(src, ns=(1_000_000_000, 2_000_000_000))
+    dst = str(tmp_path / "copy.f0")
+    assert copier.copy_file(src, dst) == len(data)
+    assert read(dst) == data
+    st = os.stat(dst)
+    assert stat.S_IMODE(st.st_mode) == 0o640
+    assert st.st_mtime_ns == 2_000_000_000
+
+
+def test_small_file_keeps_content_and_mode(tmp_path):
+    src = str(tmp_path / "table.dat")
+    data = make_file(src, 100, 0o751)
+    dst = str(tmp_path / "copy.dat")
+    assert copier.copy_file(src, dst) == 100
+    assert read(dst) == data
+    assert stat.S_IMODE(os.stat(dst).st_mode) == 0o751
+
+
+def test_unsupported_copy_file_range_falls_back_to_sendfile(tmp_path, large, monkeypatch):
+    src, data = large
+    calls = []
+    sendfile = os.sendfile
+
+    def counting_sendfile(*args):
+        calls.append("sendfile")
+        return sendfile(*args)
+
+    monkeypatch.setattr(os, "copy_file_range", failing(errno.EXDEV, calls), raising=False)
+    monkeypatch.setattr(os, "sendfile", counting_sendfile)
+    dst = str(tmp_path / "copy.f0")
+    copier.copy_file(src, dst)
+    assert calls[0] == errno.EXDEV and "sendfile" in calls
+    assert read(dst) == data
+
+
+def test_short_copy_restarts_with_the_next_method(tmp_path, large, monkeypatch):
+    src, data = large
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        pytest.skip("no copy_file_range")
+
+    # copies part of the file, then stops as if the source had shrunk
+    def short(fd_in, fd_out, count):
+        if os.lseek(fd_out, 0, os.SEEK_CUR) > 0:
+            return 0
+        return copy_file_range(fd_in, fd_out, 4096)
+
+    monkeypatch.setattr(os, "copy_file_range", short)
+    dst = str(tmp_path / "copy.f0")
+    copier.copy_file(src, dst)
+    assert read(dst) == data
+
+
+def test_read_write_loop_is_the_last_resort(tmp_path, large, monkeypatch):
+    src, data = large
+    calls = []
+    monkeypatch.setattr(os, "copy_file_range", failing(errno.ENOSYS, calls), raising=False)
+    monkeypatch.setattr(os, "sendfile", failing(errno.EINVAL, calls))
+    dst = str(tmp_path / "copy.f0")
+    copier.copy_file(src, dst)
+    assert calls == [errno.ENOSYS, errno.EINVAL]
+    assert read(dst) == data
+
+
+def test_other_errors_are_raised(tmp_path, large, monkeypatch):
+    src, data = large
+    monkeypatch.setattr(os, "copy_file_range", failing(errno.EIO, []), raising=False)
+    with pytest.raises(OSError) as info:
+        copier.copy_file(src, str(tmp_path / "copy.f0"))
+    assert info.value.errno == errno.EIO
+
+
+def test_copy_many_runs_on_a_pool_in_order():
+    names = set()
+
+    def square(item):
+        names.add(threading.current_thread().name)
+        return item * item
+
+    assert copier.copy_many(square, range(50), threads=4) == [item * item for item in range(50)]
+    assert all(name.startswith("stage") for name in names)
+    assert copier.copy_many(square, [3], threads=4) == [9]
+
+
+def test_copy_many_reraises_after_all_calls(tmp_path):
+    done = []
+
+    def copy(item):
+        if item == 3:
+            raise OSError(errno.EIO, "bad disk")
+        done.append(item)
+
+    with pytest.raises(OSError):
+        copier.copy_many(copy, range(10), threads=4)
+    assert sorted(done) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+
+
+def test_tree_copy_keeps_contents_and_modes(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_PREFETCH", "0")
+    monkeypatch.setenv("CASABENCH_STAGING", "copy")
+    monkeypatch.setenv("CASABENCH_COPY_THREADS", "4")
+    monkeypatch.delenv("CASABENCH_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "casatestdata" / "a.ms"
+    files = {}
+    for rel, size, mode in (("table.dat", 300, 0o644), ("table.f0", copier.LARGE_FILE + 1, 0o600),
+                            ("ANTENNA/table.dat", 200, 0o444), ("ANTENNA/table.f0", 5000, 0o755),
+                            ("SYSCAL/sub/table.f1", copier.LARGE_FILE * 2, 0o640)):
+        os.makedirs(os.path.dirname(str(source / rel)), exist_ok=True)
+        files[rel] = (make_file(str(source / rel), size, mode), mode)
+
+    staged = staging.stage(str(source), "work.ms")
+    assert staged.bytes_copied == sum(len(data) for data, mode in files.values())
+    for rel, (data, mode) in files.items():
+        path = os.path.join("work.ms", rel)
+        assert read(path) == data
+        assert stat.S_IMODE(os.stat(path).st_mode) == mode
+    staging.unstage("work.ms")
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from benchmarks.harness import datacache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    root = tmp_path / "cache"
+    monkeypatch.setenv("CASABENCH_CACHE_DIR", str(root))
+    monkeypatch.setenv("CASABENCH_PREFETCH", "0")
+    monkeypatch.setattr(datacache, "_referenced", set())
+    return root
+
+
+def make_table(path, content=b"rows"):
+    os.makedirs(path)
+    with open(os.path.join(path, "table.dat"), "wb") as fp:
+        fp.write(content)
+    with open(os.path.join(path, "table.f0"), "wb") as fp:
+        fp.write(content * 100)
+    return str(path)
+
+
+def test_fetch_copies_once(cache, tmp_path):
+    source = make_table(tmp_path / "data" / "a.ms")
+    first = datacache.fetch(source)
+    assert first.startswith(str(cache))
+    assert datacache.counters["bytes_fetched"] > 0
+    fetched = datacache.counters["bytes_fetched"]
+    assert datacache.fetch(source) == first
+    assert datacache.counters["bytes_fetched"] == fetched
+
+
+def test_duplicate_sources_share_an_entry(cache, tmp_path):
+    # the same dataset shipped in two test directories, copied at different times
+    a = make_table(tmp_path / "applycal" / "gaincaltest2.ms")
+    b = make_table(tmp_path / "gaincal" / "gaincaltest2.ms")
+    os.utime(os.path.join(b, "table.dat"), (1, 1))
+    first = datacache.fetch(a)
+    assert datacache.fetch(b) == first
+    fetched = datacache.counters["bytes_fetched"]
+
+    # both stay cached, neither is refetched
+    assert datacache.fetch(a) == first
+    assert datacache.fetch(b) == first
+    assert datacache.counters["bytes_fetched"] == fetched
+    assert os.path.exists(first)
+
+
+def test_source_update_refetches(cache, tmp_path):
+    source = make_table(tmp_path / "data" / "a.ms")
+    first = datacache.fetch(source)
+    with open(os.path.join(source, "table.dat"), "wb") as fp:
+        fp.write(b"other rows")
+    second = datacache.fetch(source)
+    assert second != first
+    with open(os.path.join(second, "table.dat"), "rb") as fp:
+        assert fp.read() == b"other rows"
+
+
+def test_eviction_spares_entries_in_use(cache, tmp_path, monkeypatch):
+    # room for one of the two tables only
+    monkeypatch.setenv("CASABENCH_CACHE_BYTES", "500")
+    a = datacache.fetch(make_table(tmp_path / "data" / "a.ms", b"aaaa"))
+    b = datacache.fetch(make_table(tmp_path / "data" / "b.ms", b"bbbb"))
+    # a working copy of a may still link to its entry
+    assert os.path.exists(a) and os.path.exists(b)
+
+    # entries that only other processes used are evicted
+    monkeypatch.setattr(datacache, "_referenced", set())
+    c = datacache.fetch(make_table(tmp_path / "data" / "c.ms", b"cccc"))
+    assert not os.path.exists(a) and not os.path.exists(b)
+    assert os.path.exists(c)
+
+
+def test_disabled_cache_returns_source(tmp_path, monkeypatch):
+    monkeypatch.delenv("CASABENCH_CACHE_DIR", raising=False)
+    source = make_table(tmp_path / "a.ms")
+    assert datacache.fetch(source) == source
+
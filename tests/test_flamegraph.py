@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from benchmarks.harness import flamegraph
+
+PERF_SCRIPT = """\
+python3 4242/4242  1000.000001:   10101010 cpu-clock:u:
+\t    7f00000010a0 casacore::Array<float>::operator()+0x20 (/opt/casa/lib/libcasa_casa.so.7)
+\t    7f0000002000 casa::refim::GridFT::put+0x1f4 (/opt/casa/lib/libsynthesis.so)
+\t    7f0000003000 py::tclean:/opt/casa/lib/python3/casatasks/tclean.py+0x5 (/tmp/perf-4242.map)
+\t    55000000a000 _PyEval_EvalFrameDefault+0x4c1 (/usr/bin/python3.12)
+
+python3 4242/4250  1000.010001:   10101010 cpu-clock:u:
+\t    7f00000010a0 casacore::Array<float>::operator()+0x20 (/opt/casa/lib/libcasa_casa.so.7)
+\t    7f0000002000 casa::refim::GridFT::put+0x1f4 (/opt/casa/lib/libsynthesis.so)
+\t    7f0000003000 py::tclean:/opt/casa/lib/python3/casatasks/tclean.py+0x5 (/tmp/perf-4242.map)
+\t    55000000a000 _PyEval_EvalFrameDefault+0x4c1 (/usr/bin/python3.12)
+
+casa worker 4243  1000.020001:   10101010 cpu-clock:u:
+\t    7f00000040ff [unknown] (/usr/lib64/libgomp.so.1.0.0)
+\t    7f0000005000 std::map<int, int>::find(int const&);clone+0x3 (/opt/casa/lib/libcasa_ms.so.7)
+\t    ffffffff81000000 [unknown] ([unknown])
+"""
+
+
+def test_fold_merges_identical_stacks():
+    stacks = flamegraph.fold(PERF_SCRIPT.splitlines())
+    assert stacks == {
+        # outermost frame first, behind the command
+        "python3;_PyEval_EvalFrameDefault;py::tclean:/opt/casa/lib/python3/casatasks/tclean.py;"
+        "casa::refim::GridFT::put;casacore::Array<float>::operator()": 2,
+        # commands with spaces, unknown symbols named after their library, no separators
+        # inside a frame
+        "casa_worker;[unknown];std::map<int, int>::find(int const&):clone;[libgomp.so.1.0.0]": 1,
+    }
+
+
+def test_fold_skips_frames_without_a_header():
+    lines = ["\t    7f00000010a0 orphan+0x1 (/lib/libc.so.6)", "",
+             "perf 17 1.0: 1 cpu-clock:", "\t    7f00000010a0 main (/usr/bin/perf)", "", ""]
+    assert flamegraph.fold(lines) == {"perf;main": 1}
+
+
+@pytest.mark.parametrize("line, frame", [
+    ("\t    7f00000010a0 casa::Imager::clean+0x10 (/opt/casa/lib/libsynthesis.so)",
+     "casa::Imager::clean"),
+    ("\t    7f00000010a0 [unknown] (/opt/casa/lib/libcasa_tables.so.7)", "[libcasa_tables.so.7]"),
+    ("\t    7f00000010a0 [unknown] ([unknown])", "[unknown]"),
+    ("\t    7f00000010a0", "[unknown]"),
+    ("\t    7f00000010a0 memcpy", "memcpy"),
+])
+def test_frames(line, frame):
+    assert flamegraph._frame(line) == frame
+
+
+@pytest.mark.parametrize("setting, benchmark, sampled", [
+    ("", "bench_tclean_time.time_a", False),
+    ("1", "bench_tclean_time.time_a", True),
+    ("1", "bench_importasdm.time_a", False),
+    ("bench_importasdm.*,bench_flagdata.*", "bench_importasdm.time_a", True),
+])
+def test_enabled(monkeypatch, setting, benchmark, sampled):
+    monkeypatch.setenv("CASABENCH_FLAMEGRAPH", setting)
+    assert flamegraph.enabled(benchmark) == sampled
+
+
+def test_not_sampled_without_perf(monkeypatch):
+    monkeypatch.setenv("CASABENCH_FLAMEGRAPH", "1")
+    monkeypatch.setattr(flamegraph.shutil, "which", lambda name: None)
+    assert not flamegraph.start("bench_tclean_time.time_a")
+    flamegraph.stop("bench_tclean_time.time_a", 0)
+
+
+def test_folded_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(tmp_path))
+    monkeypatch.setenv("ASV_COMMIT", "0123456789abcdef")
+    monkeypatch.setenv("ASV_ENV_NAME", "virtualenv-py3.8")
+    assert flamegraph.folded_file("bench_a.time_a", 2, "4242-0") == os.path.join(
+        str(tmp_path), "flamegraphs", "01234567-virtualenv-py3.8",
+        "bench_a.time_a-2.4242-0.folded.gz")
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from benchmarks.harness import manifest, staging
+from benchmarks.harness.manifest import Dataset
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_PREFETCH", "0")
+    monkeypatch.delenv("CASABENCH_CACHE_DIR", raising=False)
+    monkeypatch.delenv("CASABENCH_STAGING", raising=False)
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    return tmp_path
+
+
+def make_ms(path, size=1000):
+    os.makedirs(path)
+    with open(os.path.join(path, "table.dat"), "wb") as fp:
+        fp.write(b"header")
+    with open(os.path.join(path, "table.f0"), "wb") as fp:
+        fp.write(b"\0" * size)
+    return str(path)
+
+
+def test_dataset_defaults():
+    dataset = Dataset("unittest/applycal/gaincaltest2.ms/")
+    assert dataset.dest == "gaincaltest2.ms"
+    assert dataset.writable
+    assert repr(Dataset("/data/a.txt", writable=False)) == "Dataset('/data/a.txt', 'a.txt', writable=False)"
+
+
+def test_stage_and_clean(env):
+    vis = make_ms(env / "data" / "gaincaltest2.ms")
+    callib = env / "data" / "refcallib.txt"
+    callib.write_text("caltable='x'")
+
+    class Suite:
+        datasets = (Dataset(vis, "applycalcopy.ms", attr="vis"),
+                    Dataset(str(callib), writable=False, attr="callibfile"))
+        outputs = ("testoucal.cal",)
+
+    os.makedirs("testoucal.cal")
+    suite = Suite()
+    manifest.stage(suite)
+    assert suite.vis == "applycalcopy.ms" and suite.callibfile == "refcallib.txt"
+    assert os.path.isfile(os.path.join("applycalcopy.ms", "table.f0"))
+    assert os.path.exists("refcallib.txt")
+    assert not os.path.exists("testoucal.cal")
+
+    os.makedirs("testoucal.cal")
+    manifest.clean(suite)
+    assert not os.path.exists("testoucal.cal")
+    staging.unstage("applycalcopy.ms")
+
+
+def test_stage_undeclared_dataset(env):
+    class Suite:
+        datasets = (Dataset("/data/a.ms"),)
+
+    with pytest.raises(KeyError):
+        manifest.stage(Suite(), "b.ms")
+
+
+def test_plan_counts_shared_datasets_once(env):
+    a = make_ms(env / "applycal" / "gaincaltest2.ms", 3000)
+    b = make_ms(env / "gaincal" / "gaincaltest2.ms", 3000)
+    c = make_ms(env / "tclean" / "refim_point.ms", 1000)
+    suites = {
+        "bench_applycal.A": (Dataset(a),),
+        "bench_gaincal.G": (Dataset(b, writable=False),),
+        "bench_tclean_time.T": (Dataset(c), Dataset(a)),
+        "bench_missing.M": (Dataset(str(env / "missing.ms")),),
+    }
+    entries = manifest.plan(suites)
+    assert [os.path.basename(e.path) for e in entries] == ["gaincaltest2.ms", "refim_point.ms"]
+    shared = entries[0]
+    assert shared.path == a and shared.aliases == [b]
+    assert shared.consumers == ["bench_applycal.A", "bench_gaincal.G", "bench_tclean_time.T"]
+    assert shared.writable
+
+    distinct, working = manifest.footprint(suites, entries)
+    assert distinct == shared.bytes + entries[1].bytes
+    assert working == shared.bytes + entries[1].bytes
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from benchmarks.harness import memprofile
+
+# the current layout names its columns, here in an order other than the legacy one
+HEADER_LAYOUT = """\
+# PID, FDs, MemRSS (VmRSS) MB, VmWHM MB, VirtMem (VmSize) MB, Time, Step
+4242, 12, 512, 520, 2048, 0.1, [Select data]
+4242, 14, 530, 540, 2100, 0.3, [define image]
+4242, 15, 700, 720, 2300, 1.2, [Make PSF]
+4242, 16, 910, 950, 2500, 2.0, [Start Major Cycle]
+4242, 40, 880, 950, 2500, 2.5, [End Major Cycle]
+4242, 18, 990, 1000, 2600, 3.0, [Start Minor Cycle]
+4242, 19, 600, 1000, 2600, 3.5, [Restoring]
+4242, 19, 605, 1000, 2600, 3.6, [Done]
+"""
+
+# older imagers wrote no header: rss and hwm in columns 1 and 2, fds in column 7
+LEGACY_LAYOUT = """\
+4242, 512, 520, 2048, 3, 4, 5, 12, [Select data]
+4242, 700, 720, 2300, 3, 4, 5, 15, [makePSF]
+4242, 910, 950, 2500, 3, 4, 5, 16, [runMajorCycle]
+4242, 905, 960, 2500, 3, 4, 5, 21, [runMajorCycle]
+truncated, line
+4242, 640.5, 960, 2600, 3, 4, 5, 17, [pbcor]
+"""
+
+
+def write(tmp_path, text, name="casa.synthesis.imager.memprofile.4242.host.20240501.txt"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_header_columns(tmp_path):
+    profile = memprofile.parse(write(tmp_path, HEADER_LAYOUT))
+    assert profile.rows[0] == ("Select data", {"rss": 512, "hwm": 520, "fds": 12})
+    assert profile.peak("fds") == 40
+    assert profile.peak("hwm") == 1000
+    assert list(profile.stages().items()) == [
+        ("selection", {"rss": 530, "hwm": 540, "fds": 14}),
+        ("psf", {"rss": 700, "hwm": 720, "fds": 15}),
+        ("major", {"rss": 910, "hwm": 950, "fds": 40}),
+        ("minor", {"rss": 990, "hwm": 1000, "fds": 18}),
+        ("restore", {"rss": 600, "hwm": 1000, "fds": 19}),
+        ("other", {"rss": 605, "hwm": 1000, "fds": 19}),
+    ]
+
+
+def test_legacy_columns(tmp_path):
+    profile = memprofile.parse(write(tmp_path, LEGACY_LAYOUT))
+    assert len(profile.rows) == 5
+    assert profile.steps()["runMajorCycle"] == {"rss": 910, "hwm": 960, "fds": 21}
+    assert profile.stages()["restore"] == {"rss": 640.5, "hwm": 960, "fds": 17}
+    assert list(profile.stages()) == ["selection", "psf", "major", "restore"]
+
+
+@pytest.mark.parametrize("step, stage", [
+    ("Select data", "selection"), ("setDataOnMS", "selection"), ("open MS", "selection"),
+    ("Define image", "selection"), ("calculate weights", "weighting"),
+    ("makePSF", "psf"), ("Start Major Cycle", "major"), ("gridding", "major"),
+    ("make residual", "major"), ("predictModel", "major"), ("Run Minor Cycle", "minor"),
+    ("deconvolve", "minor"), ("Restore", "restore"), ("pbcor", "restore"), ("Done", "other"),
+])
+def test_stages(step, stage):
+    assert memprofile.stage_of(step) == stage
+
+
+def test_locate(tmp_path):
+    path = write(tmp_path, HEADER_LAYOUT)
+    log = tmp_path / "casa.log"
+    log.write_text("2024-05-01 10:00:00\tINFO\ttclean::::casa\t##### Begin Task: tclean #####\n"
+                   "2024-05-01 10:00:01\tINFO\tSynthesisImager::\tWriting memory profile to "
+                   + path.replace(str(tmp_path) + os.sep, "") + "\n")
+    assert memprofile.locate(str(log)) == os.path.basename(path)
+    log.write_text("no profile\n")
+    assert memprofile.locate(str(log)) is None
+
+
+def test_enable(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path))
+    monkeypatch.setenv("CASARCFILES", "/etc/casa.rc")
+    memprofile.enable()
+    memprofile.enable()
+    rc_file = str(tmp_path / "memprofile.rc")
+    assert os.environ["CASARCFILES"] == "/etc/casa.rc:" + rc_file
+    with open(rc_file) as fp:
+        assert fp.read() == "synthesis.imager.memprofile.enable: 1\n"
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from casabench import normalize
+
+ENV = "virtualenv-py3.8-pip+casatasks-pip+casatasks6.6.1.1-pip+casatestutils6.6.1.1"
+NORMALIZED = "3024d718-virtualenv-py3.8-pip+casatasks6.6.1.1.json"
+
+
+def raw(result=1.0):
+    return {
+        "commit_hash": "3024d718" + "0" * 32, "env_name": ENV, "date": 1600000000000,
+        "params": {"machine": "casa-perf-test", "python": "3.8",
+                   "pip+casatasks": "6.6.1.1", "pip+casatestutils": "6.6.1.1"},
+        "python": "3.8",
+        "requirements": {"pip+casatasks": "6.6.1.1", "pip+casatestutils": "6.6.1.1"},
+        "result_columns": ["result", "params", "version", "stats_ci_99_a"],
+        "results": {"bench_a.Suite.time_a": [[result], [], "v1", [result * 0.9]],
+                    "bench_a.Suite.time_failed": [None, None, "v1"]},
+        "version": 2,
+    }
+
+
+def write(directory, data, name=None):
+    path = os.path.join(str(directory), name or "3024d718-{}.json".format(data["env_name"]))
+    with open(path, "w") as fp:
+        json.dump(data, fp)
+    return path
+
+
+def test_normalize_and_rename(tmp_path):
+    path = write(tmp_path, raw())
+    status, target, digest = normalize.process(path, set())
+    assert status == "normalized"
+    assert os.path.basename(target) == NORMALIZED
+    assert not os.path.exists(path)
+    with open(target) as fp:
+        results = json.load(fp)
+    assert results["env_name"] == "virtualenv-py3.8-pip+casatasks-trunk"
+    assert results["params"] == {"machine": "casa-perf-test", "python": "3.8", "pip+casatasks": "trunk"}
+    assert results["requirements"] == {"pip+casatasks": "trunk"}
+    assert results["asv_env_name"] == ENV
+    assert normalize.process(target, set())[0] == "unchanged"
+    assert normalize.process(target, {digest})[0] == "skipped"
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    path = write(tmp_path, raw())
+    assert normalize.process(path, set(), dry_run=True)[0] == "normalized"
+    assert os.listdir(str(tmp_path)) == [os.path.basename(path)]
+
+
+def test_duplicate_is_removed(tmp_path):
+    first = write(tmp_path, raw())
+    _, target, _ = normalize.process(first, set())
+    second = write(tmp_path, raw())
+    assert normalize.process(second, set())[:2] == ("duplicate", target)
+    assert os.listdir(str(tmp_path)) == [NORMALIZED]
+
+
+def test_conflict_keeps_both_files(tmp_path):
+    _, target, _ = normalize.process(write(tmp_path, raw(1.0)), set())
+    other = write(tmp_path, raw(2.0))
+    with pytest.raises(normalize.ConflictingResults):
+        normalize.process(other, set())
+    assert sorted(os.listdir(str(tmp_path))) == sorted([NORMALIZED, os.path.basename(other)])
+    with open(target) as fp:
+        assert json.load(fp)["results"]["bench_a.Suite.time_a"][0] == [1.0]
+
+
+@pytest.mark.parametrize("change", [
+    lambda r: r.pop("results"),
+    lambda r: r["result_columns"].remove("version"),
+    lambda r: r["results"]["bench_a.Suite.time_a"].__setitem__(0, [1.0, 2.0]),
+    lambda r: r["results"]["bench_a.Suite.time_a"].__setitem__(1, "x"),
+])
+def test_invalid_results_are_left_alone(tmp_path, change):
+    data = raw()
+    change(data)
+    path = write(tmp_path, data, "x.json")
+    with pytest.raises(normalize.InvalidResults):
+        normalize.process(path, set())
+    assert os.listdir(str(tmp_path)) == ["x.json"]
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+import pytest
+
+from benchmarks.harness import overhead, staging, workspace
+
+
+class Benchmark:
+    """Stand-in for asv's Benchmark: do_setup/do_teardown around the measured call"""
+
+    def __init__(self, name, source, setup=0.05, teardown=0.02, params=()):
+        self.name = name
+        self.source = source
+        self._params = params
+        self._current_params = ()
+        self.delays = (setup, teardown)
+
+    def do_setup(self):
+        staging.stage(self.source, "work.dat")
+        time.sleep(self.delays[0])
+
+    def do_teardown(self):
+        time.sleep(self.delays[1])
+        staging.unstage("work.dat")
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    for name in ("CASABENCH_CACHE_DIR", "CASABENCH_WORKSPACE_DIR", "CASABENCH_PROFILE",
+                 "CASABENCH_FLAMEGRAPH", "CASABENCH_PERF_COUNTERS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setenv("CASABENCH_STAGING", "copy")
+    monkeypatch.setenv("ASV_COMMIT", "0123456789abcdef")
+    monkeypatch.setenv("ASV_ENV_NAME", "virtualenv-py3.8")
+    monkeypatch.setattr(workspace, "_active", None)
+    monkeypatch.setattr(Benchmark, "do_setup", overhead._wrap_setup(Benchmark.do_setup))
+    monkeypatch.setattr(Benchmark, "do_teardown", overhead._wrap_teardown(Benchmark.do_teardown))
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "input.dat"
+    source.write_bytes(b"x" * 1000)
+    return str(source)
+
+
+def records():
+    with open(overhead.sidecar()) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def run(benchmark, measured=0.1):
+    benchmark.do_setup()
+    time.sleep(measured)
+    benchmark.do_teardown()
+
+
+def test_cycles_are_recorded(harness):
+    benchmark = Benchmark("bench_a.Suite.time_a", harness)
+    run(benchmark)
+    run(benchmark, measured=0.2)
+    assert os.path.basename(overhead.sidecar()) == "01234567-virtualenv-py3.8.jsonl"
+    first, second = records()
+    for record, measured in ((first, 0.1), (second, 0.2)):
+        assert record["benchmark"] == "bench_a.Suite.time_a"
+        assert record["param_index"] == 0
+        assert 0.05 <= record["setup"] < 0.05 + 0.1
+        assert measured <= record["measured"] < measured + 0.1
+        assert 0.02 <= record["teardown"] < 0.02 + 0.1
+        assert record["bytes_copied"] == 1000
+        assert record["workspace"] == workspace.DISK
+        assert not record["profiled"] and not record["flamegraph"]
+    assert second["started_at"] >= first["started_at"] + first["setup"] + first["measured"]
+
+
+def test_param_index_of_the_current_combination(harness):
+    benchmark = Benchmark("bench_a.Suite.time_b", harness, params=[[1, 2], ["x", "y"]])
+    benchmark._current_params = (2, "x")
+    run(benchmark, measured=0)
+    record, = records()
+    assert record["param_index"] == 2
+
+
+def test_failed_setup_is_recorded(harness):
+    benchmark = Benchmark("bench_a.Suite.time_c", harness + ".missing")
+    with pytest.raises(OSError):
+        benchmark.do_setup()
+    benchmark.do_teardown()
+    record, = records()
+    assert record["setup"] >= 0 and record["bytes_copied"] == 0
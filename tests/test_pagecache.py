@@ -0,0 +1,45 @@
+from benchmarks.harness import pagecache
+
+
+class FakeBenchmark:
+    def __init__(self, attr_sources, param_names=(), params=()):
+        self._attr_sources = attr_sources
+        self.param_names = list(param_names)
+        self._current_params = tuple(params)
+
+
+class Suite:
+    def time_task(self):
+        pass
+
+
+class Suite_cold(Suite):
+    page_cache = pagecache.COLD
+
+
+def test_default_is_warm(monkeypatch):
+    monkeypatch.delenv("CASABENCH_PAGE_CACHE", raising=False)
+    assert pagecache.state(FakeBenchmark([Suite.time_task, Suite])) == pagecache.WARM
+
+
+def test_environment_default(monkeypatch):
+    monkeypatch.setenv("CASABENCH_PAGE_CACHE", "cold")
+    assert pagecache.state(FakeBenchmark([Suite.time_task, Suite])) == pagecache.COLD
+
+
+def test_cold_subclass(monkeypatch):
+    monkeypatch.delenv("CASABENCH_PAGE_CACHE", raising=False)
+    assert pagecache.state(FakeBenchmark([Suite_cold.time_task, Suite_cold])) == pagecache.COLD
+
+
+def test_cache_parameter():
+    benchmark = FakeBenchmark([Suite.time_task, Suite], ["cache"], [pagecache.COLD])
+    assert pagecache.state(benchmark) == pagecache.COLD
+
+
+def test_evict_counts_bytes(tmp_path):
+    path = tmp_path / "a.ms"
+    path.mkdir()
+    (path / "table.f0").write_bytes(b"x" * 4096)
+    if pagecache.available():
+        assert pagecache.evict([str(path)]) == 4096
@@ -0,0 +1,109 @@
+import collections
+import os
+import platform
+import struct
+import threading
+
+import pytest
+
+from benchmarks.harness import perfcounters
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setenv("CASABENCH_PERF_COUNTERS", "1")
+    monkeypatch.setattr(perfcounters, "_open", None)
+    if platform.machine() not in perfcounters._SYSCALLS:
+        pytest.skip("no perf_event_open syscall number for " + platform.machine())
+
+
+def counter(value, enabled, running):
+    """A file descriptor that reads like a perf_event counter"""
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, struct.pack("QQQ", value, enabled, running))
+    os.close(write_fd)
+    return read_fd
+
+
+@pytest.fixture
+def harness_thread():
+    stopped = threading.Event()
+    thread = threading.Thread(target=stopped.wait, name="sampler", daemon=True)
+    thread.start()
+    yield thread
+    stopped.set()
+    thread.join()
+
+
+def test_counts_are_summed_and_scaled(monkeypatch):
+    unread = counter(0, 0, 0)
+    os.read(unread, 24)
+    monkeypatch.setattr(perfcounters, "_open", collections.OrderedDict([
+        # multiplexed: ran half of the time it was enabled
+        ("instructions", [counter(1000, 200, 100), counter(500, 100, 100)]),
+        # never scheduled on the PMU
+        ("cycles", [counter(0, 100, 0)]),
+        # nothing to read
+        ("cache_misses", [unread]),
+        # not offered
+        ("branch_misses", []),
+    ]))
+    fds = [fd for fds in perfcounters._open.values() for fd in fds]
+    assert perfcounters.stop() == {"instructions": 2500, "cycles": 0, "cache_misses": None,
+                                   "branch_misses": None}
+    assert perfcounters._open is None
+    for fd in fds:
+        with pytest.raises(OSError):
+            os.fstat(fd)
+
+
+def test_only_benchmark_threads_are_counted(enabled, harness_thread, monkeypatch):
+    if not hasattr(harness_thread, "native_id"):
+        pytest.skip("threads have no native id before Python 3.8")
+    opened = []
+    monkeypatch.setattr(perfcounters, "_perf_event_open",
+                        lambda libc, type_, config_, tid: opened.append(tid) or -1)
+    perfcounters.start()
+    assert threading.get_native_id() in opened
+    assert harness_thread.native_id not in opened
+    assert set(opened) == set(perfcounters._benchmark_threads())
+
+
+def test_denied_counters_are_none(enabled, monkeypatch):
+    # e.g. perf_event_paranoid 3, or a seccomp filter of the container
+    monkeypatch.setattr(perfcounters, "_perf_event_open", lambda *args: -1)
+    perfcounters.start()
+    assert perfcounters.stop() == dict.fromkeys(perfcounters.EVENTS)
+
+
+def test_disabled_or_unsupported(monkeypatch):
+    monkeypatch.setattr(perfcounters, "_open", None)
+    monkeypatch.delenv("CASABENCH_PERF_COUNTERS", raising=False)
+    perfcounters.start()
+    assert perfcounters.stop() == {}
+    monkeypatch.setenv("CASABENCH_PERF_COUNTERS", "1")
+    monkeypatch.setattr(perfcounters.platform, "machine", lambda: "sparc64")
+    perfcounters.start()
+    assert perfcounters.stop() == {}
+    with perfcounters.paused():
+        pass
+
+
+def faults_of_a_thread(pause):
+    perfcounters.start()
+    thread = threading.Thread(target=lambda: bytearray(64 << 20), name="tasklog")
+    if pause:
+        with perfcounters.paused():
+            thread.start()
+    else:
+        thread.start()
+    thread.join()
+    return perfcounters.stop()["page_faults"]
+
+
+def test_threads_started_while_paused_are_not_counted(enabled):
+    # page faults are a software counter, offered by most hosts that allow any
+    if faults_of_a_thread(pause=False) is None:
+        pytest.skip("perf_event_open is not permitted here")
+    assert faults_of_a_thread(pause=False) > 1000
+    assert faults_of_a_thread(pause=True) < 1000
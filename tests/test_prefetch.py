@@ -0,0 +1,35 @@
+import os
+import time
+
+import pytest
+
+from benchmarks.harness import datacache, prefetch, sampler
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setenv("CASABENCH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(prefetch, "_order", None)
+    return tmp_path
+
+
+def test_prefetcher_is_not_a_child(env):
+    prefetch._start()
+    assert sampler._tree(os.getpid()) == [os.getpid()]
+
+
+def test_prefetcher_fetches_the_queue(env):
+    source = env / "data.ms"
+    source.mkdir()
+    (source / "table.dat").write_bytes(b"x" * 100)
+    with prefetch._queue() as queue:
+        queue.append(str(source))
+    prefetch._start()
+    log = env / "harness" / "prefetch" / "prefetch.log"
+    deadline = time.time() + 30
+    while "prefetched" not in log.read_text() and time.time() < deadline:
+        time.sleep(0.1)
+    assert "prefetched {}".format(source) in log.read_text()
+    assert datacache.fetch(str(source)).startswith(str(env / "cache"))
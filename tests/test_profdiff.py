@@ -0,0 +1,25 @@
+import gzip
+import os
+
+from casabench import normalize, profdiff
+
+from test_normalize import ENV, raw, write
+
+NAME = "bench_a.Suite.time_a"
+
+
+def test_run_finds_the_stacks_of_a_normalized_results_file(tmp_path):
+    machine = tmp_path / "results" / "casa-perf-test"
+    machine.mkdir(parents=True)
+    stacks = tmp_path / "results" / "flamegraphs" / ("3024d718-" + ENV)
+    stacks.mkdir(parents=True)
+    with gzip.open(str(stacks / (NAME + ".1-1.folded.gz")), "wt") as fp:
+        fp.write("main;tclean;deconvolve 7\n")
+
+    path = write(machine, raw())
+    assert profdiff.Run(path, NAME).stacks
+    _, target, _ = normalize.process(path, set())
+    assert os.path.basename(target) != os.path.basename(path)
+    run = profdiff.Run(target, NAME)
+    assert [dict(sample) for sample in run.stacks] == [{"main;tclean;deconvolve": 7}]
+    assert run.machine == "casa-perf-test"
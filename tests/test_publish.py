@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from casabench import store
+
+publish = pytest.importorskip("casabench.publish")
+
+NAME = "bench_a.Suite.time_a"
+
+
+def run(results_dir, tmp_path):
+    conn = store.connect(str(tmp_path / "db.sqlite"))
+    store.sync(conn, results_dir.path)
+    output = str(tmp_path / "html")
+    changed = publish.publish(conn, output)
+    with open(os.path.join(output, "index.json")) as fp:
+        return changed, json.load(fp)
+
+
+def test_republishes_only_changed_series(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {NAME: ("v1", 1.0), "bench_b.S.time_b": ("v1", 2.0)})
+    assert run(results_dir, tmp_path)[0] == (2, 0)
+    assert run(results_dir, tmp_path)[0] == (0, 0)
+    results_dir.add("casa-perf-test", "6.6.2.1", "3.8", {NAME: ("v1", 1.1)})
+    changed, index = run(results_dir, tmp_path)
+    assert changed == (1, 0)
+    assert index["casa-perf-test/" + NAME]["points"] == 2
+
+
+def test_benchmark_version_change_republishes(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {NAME: ("v1", 1.0)})
+    run(results_dir, tmp_path)
+    results_dir.benchmarks[NAME]["version"] = "v2"
+    results_dir.write_benchmarks()
+    changed, index = run(results_dir, tmp_path)
+    assert changed == (1, 0)
+    assert index["casa-perf-test/" + NAME]["points"] == 0
+
+
+def test_series_per_python(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {NAME: ("v1", 1.0)})
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.10", {NAME: ("v1", 2.0)})
+    _, index = run(results_dir, tmp_path)
+    assert sorted(index["casa-perf-test/" + NAME]["latest"]) == [
+        ["3.10", [], "6.6.1.1", 2.0], ["3.8", [], "6.6.1.1", 1.0]]
+    with open(publish.graph_path(str(tmp_path / "html"), NAME, "casa-perf-test")) as fp:
+        graph = json.load(fp)
+    assert sorted((s["python"], s["median"][0]) for s in graph["series"]) == [("3.10", 2.0), ("3.8", 1.0)]
+
+
+def test_regressions(results_dir, tmp_path):
+    for i, value in enumerate([1.0] * 6 + [2.0] * 6):
+        results_dir.add("casa-perf-test", "6.6.{}.1".format(i), "3.8", {NAME: ("v1", value)})
+    _, index = run(results_dir, tmp_path)
+    (python, params, before, after, value, best), = index["casa-perf-test/" + NAME]["regressions"]
+    assert (python, params, before, after) == ("3.8", [], "6.6.5.1", "6.6.6.1")
+    assert (value, best) == (pytest.approx(1.0), pytest.approx(2.0))
+
+
+def test_removed_series(results_dir, tmp_path):
+    path = results_dir.add("cvpost029", "6.6.1.1", "3.8", {NAME: ("v1", 1.0)})
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {NAME: ("v1", 1.0)})
+    run(results_dir, tmp_path)
+    os.remove(path)
+    changed, index = run(results_dir, tmp_path)
+    assert changed == (0, 1)
+    assert list(index) == ["casa-perf-test/" + NAME]
+    assert not os.path.exists(publish.graph_path(str(tmp_path / "html"), NAME, "cvpost029"))
@@ -0,0 +1,54 @@
+import numpy
+
+from casabench import results
+
+
+def load(results_dir, tmp_path):
+    return results.load(results_dir.path, str(tmp_path / "db.sqlite"))
+
+
+def test_series_arrays(results_dir, tmp_path):
+    for i, value in enumerate([1.0, None, 3.0]):
+        results_dir.add("casa-perf-test", "6.6.{}.1".format(i), "3.8",
+                        {"bench_a.Suite.time_a": ("v1", value)})
+    series, = load(results_dir, tmp_path).series("bench_a.Suite.time_a")
+    assert series.versions.tolist() == ["6.6.0.1", "6.6.1.1", "6.6.2.1"]
+    assert numpy.isnan(series.median[1])
+    numpy.testing.assert_allclose(series.median[[0, 2]], [1.0, 3.0])
+    numpy.testing.assert_allclose(series.ci_99_a[[0, 2]], [0.95, 2.85])
+    assert series.samples.shape == (3, 0)
+    assert series.unit == "seconds"
+
+
+def test_series_are_split_by_python(results_dir, tmp_path):
+    # the same casatasks version run in two environments on one machine
+    results_dir.add("casa-perf-test", "6.6.4.1", "3.8", {"bench_a.Suite.time_a": ("v1", 1.0)})
+    results_dir.add("casa-perf-test", "6.6.4.1", "3.10", {"bench_a.Suite.time_a": ("v1", 2.0)})
+    results_dir.add("casa-perf-test", "6.6.5.1", "3.10", {"bench_a.Suite.time_a": ("v1", 2.1)})
+    found = load(results_dir, tmp_path).series("bench_a.Suite.time_a")
+    assert {(s.python, len(s)) for s in found} == {("3.8", 1), ("3.10", 2)}
+
+
+def test_series_keep_the_current_benchmark_version(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {"bench_a.Suite.time_a": ("old", 9.0)})
+    results_dir.add("casa-perf-test", "6.6.2.1", "3.8", {"bench_a.Suite.time_a": ("new", 1.0)})
+    results_dir.benchmarks["bench_a.Suite.time_a"]["version"] = "new"
+    results_dir.write_benchmarks()
+    db = load(results_dir, tmp_path)
+    series, = db.series("bench_a.Suite.time_a")
+    assert series.version == "new"
+    assert series.median.tolist() == [1.0]
+    old, = db.series("bench_a.Suite.time_a", version="old")
+    assert old.median.tolist() == [9.0]
+
+
+def test_series_by_machine_and_params(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8",
+                    {"bench_a.Suite.time_a": ("v1", [1.0, 2.0], [["'cold'", "'warm'"]])})
+    results_dir.add("cvpost029", "6.6.1.1", "3.8",
+                    {"bench_a.Suite.time_a": ("v1", [3.0, 4.0], [["'cold'", "'warm'"]])})
+    db = load(results_dir, tmp_path)
+    found = db.series("bench_a.Suite.time_a", machine="cvpost029")
+    assert [(s.params, s.median.tolist()) for s in found] == [(("'cold'",), [3.0]), (("'warm'",), [4.0])]
+    assert db.machines() == ["casa-perf-test", "cvpost029"]
+    assert db.benchmarks("bench_a.*") == ["bench_a.Suite.time_a"]
@@ -0,0 +1,125 @@
+import gzip
+import os
+import time
+import types
+
+import pytest
+
+from benchmarks.harness import sampler
+
+ROOT, CHILD, GRANDCHILD = 100, 101, 102
+
+
+def stat_line(pid, comm, utime, stime, cutime, cstime, threads, rss_pages):
+    # fields 3 to 24 of /proc/<pid>/stat, from the state to the rss
+    fields = ["S", "1"] + ["0"] * 9 + [utime, stime, cutime, cstime, "20", "0", threads,
+                                       "0", "0", "0", rss_pages]
+    return "{} ({}) {}\n".format(pid, comm, " ".join(str(field) for field in fields))
+
+
+def add_process(proc, pid, comm, children=(), stat=(0, 0, 0, 0, 1, 0), pss_kb=None, fds=0,
+                io=None):
+    directory = proc / str(pid)
+    (directory / "task" / str(pid)).mkdir(parents=True)
+    # children are listed per thread
+    for tid, kids in ((pid, children[:1]), (pid + 1000, children[1:])):
+        (directory / "task" / str(tid)).mkdir(exist_ok=True)
+        (directory / "task" / str(tid) / "children").write_text(" ".join(map(str, kids)))
+    (directory / "stat").write_text(stat_line(pid, comm, *stat))
+    if pss_kb is not None:
+        (directory / "smaps_rollup").write_text(
+            "00400000-7ffd [rollup]\nRss:  {0} kB\nPss:  {0} kB\n".format(pss_kb))
+    (directory / "fd").mkdir()
+    for fd in range(fds):
+        (directory / "fd" / str(fd)).write_text("")
+    if io is not None:
+        (directory / "io").write_text("".join("{}: {}\n".format(*item) for item in io.items()))
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    """A procfs of three processes, ROOT being this one"""
+    path = tmp_path / "proc"
+    (path / "self").mkdir(parents=True)
+    ticks = sampler._CLOCK_TICKS
+    add_process(path, ROOT, "python (asv) x", children=(CHILD,),
+                stat=(2 * ticks, ticks, ticks, ticks, 4, 10), pss_kb=30, fds=3,
+                io={"rchar": 500, "wchar": 60, "syscr": 7, "syscw": 2,
+                    "read_bytes": 4096, "write_bytes": 8192, "cancelled_write_bytes": 0})
+    add_process(path, CHILD, "casa-mpi", children=(GRANDCHILD,),
+                stat=(ticks, ticks, 5 * ticks, 0, 2, 20), pss_kb=40, fds=2,
+                io={"rchar": 100, "read_bytes": 0, "write_bytes": 4096})
+    # another user's process: no smaps_rollup, no io
+    add_process(path, GRANDCHILD, "mpicasa", stat=(ticks, 0, 0, 0, 1, 5))
+    monkeypatch.setattr(sampler, "_PROC", str(path))
+    monkeypatch.setattr(sampler.os, "getpid", lambda: ROOT)
+    return path
+
+
+def test_tree_follows_the_children_of_every_thread(proc):
+    assert sampler._tree(ROOT) == [ROOT, CHILD, GRANDCHILD]
+    assert sampler._tree(999) == [999]
+
+
+def test_usage(proc):
+    page = sampler._PAGE_SIZE
+    assert sampler._usage(ROOT) == [10 * page, 30 * 1024, 2.0, 1.0, 4, 3, 4096, 8192]
+    # the CPU time of the children the process has waited for
+    assert sampler._usage(ROOT, reaped=True)[2:4] == [3.0, 2.0]
+    assert sampler._usage(GRANDCHILD) == [5 * page, 0, 1.0, 0.0, 1, 0, 0, 0]
+
+
+def test_usage_of_a_process_that_exited(proc):
+    assert sampler._usage(999) == [0] * 8
+    (proc / str(CHILD) / "stat").write_text("")
+    assert sampler._usage(CHILD) == [0] * 8
+
+
+def test_io_counters_are_summed_over_the_tree(proc):
+    assert sampler.io_counters() == {"rchar": 600, "wchar": 60, "syscr": 7, "syscw": 2,
+                                     "read_bytes": 4096, "write_bytes": 12288}
+
+
+def test_cpu_time_of_live_children(proc, monkeypatch):
+    idle = types.SimpleNamespace(ru_utime=0.0, ru_stime=0.0)
+    monkeypatch.setattr(sampler.resource, "getrusage", lambda who: idle)
+    # the children of the root are counted with what they have waited for
+    assert sampler.cpu_time() == 2.0 + 5.0 + 1.0
+
+
+def test_sample_sums_the_tree(proc):
+    page = sampler._PAGE_SIZE
+    t, *totals = sampler.Sampler(1).sample()
+    assert 0 <= t < 1
+    assert totals == [35 * page, 70 * 1024, 5.0, 3.0, 7, 5, 4096, 12288]
+
+
+def test_series_are_appended_per_sample(proc, tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_SAMPLE_INTERVAL", "0.01")
+    monkeypatch.setenv("CASABENCH_RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setenv("ASV_COMMIT", "0123456789abcdef")
+    monkeypatch.setenv("ASV_ENV_NAME", "virtualenv-py3.8")
+    monkeypatch.setattr(sampler, "_samples", {})
+    for _ in range(2):
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop("bench_a.Suite.peakmem_a", 1)
+    path = sampler.timeseries_file("bench_a.Suite.peakmem_a", 1)
+    assert path == os.path.join(str(tmp_path / "results"), "timeseries",
+                                "01234567-virtualenv-py3.8", "bench_a.Suite.peakmem_a-1.csv.gz")
+    with gzip.open(path, "rt") as fp:
+        lines = fp.read().splitlines()
+    headers = [i for i, line in enumerate(lines) if line.startswith("# sample")]
+    assert [lines[i].split()[2] for i in headers] == ["0", "1"]
+    first = lines[headers[0] + 1:headers[1]]
+    assert first[0] == ",".join(sampler.COLUMNS)
+    # a sample at the start, one per tick and one at the stop
+    assert len(first) >= 1 + 3
+    # the sampler thread is not counted while it runs
+    assert [row.split(",")[5] for row in first[1:]][-2] == "6"
+
+
+def test_disabled_without_an_interval(proc, monkeypatch):
+    monkeypatch.delenv("CASABENCH_SAMPLE_INTERVAL", raising=False)
+    sampler.start()
+    assert sampler._current is None
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from benchmarks.harness import staging
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_PREFETCH", "0")
+    monkeypatch.delenv("CASABENCH_CACHE_DIR", raising=False)
+    monkeypatch.delenv("CASABENCH_STAGING", raising=False)
+    # no reflinks, so that the choice between hard links and copies is exercised
+    monkeypatch.setattr(staging, "_reflink", lambda src, dst: False)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_ms(path):
+    os.makedirs(path)
+    with open(os.path.join(path, "table.dat"), "wb") as fp:
+        fp.write(b"header")
+    with open(os.path.join(path, "table.f0"), "wb") as fp:
+        fp.write(b"\0" * staging.LINK_MIN_SIZE)
+    return str(path)
+
+
+def stage_twice(source):
+    # the first staging is a full copy that learns which files the task writes
+    staging.stage(source, "work.ms")
+    staging.unstage("work.ms")
+    return staging.stage(source, "work.ms")
+
+
+def test_checkout_files_are_never_hard_linked(env):
+    source = make_ms(env / "casatestdata" / "a.ms")
+    staged = stage_twice(source)
+    assert staged.bytes_linked == 0
+    assert os.stat(os.path.join(source, "table.f0")).st_nlink == 1
+    staging.unstage("work.ms")
+
+
+def test_cache_entries_are_hard_linked(env, monkeypatch):
+    monkeypatch.setenv("CASABENCH_CACHE_DIR", str(env / "cache"))
+    source = make_ms(env / "casatestdata" / "a.ms")
+    staged = stage_twice(source)
+    assert staged.source.startswith(str(env / "cache"))
+    assert staged.bytes_linked == staging.LINK_MIN_SIZE
+    assert os.stat(os.path.join(source, "table.f0")).st_nlink == 1
+    staging.unstage("work.ms")
+
+
+def test_restore_restages_modified_files(env):
+    source = make_ms(env / "casatestdata" / "a.ms")
+    staging.stage(source, "work.ms")
+    with open(os.path.join("work.ms", "table.dat"), "wb") as fp:
+        fp.write(b"changed")
+    with open(os.path.join("work.ms", "new.table"), "wb") as fp:
+        fp.write(b"output")
+    staging.release("work.ms")
+    staged = staging.stage(source, "work.ms")
+    assert staged.restored
+    assert staged.bytes_copied == len(b"header")
+    assert not os.path.exists(os.path.join("work.ms", "new.table"))
+    with open(os.path.join("work.ms", "table.dat"), "rb") as fp:
+        assert fp.read() == b"header"
+    staging.unstage("work.ms")
+
+
+def test_read_only_link_guards_writes(env, monkeypatch):
+    monkeypatch.setenv("CASABENCH_CACHE_DIR", str(env / "cache"))
+    source = make_ms(env / "casatestdata" / "a.ms")
+    staged = staging.link(source, "input.ms")
+    assert os.path.islink("input.ms")
+    assert os.path.realpath("input.ms") == staged.source
+    with open(os.path.join(staged.source, "table.dat"), "ab") as fp:
+        fp.write(b"oops")
+    with pytest.raises(staging.StagingError):
+        staging.verify()
+    staging.unstage("input.ms")
+
+
+def test_read_only_datasets_are_copied_without_the_cache(env):
+    source = make_ms(env / "casatestdata" / "a.ms")
+    staged = staging.link(source, "input.ms")
+    assert not staged.readonly
+    assert not os.path.islink("input.ms")
+    with open(os.path.join("input.ms", "table.dat"), "ab") as fp:
+        fp.write(b"oops")
+    with open(os.path.join(source, "table.dat"), "rb") as fp:
+        assert fp.read() == b"header"
+    assert staging.link(source, "input.ms").restored
+    staging.unstage("input.ms")
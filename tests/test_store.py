@@ -0,0 +1,47 @@
+import os
+
+from casabench import store
+
+
+def test_version_key_sorts_numerically():
+    assert store.version_key("6.10.0.1") > store.version_key("6.9.5.4")
+    assert store.version_key("6.6.5.4") == "00006.00006.00005.00004"
+
+
+def test_sync_is_incremental(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {"bench_a.Suite.time_a": ("v1", 1.0)})
+    second = results_dir.add("casa-perf-test", "6.6.2.1", "3.8", {"bench_a.Suite.time_a": ("v1", 1.1)})
+    conn = store.connect(str(tmp_path / "db.sqlite"))
+    assert store.sync(conn, results_dir.path) == (2, 0)
+    assert store.sync(conn, results_dir.path) == (0, 0)
+
+    os.remove(second)
+    results_dir.add("casa-perf-test", "6.6.3.1", "3.8", {"bench_a.Suite.time_a": ("v1", 1.2)})
+    assert store.sync(conn, results_dir.path) == (1, 1)
+    rows = store.select(conn, "bench_a.*")
+    assert [row.casatasks for row in rows] == ["6.6.1.1", "6.6.3.1"]
+    assert [row.result for row in rows] == [1.0, 1.2]
+
+
+def test_select_filters(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.5.1.1", "3.6", {"bench_a.Suite.time_a": ("v1", 1.0)})
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8", {"bench_a.Suite.time_a": ("v1", 2.0)})
+    results_dir.add("cvpost029", "6.6.2.1", "3.8", {"bench_a.Suite.time_a": ("v1", 3.0),
+                                                    "bench_b.Suite.time_b": ("v1", 4.0)})
+    conn = store.connect(str(tmp_path / "db.sqlite"))
+    store.sync(conn, results_dir.path)
+    assert len(store.select(conn)) == 4
+    assert [r.result for r in store.select(conn, "bench_a.*", machine="casa-perf-test")] == [1.0, 2.0]
+    assert [r.result for r in store.select(conn, "bench_a.*", since="6.6")] == [2.0, 3.0]
+    assert [r.result for r in store.select(conn, "bench_a.*", until="6.5")] == [1.0]
+    assert [r.result for r in store.select(conn, "bench_a.*", python="3.6")] == [1.0]
+    assert store.benchmark_info(conn, "bench_b.Suite.time_b")["unit"] == "seconds"
+
+
+def test_parameter_combinations(results_dir, tmp_path):
+    results_dir.add("casa-perf-test", "6.6.1.1", "3.8",
+                    {"bench_a.Suite.time_a": ("v1", [1.0, 2.0], [["'cold'", "'warm'"]])})
+    conn = store.connect(str(tmp_path / "db.sqlite"))
+    store.sync(conn, results_dir.path)
+    rows = store.select(conn)
+    assert [(row.params, row.result) for row in rows] == [(["'cold'"], 1.0), (["'warm'"], 2.0)]
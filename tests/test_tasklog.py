@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from benchmarks.harness import tasklog
+
+TCLEAN_LOG = """\
+2024-05-01 10:00:00\tINFO\ttclean::::casa\t##########################################
+2024-05-01 10:00:00\tINFO\ttclean::::casa\t##### Begin Task: tclean           #####
+2024-05-01 10:00:00\tINFO\ttclean::::casa\ttclean( vis='refim_point.ms', imagename='tst' )
+2024-05-01 10:00:02\tINFO\tSynthesisImagerVi2::selectData (file ../../src/code/synthesis/ImagerObjects/SynthesisImagerVi2.cc, line 399)\tMS : refim_point.ms
+2024-05-01 10:00:03\tINFO\ttclean::::casa\t------------------------------------------------- Make PSF ---------------------------------------
+2024-05-01 10:00:08\tINFO\ttclean::::casa\t------------------------------------------------- Run Major Cycle 0 -----------------------------
+2024-05-01 10:00:10\tINFO\tSIImageStore::calcSensitivity\t[tst] Theoretical sensitivity (Jy/bm):0.000285
+2024-05-01 10:00:12\tINFO\ttclean::::casa\t------------------------------------------------- Run Minor Cycle Iterations --------------------
+2024-05-01 10:00:13\tINFO\ttclean::::casa\t------------------------------------------------- Run (Last) Major Cycle 1 ----------------------
+2024-05-01 10:00:17\tINFO\ttclean::::casa\t------------------------------------------------- Restoring Model Image --------------------------
+2024-05-01 10:00:18\tINFO\ttclean::::casa\tResult tclean: {}
+2024-05-01 10:00:19\tINFO\ttclean::::casa\t##### End Task: tclean             #####
+2024-05-01 10:00:19\tINFO\ttclean::::casa\t##########################################
+"""
+
+GAINCAL_LOG = """\
+2024-05-01 11:00:00\tINFO\tgaincal::::casa\t##### Begin Task: gaincal          #####
+2024-05-01 11:00:01\tINFO\tcalibrater::selectvis\tSelecting data
+2024-05-01 11:00:04\tINFO\tcalibrater::solve\tSolving for G
+2024-05-01 11:00:10\tINFO\tcalibrater::solve\tWriting solutions to table: gaincaltest.G0
+2024-05-01 11:00:11\tINFO\tgaincal::::casa\t##### End Task: gaincal            #####
+2024-05-01 11:00:20\tINFO\tgaincal::::casa\tSolving for T
+"""
+
+
+def write(tmp_path, text):
+    path = tmp_path / "casa.log"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("message, phase", [
+    ("------ Make PSF ------", "psf"),
+    ("------ make pb ------", "primary_beam"),
+    ("------ Make Primary Beam ------", "primary_beam"),
+    ("------ Run Major Cycle 3 ------", "major_cycle"),
+    ("------ Run (Last) Major Cycle 4 ------", "major_cycle"),
+    ("------ Run Minor Cycle Iterations ------", "minor_cycle"),
+    ("------ Restoring Model Image ------", "restore"),
+    ("Solving for B", "solve"),
+    ("Writing solutions to table: cal.B0", "write"),
+    ("Make PSF", None),
+    ("Done Solving for G", None),
+])
+def test_phase_markers(message, phase):
+    found = [name for name, pattern in tasklog.PHASES.items() if pattern.search(message)]
+    assert found[:1] == ([phase] if phase else [])
+
+
+def test_tclean_phases(tmp_path):
+    spent = tasklog.durations(tasklog.read(write(tmp_path, TCLEAN_LOG)))
+    assert list(spent) == ["setup", "psf", "major_cycle", "minor_cycle", "restore"]
+    assert spent == {"setup": 3.0, "psf": 5.0, "major_cycle": 4.0 + 4.0,
+                     "minor_cycle": 1.0, "restore": 2.0}
+
+
+def test_solver_phases_end_with_the_task(tmp_path):
+    spent = tasklog.durations(tasklog.read(write(tmp_path, GAINCAL_LOG)))
+    # the marker after End Task belongs to no task call
+    assert spent == {"setup": 4.0, "solve": 6.0, "write": 1.0}
+
+
+def test_calls_are_summed(tmp_path):
+    spent = tasklog.durations(tasklog.read(write(tmp_path, GAINCAL_LOG * 2)))
+    assert spent == {"setup": 8.0, "solve": 12.0, "write": 2.0}
+
+
+def test_unfinished_call_ends_at_the_last_line():
+    entries = [(0.0, "##### Begin Task: gaincal #####"), (0.5, "Solving for G"), (2.0, "iteration 5")]
+    assert tasklog.durations(entries) == {"setup": 0.5, "solve": 1.5}
+
+
+def test_unstamped_lines_are_skipped(tmp_path):
+    text = "continued message\n" + GAINCAL_LOG
+    assert len(tasklog.read(write(tmp_path, text))) == len(GAINCAL_LOG.splitlines())
+
+
+def test_follower_reads_appended_lines(tmp_path):
+    path = write(tmp_path, "2024-05-01 10:00:00\tINFO\tx\tearlier task\n")
+    follower = tasklog._Follower(path)
+    follower.start()
+    with open(path, "a") as fp:
+        fp.write("2024-05-01 10:00:01\tINFO\tx\t##### Begin Task: gaincal #####\n")
+        fp.write("2024-05-01 10:00:01\tINFO\tx\tpartial")
+        fp.flush()
+        time.sleep(5 * tasklog.POLL_INTERVAL)
+        fp.write(" line\n")
+    entries = follower.stop()
+    assert [message for _, message in entries] == ["##### Begin Task: gaincal #####", "partial line"]
+    assert entries[0][0] <= entries[1][0]
@@ -0,0 +1,59 @@
+import os
+import threading
+
+import pytest
+
+from benchmarks.harness import overhead, trash
+
+
+def make_tree(path, files=20):
+    os.makedirs(path)
+    for i in range(files):
+        with open(os.path.join(path, "f{}".format(i)), "wb") as fp:
+            fp.write(b"x" * 1000)
+    return str(path)
+
+
+def test_discard_and_barrier(tmp_path):
+    a = make_tree(tmp_path / "out" / "a.image")
+    b = make_tree(tmp_path / "out" / "b.image")
+    keep = make_tree(tmp_path / "out" / "a.ms")
+    trash.discard(str(tmp_path / "out" / "*.image"), str(tmp_path / "out" / "missing*"))
+    assert not os.path.exists(a) and not os.path.exists(b)
+    trash.barrier()
+    assert os.listdir(str(tmp_path / "out" / trash.TRASH_NAME)) == []
+    assert os.path.exists(keep)
+
+
+def test_setup_waits_for_the_trash(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.chdir(tmp_path)
+    removing = threading.Event()
+    release = threading.Event()
+    remove = trash._remove
+
+    def slow_remove(path):
+        removing.set()
+        release.wait(5)
+        remove(path)
+
+    monkeypatch.setattr(trash, "_remove", slow_remove)
+    make_tree(tmp_path / "previous.image")
+    trash.discard(str(tmp_path / "previous.image"))
+    assert removing.wait(5)
+
+    class Benchmark:
+        name = "bench_a.Suite.time_a"
+
+        def do_setup(self):
+            threading.Timer(0.2, release.set).start()
+
+        def do_teardown(self):
+            pass
+
+    benchmark = Benchmark()
+    overhead._wrap_setup(Benchmark.do_setup)(benchmark)
+    # nothing is left to remove once the measured call starts
+    assert release.is_set()
+    assert trash._pending.unfinished_tasks == 0
+    overhead._wrap_teardown(Benchmark.do_teardown)(benchmark)
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.harness import workspace
+
+NAME = "bench_a.Suite.time_a"
+
+
+@pytest.fixture
+def exits(monkeypatch):
+    """The exit handlers registered by the workspace"""
+    registered = []
+    monkeypatch.setattr(workspace.atexit, "register", lambda *args: registered.append(args))
+    return registered
+
+
+@pytest.fixture
+def origin(tmp_path, monkeypatch, exits):
+    """asv's benchmark directory, holding a product of setup_cache"""
+    monkeypatch.setenv("CASABENCH_HARNESS_DIR", str(tmp_path / "harness"))
+    monkeypatch.setenv("CASABENCH_WORKSPACE_DIR", str(tmp_path / "shm"))
+    monkeypatch.delenv("CASABENCH_WORKSPACE_BYTES", raising=False)
+    monkeypatch.setattr(workspace, "_active", None)
+    path = tmp_path / "asv"
+    path.mkdir()
+    (path / "cache.ms").mkdir()
+    (path / "cache.ms" / "table.dat").write_bytes(b"c" * 100)
+    monkeypatch.chdir(path)
+    return path
+
+
+def write(name, size):
+    with open(name, "wb") as fp:
+        fp.write(b"x" * size)
+
+
+def first_run(monkeypatch, size=5000):
+    """A run on disk that records the footprint of the benchmark"""
+    assert workspace.enter(NAME) == workspace.DISK
+    write("image.psf", size)
+    workspace.measure()
+    monkeypatch.setattr(workspace, "_active", None)
+
+
+def test_unknown_benchmarks_run_on_disk(origin, monkeypatch):
+    first_run(monkeypatch)
+    assert os.getcwd() == str(origin)
+    with workspace._footprints() as footprints:
+        # the working copies and outputs written after the first setup only
+        assert footprints == {NAME: 5000}
+
+
+def test_known_benchmarks_run_in_memory(origin, exits, monkeypatch):
+    first_run(monkeypatch)
+    os.remove("image.psf")
+    assert workspace.enter(NAME) == workspace.MEMORY
+    path = os.getcwd()
+    assert os.path.dirname(path) == str(origin.parent / "shm")
+    assert os.path.basename(path).startswith("{}-".format(os.getpid()))
+    # the entries of asv's directory are linked, and do not count as outputs
+    assert os.path.realpath("cache.ms") == str(origin / "cache.ms")
+    assert workspace.entries() == []
+    since = workspace.stamp()
+    write("image.residual", 300)
+    assert workspace.entries() == [os.path.join(path, "image.residual")]
+    assert workspace.measure(since) >= 300
+    # the workspace is removed when the process exits
+    (remove, *args), = exits
+    remove(*args)
+    assert os.getcwd() == str(origin) and not os.path.exists(path)
+
+
+def test_enter_once_per_process(origin, exits, monkeypatch):
+    first_run(monkeypatch)
+    assert workspace.enter(NAME) == workspace.MEMORY
+    path = os.getcwd()
+    assert workspace.enter("bench_a.Suite.time_b") == workspace.MEMORY
+    assert os.getcwd() == path and len(exits) == 1
+
+
+def test_large_benchmarks_stay_on_disk(origin, monkeypatch):
+    first_run(monkeypatch)
+    monkeypatch.setenv("CASABENCH_WORKSPACE_BYTES", "4K")
+    assert workspace.enter(NAME) == workspace.DISK
+    assert os.getcwd() == str(origin)
+
+
+def test_disabled_without_a_workspace_dir(origin, monkeypatch):
+    first_run(monkeypatch)
+    monkeypatch.delenv("CASABENCH_WORKSPACE_DIR")
+    assert workspace.enter(NAME) == workspace.DISK
+
+
+def test_workspaces_of_exited_processes_are_reaped(origin, monkeypatch):
+    shm = origin.parent / "shm"
+    gone = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True).stdout.strip()
+    (shm / "{}-abc".format(gone)).mkdir(parents=True)
+    (shm / "{}-def".format(os.getpid())).mkdir()
+    (shm / "other").mkdir()
+    first_run(monkeypatch)
+    assert sorted(os.listdir(shm)) == ["{}-def".format(os.getpid()), "other"]
+
+
+def test_sizes_skip_links_and_count_new_blocks(origin):
+    write("old.dat", 4096)
+    since = workspace.stamp()
+    os.mkdir("new.ms")
+    write(os.path.join("new.ms", "table.f0"), 8192)
+    os.symlink("old.dat", os.path.join("new.ms", "link"))
+    assert workspace._sizes("new.ms", since) == (8192, 8192)
+    assert workspace._sizes("old.dat", since) == (4096, 0)
+    assert workspace._sizes("cache.ms") == (100, 0)